@@ -1,32 +1,246 @@
 # Dependencies
+import functools
+import gc
 import logging
 import os
-from flask import Flask, render_template, flash, request, redirect, url_for
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import urlsplit
+from flask import Flask, Response, render_template, flash, request, redirect, url_for, jsonify, abort, g, \
+    make_response
 from flask_scss import Scss
-from werkzeug.utils import secure_filename
+from jinja2 import ModuleLoader
+from werkzeug.http import is_resource_modified
 
 # Local
+import metrics
+from build import COMPILED_TEMPLATES, PUG_EXTENSION, SCSS_DIR, CSS_DIR, compiled_template_names, warm_templates
+from clock import ClockBroadcaster, TournamentClock
 from stats import *
 from randomizer import *
 
 app = Flask(__name__)
-log = logging.getLogger('werkzeug')
-log.disabled = True
+logging.getLogger('werkzeug').disabled = True
+log = logging.getLogger(__name__)
 app.logger.disabled = True
 
-# Pug - HTML Template Engine
-app.jinja_env.add_extension('pypugjs.ext.jinja.PyPugJSExtension')
-# Sass - CSS Preprocessor
-Scss(app, static_dir='static/css', asset_dir='static/Scss')
+REQUEST_SECONDS = metrics.histogram('poker_stats_request_seconds', 'Time spent handling requests.',
+                                    ['endpoint', 'method'])
+REQUESTS = metrics.counter('poker_stats_requests_total', 'Requests handled, by response status.',
+                           ['endpoint', 'method', 'status'])
+TEMPLATE_SECONDS = metrics.histogram('poker_stats_template_render_seconds', 'Time spent rendering templates.',
+                                     ['template'])
+PROFILES_SAVED = metrics.counter('poker_stats_slow_request_profiles_total', 'Profiles saved of slow requests.')
+
+# Set PROFILE_SLOW_REQUESTS to a number of seconds to save a cProfile report,
+# in PROFILE_DIR, of every request that takes longer
+profiler = None
+if os.environ.get('PROFILE_SLOW_REQUESTS'):
+    profiler = metrics.SlowRequestProfiler(float(os.environ['PROFILE_SLOW_REQUESTS']),
+                                           os.environ.get('PROFILE_DIR', 'profiles'))
+
+
+class TimedTemplate(app.jinja_env.template_class):
+    def render(self, *args, **kwargs):
+        with TEMPLATE_SECONDS.time(template=self.name):
+            return super().render(*args, **kwargs)
 
-info = Stats()
-CURRENT_SEASON = "2018F"
+
+# Must be set before any template is loaded
+app.jinja_env.template_class = TimedTemplate
+# Pug - HTML Template Engine
+app.jinja_env.add_extension(PUG_EXTENSION)
+
+# Set PRODUCTION to serve the stylesheets and templates compiled by build.py,
+# without converting or watching any source file
+PRODUCTION = bool(os.environ.get('PRODUCTION'))
+if PRODUCTION:
+    app.jinja_env.loader = ModuleLoader(COMPILED_TEMPLATES)
+    app.jinja_env.auto_reload = False
+    warm_templates(app.jinja_env, compiled_template_names())
+else:
+    # Sass - CSS Preprocessor, recompiles changed stylesheets in debug mode
+    Scss(app, static_dir=CSS_DIR, asset_dir=SCSS_DIR)
+
+# Share the Stats instance loaded by the stats module
+CURRENT_SEASON = info.cur_season or info.seasons.latest.sheet
 # Format: SB, BB, Ante, Time (min.)
 DEFAULT_BLINDS = [
     [10, 20, 0, 0.2],
     [25, 50, 1, 0.35]
 
 ]
+# Set SIMULATIONS to the simulations run per season projection,
+# SIMULATION_WORKERS to the processes running them, 0 for none, and
+# PROJECTION_INTERVAL to the minimum seconds between two of a season
+if os.environ.get('SIMULATIONS'):
+    projections.simulations = int(os.environ['SIMULATIONS'])
+if os.environ.get('SIMULATION_WORKERS'):
+    projections.workers = int(os.environ['SIMULATION_WORKERS'])
+if os.environ.get('PROJECTION_INTERVAL'):
+    projections.interval = float(os.environ['PROJECTION_INTERVAL'])
+
+# Set CLOCK_PATH when several processes serve the app, so they share one
+# clock, and CLOCK_EVENTS_PORT when clock.py streams it to the displays
+tournament_clock = TournamentClock(DEFAULT_BLINDS, path=os.environ.get('CLOCK_PATH'))
+clock_broadcaster = ClockBroadcaster(tournament_clock)
+
+
+def start_background_tasks():
+    """
+    Starts the threads of a serving process: the data refresher, the clock
+    broadcaster and, with METRICS_DIR set, the writer of its metrics.
+    """
+    info.start_refresher()
+    if not os.environ.get('CLOCK_EVENTS_PORT'):
+        clock_broadcaster.start()
+    if os.environ.get('METRICS_DIR'):
+        metrics.share(os.environ['METRICS_DIR'])
+
+
+def freeze_shared_data():
+    """
+    Moves everything loaded so far out of reach of the garbage collector,
+    so collections in forked workers do not write to, and copy, the pages
+    they share with the master. Call it right before forking.
+    """
+    # Built here, the head-to-head records, ratings and projections are shared by every worker
+    head_to_heads.get()
+    rating_histories.get()
+    projections.compute(CURRENT_SEASON)
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        # Python 3.7+
+        gc.freeze()
+
+
+# Set PRELOAD when a pre-fork server imports the app once in its master
+# process; it then calls start_background_tasks in every worker instead
+if not os.environ.get('PRELOAD'):
+    start_background_tasks()
+
+metrics.callback('poker_stats_clock_displays', 'Displays following the tournament clock.',
+                 lambda: len(clock_broadcaster.subscribers))
+metrics.callback('poker_stats_leaderboard_cache_hits_total', 'Leaderboards served from the cache.',
+                 lambda: leaderboards.hits, kind='counter')
+metrics.callback('poker_stats_leaderboard_cache_misses_total', 'Leaderboards computed.',
+                 lambda: leaderboards.misses, kind='counter')
+# What the season registry keeps in memory, see LAZY_SEASONS
+metrics.callback('poker_stats_resident_seasons', 'Seasons held in memory.',
+                 lambda: len(info.seasons.residency()['resident']))
+metrics.callback('poker_stats_resident_season_bytes', 'Approximate bytes of the seasons held in memory.',
+                 lambda: info.seasons.residency()['resident_bytes'])
+metrics.callback('poker_stats_season_loads_total', 'Seasons parsed from the data folder.',
+                 lambda: info.seasons.residency()['loads'], kind='counter')
+metrics.callback('poker_stats_season_hits_total', 'Season lookups served from memory.',
+                 lambda: info.seasons.residency()['hits'], kind='counter')
+metrics.callback('poker_stats_season_evictions_total', 'Seasons dropped from memory to make room.',
+                 lambda: info.seasons.residency()['evictions'], kind='counter')
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    g.profile = profiler.start() if profiler is not None else None
+    sync_results()
+
+
+@app.after_request
+def record_request(response):
+    elapsed = time.perf_counter() - g.request_start
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if g.profile is not None:
+        path = profiler.stop(g.profile, elapsed, f'{request.method} {request.path}')
+        if path is not None:
+            PROFILES_SAVED.inc()
+            log.warning('Saved the profile of a slow request to %s', path)
+    return response
+
+
+def requested_season():
+    """Returns the season named by the ``season`` query parameter, defaulting to the current season."""
+    season = info.seasons.get(request.args.get('season', CURRENT_SEASON))
+    if season is None:
+        abort(404)
+    return season
+
+class PageCache:
+    """
+    Keeps the most recently rendered pages, keyed by their URL and the
+    data version they were rendered from.
+
+    Parameters
+    ----------
+    size: :class:`int`
+        The number of pages kept.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            page = self.pages.get(key)
+            if page is not None:
+                self.pages.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        with self._lock:
+            self.pages[key] = page
+            self.pages.move_to_end(key)
+            while len(self.pages) > self.size:
+                self.pages.popitem(last=False)
+
+
+# Set PAGE_CACHE_SIZE to keep that many rendered pages in memory
+page_cache = PageCache(int(os.environ['PAGE_CACHE_SIZE'])) if os.environ.get('PAGE_CACHE_SIZE') else None
+PAGE_RESULTS = metrics.counter('poker_stats_pages_total', 'Cacheable pages by how they were served.', ['result'])
+# Pages change when the templates do, so they are part of the validators
+TEMPLATES_MODIFIED = max((os.path.getmtime(os.path.join(folder, file))
+                          for folder, _, files in os.walk(os.path.join(app.root_path, app.template_folder))
+                          for file in files), default=0)
+
+def cached_page(view):
+    """
+    Serves a page that only changes with the data with ``ETag`` and
+    ``Last-Modified`` headers. Conditional requests for an unchanged
+    page are answered with 304 before the view runs, and rendered pages
+    are reused from :data:`page_cache` when it is enabled.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version = content_version()
+        etag = f'{version[:16]}{projections.version}-{int(TEMPLATES_MODIFIED)}'
+        last_modified = datetime.utcfromtimestamp(int(max(info.data_modified, projections.modified,
+                                                          TEMPLATES_MODIFIED)))
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            PAGE_RESULTS.inc(result='not_modified')
+            response = Response(status=304)
+        else:
+            key = (request.full_path, version)
+            page = page_cache.get(key) if page_cache is not None else None
+            if page is not None:
+                PAGE_RESULTS.inc(result='cached')
+                body, mimetype = page
+                response = Response(body, mimetype=mimetype)
+            else:
+                PAGE_RESULTS.inc(result='rendered')
+                response = make_response(view(*args, **kwargs))
+                if page_cache is not None and response.status_code == 200:
+                    page_cache.put(key, (response.get_data(), response.mimetype))
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Let browsers keep the page but check it is still current
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -52,26 +266,30 @@ def load_profile_search(name=None, season=None):
 
 
 @app.route('/profiles/<name>/')
-def load_profile(name=None, season=CURRENT_SEASON, tournaments=None, best_finish=None, tourn_finish=None, no_finaltables=None, results=None):
-    names = get_all_names(CURRENT_SEASON)
-
-    if name not in names:
+@cached_page
+def load_profile(name=None):
+    season = requested_season().name
+    profile = info.get_profile(name)
+    if profile is None:
         name = None
+        current = None
     else:
-        tourn_finish = get_best_placement(name, CURRENT_SEASON)[0]
-        best_finish = get_best_placement(name, CURRENT_SEASON)[1]
-        no_finaltables = get_final_tables(name, CURRENT_SEASON)
-        tournaments = tournaments_no(name, CURRENT_SEASON)
-        results = get_results(name, CURRENT_SEASON)
+        # Other spellings of the name show the merged profile
+        name = profile.name
+        current = profile.seasons.get(season)
 
-    return render_template('profilepage.html', name=name, tournaments=tournaments, best_finish=best_finish, tourn_finish=tourn_finish,
-                           season=season, no_finaltables=no_finaltables, results=results)
+    rivals = get_rivals(name, k=5) if profile is not None else None
+    rating = get_rating(name) if profile is not None else None
+    top_chance = get_top_chance(name, season) if current is not None else None
+    return render_template('profilepage.html', name=name, season=season, profile=profile, current=current,
+                           rivals=rivals, rating=rating, top_chance=top_chance)
 
 
 
 
 @app.route('/search')
 @app.route('/search/<name>')
+@cached_page
 def search(name=None, response=None, name_list=None):
     if not name:
         response = "Please enter a valid name."
@@ -79,7 +297,7 @@ def search(name=None, response=None, name_list=None):
     if len(name) < 3:
         response = "Make sure your search is at least 3 characters."
     else:
-        name_list = get_names(name, CURRENT_SEASON)
+        name_list = get_names(name)
         if len(name_list) > 0:
             response = "successful"
         else:
@@ -88,13 +306,270 @@ def search(name=None, response=None, name_list=None):
     return render_template('search.html', name=name, response=response, name_list=name_list)
 
 
+@app.route('/autocomplete')
+def autocomplete():
+    """
+    Suggests player names while a user is typing in the profile search box.
+
+    GET:
+        ``q`` is the partial name and ``limit`` caps the number of
+        suggestions (default 10). Returns a JSON list of names.
+    """
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    return jsonify(get_names(query, limit=limit))
+
+
 @app.route('/stats')
-def load_stats(most_finals=most_final_tables(CURRENT_SEASON), most_top3=most_top_3(CURRENT_SEASON),
-               best_sum=sum_of_placements(CURRENT_SEASON),
-               most_consecutive=most_consecutive_finals(CURRENT_SEASON)):
+@cached_page
+def load_stats():
+    """
+    Shows the leaderboards of a season.
 
-    return render_template('stats.html', most_finals=most_finals, most_top3=most_top3,
-                           best_sum=best_sum, most_consecutive=most_consecutive)
+    GET:
+        ``season`` optionally names the season. Each leaderboard is
+        fetched from ``/api/leaderboards`` when it is first opened.
+    """
+    season = requested_season().name
+    return render_template('stats.html', season=season)
+
+
+def int_arg(name, default, minimum=0):
+    """Reads an integer query parameter, answering 400 if it is not one or is below `minimum`."""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        abort(400, f'{name} must be an integer')
+    if value < minimum:
+        abort(400, f'{name} must be at least {minimum}')
+    return value
+
+
+def page_args(default_limit=25, max_limit=100):
+    """Reads the ``offset`` and ``limit`` query parameters. Limits above `max_limit` are lowered to it."""
+    return int_arg('offset', 0), min(int_arg('limit', default_limit, minimum=1), max_limit)
+
+
+@app.route('/api/leaderboards')
+def api_leaderboards():
+    """
+    Lists the leaderboards and seasons.
+
+    GET:
+        Returns JSON with the ``leaderboards`` names, the ``seasons``
+        names, oldest first, and the ``current`` season.
+    """
+    return jsonify(leaderboards=list(LEADERBOARDS), seasons=info.seasons.names(),
+                   current=info.seasons[CURRENT_SEASON].name)
+
+
+@app.route('/api/leaderboards/<name>')
+@cached_page
+def api_leaderboard(name):
+    """
+    Returns one page of a leaderboard.
+
+    GET:
+        ``season`` optionally names the season, ``offset`` skips entries
+        and ``limit`` caps their number (default 25, at most 100). Returns
+        JSON with the ``entries``, each with its ``rank``, ``name`` and
+        ``value``, and whether ``more`` entries follow.
+    """
+    if name not in LEADERBOARDS:
+        abort(404)
+    season = requested_season().name
+    offset, limit = page_args()
+    rows, more = leaderboard_page(name, season, offset, limit)
+    entries = [{'rank': offset + i + 1, 'name': player, 'value': value} for i, (player, value) in enumerate(rows)]
+    return jsonify(leaderboard=name, season=season, offset=offset, limit=limit, entries=entries, more=more)
+
+
+@app.route('/api/profiles/<name>')
+@cached_page
+def api_profile(name):
+    """
+    Returns a player's profile.
+
+    GET:
+        Returns JSON with the player's ``career`` totals and a summary of
+        every season they played, oldest first (see :class:`data.PlayerProfile`).
+    """
+    profile = info.get_profile(name)
+    if profile is None:
+        abort(404)
+    return jsonify(name=profile.name, career=profile.career, seasons=list(profile.seasons.values()))
+
+
+@app.route('/api/profiles/<name>/rivals')
+@cached_page
+def api_rivals(name):
+    """
+    Returns the players someone met most often, across every season.
+
+    GET:
+        ``offset`` and ``limit`` page through the rivals (default 10, at
+        most 100). Returns JSON with the ``rivals``, each with the number
+        of ``wins`` and ``losses`` of the player against them, and whether
+        ``more`` follow.
+    """
+    offset, limit = page_args(default_limit=10)
+    rivals = get_rivals(name, k=offset + limit + 1)
+    if rivals is None:
+        abort(404)
+    entries = [{'name': rival, 'wins': wins, 'losses': losses} for rival, wins, losses in rivals[offset:offset + limit]]
+    return jsonify(name=name, offset=offset, limit=limit, rivals=entries, more=len(rivals) > offset + limit)
+
+
+@app.route('/api/profiles/<name>/ratings')
+@cached_page
+def api_rating_series(name):
+    """
+    Returns a player's rating over time.
+
+    GET:
+        Returns JSON with the ``rating`` after each tournament the player
+        played, oldest first, with its ``season`` and ``tournament``.
+    """
+    series = get_rating_series(name)
+    if series is None:
+        abort(404)
+    return jsonify(name=name, ratings=[{'season': season, 'tournament': tournament, 'rating': round(rating, 1)}
+                                       for season, tournament, rating in series])
+
+
+@app.route('/api/ratings')
+@cached_page
+def api_ratings():
+    """
+    Returns one page of the players with the highest rating.
+
+    GET:
+        ``offset`` and ``limit`` page through the players (default 25, at
+        most 100), and ``minimum`` is the number of rated tournaments a
+        player needs (default 5). Returns JSON with the ``entries``, each
+        with its ``rank``, ``name`` and ``rating``, and whether ``more``
+        entries follow.
+    """
+    offset, limit = page_args()
+    minimum = int_arg('minimum', 5, minimum=1)
+    rows, more = rating_leaders(offset, limit, minimum)
+    entries = [{'rank': offset + i + 1, 'name': player, 'rating': round(rating, 1)}
+               for i, (player, rating) in enumerate(rows)]
+    return jsonify(offset=offset, limit=limit, minimum=minimum, entries=entries, more=more)
+
+@app.route('/api/head-to-head')
+@cached_page
+def api_head_to_head():
+    """
+    Compares two players.
+
+    GET:
+        ``name`` and ``opponent`` name the players. Returns JSON with the
+        number of tournaments in which ``name`` finished ahead (``wins``)
+        and behind (``losses``).
+    """
+    name = request.args.get('name', '')
+    opponent = request.args.get('opponent', '')
+    record = head_to_head(name, opponent)
+    if record is None:
+        abort(404)
+    wins, losses = record
+    return jsonify(name=name, opponent=opponent, wins=wins, losses=losses)
+
+
+@app.route('/api/rivalries')
+@cached_page
+def api_rivalries():
+    """
+    Returns the pairs of players who met most often, across every season.
+
+    GET:
+        ``limit`` caps the number of pairs (default 25, at most 100).
+        Each has the player with more ``wins``, their ``opponent`` and
+        the ``losses``.
+    """
+    _, limit = page_args()
+    pairs = [{'name': name, 'opponent': opponent, 'wins': wins, 'losses': losses}
+             for name, opponent, wins, losses in top_rivalries(limit)]
+    return jsonify(rivalries=pairs)
+
+@app.route('/api/search')
+@cached_page
+def api_search():
+    """
+    Searches player names.
+
+    GET:
+        ``q`` is the name, ``season`` optionally restricts the results to
+        the players of a season, and ``offset`` and ``limit`` page through
+        them (default 10, at most 50). Returns JSON with the matching
+        ``results`` and whether ``more`` follow.
+    """
+    query = request.args.get('q', '')
+    season = request.args.get('season')
+    if season is not None:
+        season = requested_season().name
+    offset, limit = page_args(default_limit=10, max_limit=50)
+    names = get_names(query, season, limit=offset + limit + 1)
+    return jsonify(query=query, season=season, offset=offset, limit=limit,
+                   results=names[offset:offset + limit], more=len(names) > offset + limit)
+
+
+@app.route('/api/standings')
+@cached_page
+def api_standings():
+    """
+    Returns one page of a season's standings.
+
+    GET:
+        ``season`` optionally names the season, and ``offset`` and
+        ``limit`` page through the players (default 25, at most 100).
+        Returns JSON with the ``entries``, each with its ``rank``, ``name``
+        and ``total_points``, and whether ``more`` entries follow.
+    """
+    season = requested_season().name
+    offset, limit = page_args()
+    players, more = standings_page(season, offset, limit)
+    entries = [{'rank': offset + i + 1, 'name': p.name, 'total_points': p.total_points}
+               for i, p in enumerate(players)]
+    return jsonify(season=season, offset=offset, limit=limit, entries=entries, more=more)
+
+
+@app.route('/api/results', methods=['POST'])
+def api_results():
+    """
+    Enters a tournament result while the tournament is running.
+
+    POST:
+        ``name``, ``tournament`` (its number) and ``place`` are required,
+        ``season`` optionally names the season, and either ``points`` or the
+        number of ``entrants`` gives the points. A second result of a player
+        in the same tournament replaces the first. Returns JSON with the
+        player's new ``rank``, ``total_points`` and ``placements``.
+
+        Results are kept in memory, and logged to RESULTS_PATH for the
+        other workers, until the sheets are next refreshed, so they must
+        also be entered in the sheet.
+    """
+    season = info.seasons.get(request.form.get('season', CURRENT_SEASON))
+    name = request.form.get('name', '').strip()
+    tournament = request.form.get('tournament', type=int)
+    place = request.form.get('place', type=int)
+    if season is None:
+        abort(404)
+    if not name or tournament is None or place is None:
+        abort(400, 'name, tournament and place are required')
+    try:
+        player = add_result(season.name, name, tournament, place,
+                            points=request.form.get('points', type=float),
+                            entrants=request.form.get('entrants', type=int))
+    except ValueError as e:
+        abort(400, str(e))
+    return jsonify(season=season.name, name=player.name, rank=player.rank + 1,
+                   total_points=player.total_points, placements=player.placements)
 
 
 @app.route('/clock')
@@ -104,15 +579,91 @@ def clock():
     The structure must include SB, BB, ante, and duration values (min).
 
     GET:
-        Loads the tournament clock with the default blind structure.
+        Loads a display of the tournament clock. The clock itself runs on
+        the server and the page follows it through ``/clock/events``.
     """
     
-    return render_template('clock.pug', blinds=DEFAULT_BLINDS)
+    return render_template('clock.pug', blinds=DEFAULT_BLINDS, events=clock_events_url())
+
+
+def clock_events_url():
+    """The URL displays follow the clock through, on the events server if there is one."""
+    if not os.environ.get('CLOCK_EVENTS_PORT'):
+        return url_for('clock_events')
+    host = urlsplit(request.host_url).hostname
+    if ':' in host:
+        host = f'[{host}]'
+    return f'{request.scheme}://{host}:{os.environ["CLOCK_EVENTS_PORT"]}/clock/events'
+
 
+@app.route('/clock/events')
+def clock_events():
+    """
+    Streams the clock state to a display as server-sent events.
+
+    GET:
+        Sends the current state, then every change and a periodic
+        heartbeat as ``clock`` events carrying :meth:`TournamentClock.state`.
+        Redirects to the events server when CLOCK_EVENTS_PORT is set.
+    """
+    if os.environ.get('CLOCK_EVENTS_PORT'):
+        return redirect(clock_events_url())
+    updates = clock_broadcaster.subscribe()
+
+    def stream():
+        try:
+            while True:
+                try:
+                    yield updates.get(timeout=30)
+                except queue.Empty:
+                    # Keep idle connections open through proxies
+                    yield ': keepalive\n\n'
+        finally:
+            clock_broadcaster.unsubscribe(updates)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/clock/<action>', methods=['POST'])
+def clock_control(action):
+    """
+    Lets the tournament director control the clock.
+
+    POST:
+        ``action`` is ``start``, ``pause`` or ``next``. Every display is
+        updated immediately and the new state is returned as JSON.
+    """
+    actions = {
+        'start': tournament_clock.start,
+        'pause': tournament_clock.pause,
+        'next': tournament_clock.next_level
+    }
+    if action not in actions:
+        abort(404)
+    actions[action]()
+    clock_broadcaster.notify()
+    return jsonify(tournament_clock.state())
+
+
+# The seating chart of the event being run through the randomizer
+seating = None
+seating_lock = threading.Lock()
 
 @app.route('/randomizer', methods=['GET', 'POST'])
 def randomizer():
+    """
+    Seats the players of an uploaded CSV at random, balanced tables.
+
+    GET:
+        Shows the upload form and the current seating chart.
 
+    POST:
+        ``file`` is a CSV with a header row and player names, ``table_size``
+        is the number of seats per table (default 9) and ``seed`` optionally
+        fixes the random draw.
+    """
+    global seating
     if request.method == 'POST':
         if 'file' not in request.files:
             flash('No file uploaded.')
@@ -121,13 +672,51 @@ def randomizer():
         if not file.filename:
             flash('No file uploaded')
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            names = concatenate(file)
+            table_size = request.form.get('table_size', 9, type=int)
+            seed = request.form.get('seed', type=int)
+            try:
+                new_seating = Seating(read_names(file), table_size, seed)
+            except ValueError as e:
+                flash(str(e))
+                return redirect(request.url)
+            with seating_lock:
+                seating = new_seating
 
-            return redirect(url_for('upload_page',
-                                    filename=filename))
+            return redirect(url_for('randomizer'))
 
-    return render_template('randomizer.html')
+    return render_template('randomizer.html', seating=seating)
+
+
+@app.route('/randomizer/bust', methods=['POST'])
+def bust():
+    """
+    Eliminates a player and rebalances the tables.
+
+    POST:
+        ``player`` is the name of the eliminated player. Returns JSON with
+        the ``moves`` the floor has to make and the new ``layout``.
+    """
+    if seating is None:
+        abort(404)
+    with seating_lock:
+        try:
+            moves = seating.bust(request.form.get('player', ''))
+        except KeyError:
+            abort(404)
+        layout = seating.layout()
+    return jsonify(moves=moves, layout=layout)
+
+
+@app.route('/metrics')
+def load_metrics():
+    """
+    Exposes request, template, data loading, refresh and stats helper
+    timings for Prometheus.
+
+    GET:
+        Returns every metric in the Prometheus text format.
+    """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
 @app.route('/upload')
@@ -0,0 +1,100 @@
+"""
+A local stand-in for the parts of the Google Sheets v4 API the refresher
+uses, serving a synthetic league from memory.
+
+    python benchmarks/fake_sheets.py --port 8081 --seasons 20 --players 1000
+
+Point ``api_root`` in config.json at ``http://127.0.0.1:8081/v4`` to use it.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_league
+
+
+class SheetsStandIn:
+    """
+    Serves ``GET /v4/spreadsheets/<id>`` (the sheet list) and
+    ``GET /v4/spreadsheets/<id>/values/<title>`` for a league.
+
+    Parameters
+    ----------
+    league: Dict[:class:`str`, :class:`dict`]
+        ``values`` responses mapped to sheet titles, newest first, as
+        returned by :func:`benchmarks.synthetic.generate_league`.
+
+    latency: :class:`float`
+        Seconds to wait before answering, to imitate the real API.
+    """
+    def __init__(self, league, host='127.0.0.1', port=0, latency=0.0):
+        self.league = league
+        self.latency = latency
+        self.requests = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stand_in.requests += 1
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+                parts = unquote(urlparse(self.path).path).strip('/').split('/')
+                if parts[:2] != ['v4', 'spreadsheets'] or len(parts) not in (3, 5):
+                    return self._send(404, {'error': {'code': 404, 'message': 'Not found'}})
+                if len(parts) == 3:
+                    sheets = [{'properties': {'title': title}} for title in stand_in.league]
+                    return self._send(200, {'spreadsheetId': parts[2], 'sheets': sheets})
+                sheet = stand_in.league.get(parts[4])
+                if parts[3] != 'values' or sheet is None:
+                    return self._send(400, {'error': {'code': 400, 'message': 'Unable to parse range'}})
+                return self._send(200, sheet)
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def api_root(self):
+        """The value to use as ``api_root`` in config.json."""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/v4'
+
+    def start(self):
+        """Serves requests in a daemon thread."""
+        threading.Thread(target=self.server.serve_forever, name='sheets-stand-in', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--seasons', type=int, default=7)
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--tournaments', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    league = generate_league(args.seasons, args.players, args.tournaments)
+    stand_in = SheetsStandIn(league, port=args.port, latency=args.latency)
+    print(f'Serving {len(league)} sheets at {stand_in.api_root}')
+    stand_in.server.serve_forever()
@@ -0,0 +1,224 @@
+"""
+Drives the Flask app with concurrent simulated clients and reports
+throughput and latency percentiles per route.
+
+    python benchmarks/loadtest.py --clients 32 --duration 30
+    python benchmarks/loadtest.py --server-cmd "gunicorn -w 4 -b 127.0.0.1:{port} app:app"
+
+The app runs in its own process against a synthetic league, with its
+Sheets API pointed at a local stand-in so the scheduled refresh runs
+during the test too.
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_sheets import SheetsStandIn
+from benchmarks.synthetic import generate_league, write_league
+
+DEFAULT_MIX = 'profile=40,search=20,stats=10,leaderboard=25,randomizer=5'
+LEADERBOARDS = ['most_final_tables', 'most_top_3', 'sum_of_placements', 'most_consecutive_finals', 'best_avg_place']
+
+
+def display_name(name):
+    """Flips "Last, First" sheet names the way :class:`data.Player` does."""
+    if ',' in name:
+        return ' '.join(x.strip() for x in name.split(',')[::-1])
+    return name.strip()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, pct):
+    """The nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+class Workload:
+    """Builds random requests for each route from the league's players."""
+    def __init__(self, names, rng):
+        self.names = names
+        self.rng = rng
+
+    def profile(self):
+        return 'GET', f'/profiles/{self.rng.choice(self.names)}/', {}
+
+    def search(self):
+        name = self.rng.choice(self.names)
+        start = self.rng.randrange(max(1, len(name) - 3))
+        return 'GET', f'/search/{name[start:start + 3]}', {}
+
+    def stats(self):
+        return 'GET', '/stats', {}
+
+    def leaderboard(self):
+        offset = self.rng.choice([0, 0, 0, 25, 50])
+        return 'GET', f'/api/leaderboards/{self.rng.choice(LEADERBOARDS)}?offset={offset}&limit=25', {}
+
+    def randomizer(self):
+        players = self.rng.sample(self.names, min(len(self.names), 90))
+        csv = 'Name\n' + '\n'.join(players)
+        files = {'file': ('players.csv', csv.encode(), 'text/csv')}
+        return 'POST', '/randomizer', {'files': files, 'data': {'table_size': '9'}}
+
+
+def client(base, deadline, mix, names, seed, results, stop):
+    rng = random.Random(seed)
+    workload = Workload(names, rng)
+    routes, weights = zip(*mix.items())
+    session = requests.Session()
+    while time.perf_counter() < deadline and not stop.is_set():
+        route = rng.choices(routes, weights)[0]
+        method, path, kwargs = getattr(workload, route)()
+        start = time.perf_counter()
+        try:
+            ok = session.request(method, base + path, timeout=30, **kwargs).status_code < 400
+        except requests.RequestException:
+            ok = False
+        results[route].append((time.perf_counter() - start, ok))
+
+
+def run_clients(base, clients, duration, mix, names, seed):
+    results = defaultdict(list)
+    stop = threading.Event()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client, args=(base, deadline, mix, names, seed + i, results, stop))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+    return results
+
+
+def summarize(results, duration):
+    """Computes throughput and latency percentiles per route, in milliseconds."""
+    report = {}
+    everything = []
+    for route, samples in sorted(results.items()):
+        latencies = sorted(elapsed * 1e3 for elapsed, _ in samples)
+        everything += latencies
+        report[route] = {
+            'requests': len(samples),
+            'errors': sum(not ok for _, ok in samples),
+            'rps': len(samples) / duration,
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None
+        }
+    everything.sort()
+    report['all'] = {
+        'requests': len(everything),
+        'errors': sum(r['errors'] for r in report.values()),
+        'rps': len(everything) / duration,
+        'p50': percentile(everything, 50),
+        'p90': percentile(everything, 90),
+        'p99': percentile(everything, 99),
+        'max': everything[-1] if everything else None
+    }
+    return report
+
+
+def start_server(path, port, server_cmd):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    if server_cmd:
+        cmd = shlex.split(server_cmd.format(port=port))
+    else:
+        env['FLASK_APP'] = os.path.join(ROOT, 'app.py')
+        cmd = [sys.executable, '-m', 'flask', 'run', '--port', str(port), '--with-threads']
+    server = subprocess.Popen(cmd, cwd=path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'Server exited: {server.stderr.read().decode()}')
+        try:
+            requests.get(base + '/', timeout=1)
+            return server, base
+        except requests.RequestException:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('Server did not start within 60 seconds')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seasons', type=int, default=20)
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--tournaments', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20, help='seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of unmeasured load first')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='route=weight pairs')
+    parser.add_argument('--sheets-latency', type=float, default=0.05,
+                        help='seconds the Sheets stand-in waits per request')
+    parser.add_argument('--server-cmd', help='command starting the app on {port}, run in the league folder')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='save the report to this JSON file')
+    args = parser.parse_args()
+    mix = {route: float(weight) for route, weight in (pair.split('=') for pair in args.mix.split(','))}
+
+    league = generate_league(args.seasons, args.players, args.tournaments, args.seed)
+    stand_in = SheetsStandIn(league, latency=args.sheets_latency).start()
+    path = tempfile.mkdtemp(prefix='poker-stats-load-')
+    write_league(path, league)
+    # Make the data look stale so the app refreshes from the stand-in while under load
+    with open(os.path.join(path, 'config.json')) as f:
+        config = json.load(f)
+    config.update({'api_root': stand_in.api_root, 'last_timestamp': '2000-01-01 00:00:00.000000'})
+    with open(os.path.join(path, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=4)
+
+    names = sorted({display_name(row[3]) for sheet in league.values() for row in sheet['values'][3:]})
+    server, base = start_server(path, free_port(), args.server_cmd)
+    try:
+        if args.warmup:
+            run_clients(base, args.clients, args.warmup, mix, names, args.seed)
+        results = run_clients(base, args.clients, args.duration, mix, names, args.seed + args.clients)
+    finally:
+        server.terminate()
+        server.wait()
+        stand_in.stop()
+        shutil.rmtree(path, ignore_errors=True)
+
+    report = summarize(results, args.duration)
+    print(f'{"route":<12}{"requests":>10}{"errors":>8}{"req/s":>9}{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}{"max ms":>9}')
+    for route, r in report.items():
+        if not r['requests']:
+            continue
+        print(f'{route:<12}{r["requests"]:>10}{r["errors"]:>8}{r["rps"]:>9.1f}'
+              f'{r["p50"]:>9.1f}{r["p90"]:>9.1f}{r["p99"]:>9.1f}{r["max"]:>9.1f}')
+    print(f'Sheets stand-in served {stand_in.requests} requests')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'routes': report}, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
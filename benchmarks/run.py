@@ -0,0 +1,212 @@
+"""
+Times season parsing, Stats construction and every stats.py helper on
+synthetic leagues of increasing size, and saves the results as JSON.
+
+    python benchmarks/run.py --sizes small,medium --output results.json
+    python benchmarks/run.py --compare results.json
+
+With --compare, benchmarks more than --threshold times slower than the
+saved run are reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from contextlib import contextmanager
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import write_league
+
+# name: (seasons, players per season, tournaments per season)
+SIZES = {
+    'small': (7, 100, 10),
+    'medium': (20, 1000, 10),
+    'large': (40, 5000, 12)
+}
+
+
+@contextmanager
+def league_dir(seasons, players, tournaments, seed=0):
+    """Writes a synthetic league to a temporary folder and works from inside it."""
+    path = tempfile.mkdtemp(prefix='poker-stats-bench-')
+    cwd = os.getcwd()
+    try:
+        titles = write_league(path, seasons=seasons, players=players, tournaments=tournaments, seed=seed)
+        os.chdir(path)
+        yield titles
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def measure(fn, repeat=5, setup=None):
+    """
+    Times `fn`, repeating the measurement and taking the best and median.
+
+    :param setup: Called before every measurement, outside the timing.
+    :returns: A dict of seconds per call.
+    """
+    timer = timeit.Timer(fn)
+    if setup is None:
+        number, _ = timer.autorange()
+    else:
+        number = 1
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        times.append(timer.timeit(number) / number)
+    return {'best': min(times), 'median': statistics.median(times), 'calls': number}
+
+
+def use_stats(stats, info):
+    """Points the stats module, and its caches, at another Stats."""
+    stats.info = info
+    stats.leaderboards = stats.LeaderboardCache(info)
+    stats.head_to_heads = stats.HeadToHeadCache(info)
+    stats.rating_histories = stats.RatingsCache(info)
+    stats.projections = stats.ProjectionCache(info)
+
+
+def run_size(size, repeat):
+    seasons, players, tournaments = SIZES[size]
+    results = {}
+    with league_dir(seasons, players, tournaments) as titles:
+        import data
+        current = titles[0]
+        results['Season.from_file'] = measure(lambda: data.Season.from_file(f'{current}.json'), repeat)
+
+        def cold():
+            shutil.rmtree('cache', ignore_errors=True)
+        results['Stats() cold'] = measure(data.Stats, repeat, setup=cold)
+        results['Stats() snapshot'] = measure(data.Stats, repeat)
+        info = data.Stats()
+
+        def parse_players():
+            info.players = {}
+            info._parse_players()
+        results['Stats._parse_players'] = measure(parse_players, repeat)
+
+        import scoring
+        results['scoring.score_seasons'] = measure(lambda: scoring.score_seasons(info.seasons), repeat)
+
+        import headtohead
+        results['HeadToHead.from_seasons'] = measure(
+            lambda: headtohead.HeadToHead.from_seasons(info.seasons.results()), repeat)
+
+        import ratings
+        results['RatingHistory.update'] = measure(lambda: ratings.RatingHistory().update(info.seasons.results()), repeat)
+        history = ratings.RatingHistory()
+        history.update(info.seasons.results())
+        results['RatingHistory.update (unchanged)'] = measure(lambda: history.update(info.seasons.results()), repeat)
+
+        import projections
+        season = info.seasons[current]
+        # Halfway through the season, simulated in this process
+        model = projections.SeasonModel.from_season(season, info.seasons.results(), season.num_tournaments // 2)
+        results['SeasonModel.from_season'] = measure(
+            lambda: projections.SeasonModel.from_season(season, info.seasons.results(), season.num_tournaments // 2), repeat)
+        results['simulate (10000)'] = measure(lambda: projections.simulate(model, 10000, workers=0), repeat)
+
+        import stats
+        use_stats(stats, info)
+        season = info.seasons[current]
+        name = max(season.players, key=lambda p: len(p.placements)).name
+        query = name.split()[0][:3]
+        helpers = {
+            'most_final_tables': lambda: stats.most_final_tables(current),
+            'most_top_3': lambda: stats.most_top_3(current),
+            'sum_of_placements': lambda: stats.sum_of_placements(current),
+            'most_consecutive_finals': lambda: stats.most_consecutive_finals(current),
+            'best_avg_place': lambda: stats.best_avg_place(current),
+            'avg_to_final': lambda: stats.avg_to_final(current),
+            'tournament_count': lambda: stats.tournament_count(current),
+            'leaderboard (cached)': lambda: stats.leaderboard('most_final_tables', current),
+            'get_names': lambda: stats.get_names(query, limit=10),
+            'get_all_names': lambda: stats.get_all_names(current),
+            'find_player': lambda: stats.find_player(name, current),
+            'get_best_placement': lambda: stats.get_best_placement(name, current),
+            'get_final_tables': lambda: stats.get_final_tables(name, current),
+            'tournaments_no': lambda: stats.tournaments_no(name, current),
+            'get_results': lambda: stats.get_results(name, current),
+            'Stats.get_profile': lambda: info.get_profile(name),
+            'get_rivals (cached)': lambda: stats.get_rivals(name, k=5)
+        }
+        for helper, fn in helpers.items():
+            results[helper] = measure(fn, repeat)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous, threshold):
+    """Prints the change of every benchmark and returns the regressions."""
+    regressions = []
+    for size, results in current['results'].items():
+        for name, result in results.items():
+            old = previous['results'].get(size, {}).get(name)
+            if old is None:
+                continue
+            ratio = result['median'] / old['median'] if old['median'] else float('inf')
+            flag = ''
+            if ratio > threshold:
+                flag = '  REGRESSION'
+                regressions.append((size, name, ratio))
+            print(f'{size:>8} {name:<28} {old["median"] * 1e3:10.3f} ms -> {result["median"] * 1e3:10.3f} ms'
+                  f'  x{ratio:.2f}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='small,medium', help=f'comma separated, from {", ".join(SIZES)}')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--compare', help='a saved JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as a regression')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'timestamp': str(datetime.now()),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'sizes': {size: SIZES[size] for size in args.sizes.split(',')}
+        },
+        'results': {}
+    }
+    for size in args.sizes.split(','):
+        print(f'Running {size} {SIZES[size]}...', file=sys.stderr)
+        report['results'][size] = run_size(size, args.repeat)
+        for name, result in report['results'][size].items():
+            print(f'{size:>8} {name:<28} {result["median"] * 1e3:10.3f} ms')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(report, previous, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
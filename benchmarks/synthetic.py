@@ -0,0 +1,133 @@
+"""
+Generates synthetic leagues shaped like the Google Sheets API responses
+the app downloads, for benchmarking at sizes the real data does not reach.
+
+    python benchmarks/synthetic.py out_dir --seasons 20 --players 2000 --tournaments 10
+"""
+import argparse
+import json
+import os
+import random
+
+FIRST_NAMES = ['Alex', 'Bri', 'Chris', 'Dana', 'Elias', 'Fran', 'Gabe', 'Hana', 'Ian', 'Jay',
+               'Kim', 'Lee', 'Max', 'Nick', 'Omar', 'Pat', 'Quinn', 'Ryan', 'Sam', 'Tad']
+LAST_NAMES = ['Aleman', 'Battaglia', 'Cottell', 'Davolio', 'Fung', 'Gallo', 'Josephs', 'Lieman',
+              'Nguyen', 'Pandya', 'Qiao', 'Riley', 'Salmento', 'Shim', 'Wan', 'Weiss']
+
+
+def season_titles(count, first_year=2000):
+    """Sheet titles for `count` consecutive seasons, e.g. 2000S, 2000F, 2001S..."""
+    return [f'{first_year + i // 2}{"SF"[i % 2]}' for i in range(count)]
+
+
+def player_pool(count, rng):
+    """Unique player names, some written "Last, First" like the real sheets."""
+    names = []
+    for i in range(count):
+        first = FIRST_NAMES[i % len(FIRST_NAMES)]
+        last = LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]
+        suffix = f' {i}' if i >= len(FIRST_NAMES) * len(LAST_NAMES) else ''
+        names.append(f'{last}{suffix}, {first}' if rng.random() < 0.3 else f'{first} {last}{suffix}')
+    rng.shuffle(names)
+    return names
+
+
+def generate_sheet(title, season_num, players, num_tournaments, rng, attendance=0.6):
+    """
+    Builds one season as a Sheets API ``values`` response.
+
+    :param str title: The sheet title, also used as the season name.
+    :param int season_num: The season number.
+    :param players: The names of the players who may enter.
+    :param int num_tournaments: The number of tournaments in the season.
+    :param rng: A :class:`random.Random` instance.
+    :param float attendance: The chance a player enters a tournament.
+    :returns: A dict like the body of a ``values`` request.
+    """
+    results = {name: [] for name in players}
+    for tournament in range(num_tournaments):
+        entrants = [name for name in players if rng.random() < attendance] or [rng.choice(players)]
+        rng.shuffle(entrants)
+        for place, name in enumerate(entrants, 1):
+            points = round(100 * (len(entrants) - place + 1) / (len(entrants) * place ** 0.5), 2)
+            results[name].append((tournament, place, points))
+
+    header = [' ', f'{title} (Season {season_num})', '', '', '']
+    for tournament in range(num_tournaments):
+        header += [f'Tourn {tournament + 1}', '']
+    columns = ['', 'Bonus Points', 'Total Points', 'Name', '']
+    columns += ['Place', 'Points'] * num_tournaments
+    values = [header, [], columns]
+    for name, placements in results.items():
+        if not placements:
+            continue
+        bonus = rng.choice([0, 0, 0, 2, 4])
+        row = ['', str(bonus) if bonus else '', '', name, '']
+        row += [''] * (2 * num_tournaments)
+        total = bonus
+        for tournament, place, points in placements:
+            row[5 + 2 * tournament] = str(place)
+            row[6 + 2 * tournament] = str(points)
+            total += points
+        row[2] = str(round(total, 2))
+        values.append(row)
+    return {
+        'range': f"'{title}'!A1:Z{len(values)}",
+        'majorDimension': 'ROWS',
+        'values': values
+    }
+
+
+def generate_league(seasons=7, players=200, tournaments=10, seed=0):
+    """
+    Builds a whole league. Each season draws its players from one pool,
+    so careers span several seasons like in the real data.
+
+    :returns: A dict mapping sheet titles to ``values`` responses, newest first.
+    """
+    rng = random.Random(seed)
+    pool = player_pool(int(players * 1.5), rng)
+    league = {}
+    for season_num, title in enumerate(season_titles(seasons), 1):
+        league[title] = generate_sheet(title, season_num, rng.sample(pool, players), tournaments, rng)
+    return dict(reversed(list(league.items())))
+
+
+def write_league(path, league=None, **kwargs):
+    """
+    Writes a league to ``path/data`` along with the ``config.json`` and
+    ``api_key.txt`` that :class:`data.Stats` expects in its working directory.
+
+    :param league: A league from :func:`generate_league`. If omitted, one
+        is generated from the keyword arguments.
+    :returns: The sheet titles, newest first.
+    """
+    if league is None:
+        league = generate_league(**kwargs)
+    os.makedirs(os.path.join(path, 'data'), exist_ok=True)
+    for title, sheet in league.items():
+        with open(os.path.join(path, 'data', f'{title}.json'), 'w') as f:
+            json.dump(sheet, f, indent=4)
+    config = {
+        'spreadsheet_id': 'synthetic',
+        'last_timestamp': '2100-01-01 00:00:00.000000',
+        'cur_season': next(iter(league))
+    }
+    with open(os.path.join(path, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=4)
+    with open(os.path.join(path, 'api_key.txt'), 'w') as f:
+        f.write('synthetic')
+    return list(league)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--seasons', type=int, default=7)
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--tournaments', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    titles = write_league(args.path, seasons=args.seasons, players=args.players,
+                          tournaments=args.tournaments, seed=args.seed)
+    print(f'Wrote {len(titles)} seasons to {args.path}')
@@ -0,0 +1,89 @@
+"""
+Compiles the stylesheets and templates ahead of time, for running the app
+with ``PRODUCTION=1``.
+
+    python build.py
+"""
+import fnmatch
+import json
+import os
+import shutil
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from scss.compiler import Compiler
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCSS_DIR = os.path.join(ROOT, 'static', 'scss')
+CSS_DIR = os.path.join(ROOT, 'static', 'css')
+TEMPLATE_DIR = os.path.join(ROOT, 'templates')
+COMPILED_TEMPLATES = os.path.join(ROOT, 'build', 'templates')
+# Lists the compiled template names, which a ModuleLoader cannot list itself
+TEMPLATE_MANIFEST = 'manifest.json'
+PUG_EXTENSION = 'pypugjs.ext.jinja.PyPugJSExtension'
+
+
+def compile_scss(asset_dir=SCSS_DIR, static_dir=CSS_DIR):
+    """
+    Compiles every stylesheet in `asset_dir` to CSS in `static_dir`.
+    Partials, whose names start with an underscore, are only imported.
+
+    :returns: The paths of the CSS files written.
+    """
+    compiler = Compiler(search_path=[asset_dir])
+    written = []
+    for folder, _, files in os.walk(asset_dir):
+        for filename in fnmatch.filter(files, '*.scss'):
+            if filename.startswith('_'):
+                continue
+            src_path = os.path.join(folder, filename)
+            dest_path = os.path.join(static_dir, os.path.relpath(src_path, asset_dir))[:-len('.scss')] + '.css'
+            with open(src_path) as f:
+                css = compiler.compile_string(f.read())
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            with open(dest_path, 'w', encoding='utf-8') as f:
+                f.write(css)
+            written.append(dest_path)
+    return written
+
+
+def template_environment(template_dir=TEMPLATE_DIR):
+    """A Jinja environment that parses templates like the app's, Pug included."""
+    # Escaping is decided at compile time, so it must follow Flask's rules
+    autoescape = select_autoescape(('html', 'htm', 'xml', 'xhtml'), default_for_string=True)
+    return Environment(loader=FileSystemLoader(template_dir), extensions=[PUG_EXTENSION], autoescape=autoescape)
+
+
+def compile_templates(template_dir=TEMPLATE_DIR, target=COMPILED_TEMPLATES):
+    """
+    Converts the Pug templates and compiles every template to a Python
+    module in `target`, to be loaded with :class:`jinja2.ModuleLoader`.
+
+    :returns: The names of the compiled templates.
+    """
+    env = template_environment(template_dir)
+    names = env.list_templates()
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target)
+    env.compile_templates(target, zip=None, ignore_errors=False)
+    with open(os.path.join(target, TEMPLATE_MANIFEST), 'w') as f:
+        json.dump(names, f, indent=4)
+    return names
+
+
+def compiled_template_names(target=COMPILED_TEMPLATES):
+    """The names of the templates compiled to `target` by :func:`compile_templates`."""
+    with open(os.path.join(target, TEMPLATE_MANIFEST)) as f:
+        return json.load(f)
+
+
+def warm_templates(env, names):
+    """Loads templates into the cache of `env` so first requests do not pay for it."""
+    for name in names:
+        env.get_template(name)
+
+
+if __name__ == '__main__':
+    for path in compile_scss():
+        print(f'Compiled {os.path.relpath(path, ROOT)}')
+    names = compile_templates()
+    print(f'Compiled {len(names)} templates to {os.path.relpath(COMPILED_TEMPLATES, ROOT)}')
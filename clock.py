@@ -0,0 +1,458 @@
+import argparse
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+from refresh import atomic_write, file_lock
+
+# Where the processes serving the app share the clock
+CLOCK_PATH = 'cache/clock.json'
+
+FANOUT_SECONDS = metrics.histogram('poker_stats_clock_fanout_seconds',
+                                   'Time to hand one clock update to every display.',
+                                   buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1))
+CLOCK_UPDATES = metrics.counter('poker_stats_clock_updates_total', 'Clock updates sent to the displays.')
+
+
+class TournamentClock:
+    """
+    TournamentClock is the blind clock of a running tournament.
+
+    The clock is ``stopped`` until it is first started, then alternates
+    between ``running`` and ``paused``, and is ``finished`` once the last
+    level runs out. Levels advance on their own when their time is up, or
+    early through :meth:`next_level`.
+
+    With a `path`, the clock is shared by every process using that file,
+    such as the workers of a pre-fork server and the events server. Each
+    change is made under a lock on the file, to the latest state saved
+    there, and other processes pick it up with :meth:`sync`.
+
+    Parameters
+    ----------
+    levels: List[:class:`list`]
+        The blind structure, one ``[small blind, big blind, ante, minutes]``
+        entry per level. A shared clock that was already saved keeps its own.
+
+    clock: Callable[[], :class:`float`]
+        The time source, in seconds. Defaults to :func:`time.monotonic`.
+
+    path: Optional[:class:`str`]
+        The file the clock is shared through.
+    """
+    def __init__(self, levels, clock=time.monotonic, path=None):
+        if not levels:
+            raise ValueError('a blind structure needs at least one level')
+        self.levels = levels
+        self.clock = clock
+        self.path = path
+        self.level = 0
+        self.status = 'stopped'
+        self.version = 0
+        self._remaining = self._duration(0)
+        self._started_at = None
+        self._lock = threading.RLock()
+        # The state file last read or written
+        self._seen = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with file_lock(f'{path}.lock'):
+                if not self.sync():
+                    self._save()
+
+    @classmethod
+    def load(cls, path, clock=time.monotonic):
+        """Follows the clock shared through `path`, which must have been saved already."""
+        with open(path) as f:
+            levels = json.load(f)['levels']
+        return cls(levels, clock, path)
+
+    def _duration(self, level):
+        return self.levels[level][3] * 60
+
+    def _file_key(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _save(self):
+        state = {
+            'levels': self.levels,
+            'level': self.level,
+            'status': self.status,
+            'version': self.version,
+            'remaining': self.remaining(),
+            # Wall time, since the time source of each process may differ
+            'saved_at': time.time()
+        }
+        atomic_write(self.path, lambda f: json.dump(state, f))
+        self._seen = self._file_key()
+
+    def sync(self):
+        """
+        Adopts the state another process saved to :attr:`path` since it
+        was last read.
+
+        :returns: ``True`` if the state changed.
+        """
+        if self.path is None:
+            return False
+        key = self._file_key()
+        if key is None or key == self._seen:
+            return False
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            self._seen = key
+            if state['version'] == self.version:
+                return False
+            self.levels = state['levels']
+            self.level = state['level']
+            self.status = state['status']
+            self.version = state['version']
+            self._remaining = state['remaining']
+            self._started_at = None
+            if self.status == 'running':
+                self._started_at = self.clock() - max(0.0, time.time() - state['saved_at'])
+            return True
+
+    @contextmanager
+    def _change(self):
+        """Makes a change to the latest state, saving it for the other processes."""
+        with self._lock:
+            if self.path is None:
+                yield
+                return
+            with file_lock(f'{self.path}.lock'):
+                self.sync()
+                version = self.version
+                yield
+                if self.version != version:
+                    self._save()
+
+    def remaining(self):
+        """Seconds left in the current level."""
+        with self._lock:
+            if self.status != 'running':
+                return self._remaining
+            return max(0.0, self._remaining - (self.clock() - self._started_at))
+
+    def _changed(self):
+        self.version += 1
+
+    def start(self):
+        """Starts or resumes the clock."""
+        with self._change():
+            if self.status in ('stopped', 'paused'):
+                self.status = 'running'
+                self._started_at = self.clock()
+                self._changed()
+
+    def pause(self):
+        """Pauses the clock, keeping the time left in the level."""
+        with self._change():
+            if self.status == 'running':
+                self._remaining = self.remaining()
+                self.status = 'paused'
+                self._changed()
+
+    def next_level(self):
+        """Moves to the next level, or finishes the clock after the last one."""
+        with self._change():
+            self._next_level()
+
+    def _next_level(self):
+        if self.status == 'finished':
+            return
+        if self.level + 1 >= len(self.levels):
+            self.status = 'finished'
+            self._remaining = 0
+        else:
+            self.level += 1
+            self._remaining = self._duration(self.level)
+            self._started_at = self.clock()
+        self._changed()
+
+    def _expired(self):
+        return self.status == 'running' and self.remaining() <= 0
+
+    def tick(self):
+        """
+        Advances the level if its time ran out.
+
+        :returns: ``True`` if the state changed.
+        """
+        if not self._expired():
+            return False
+        with self._change():
+            # Another process may have advanced it meanwhile
+            if self._expired():
+                self._next_level()
+                return True
+            return False
+
+    def state(self):
+        """The clock as a JSON-serializable dict."""
+        with self._lock:
+            small_blind, big_blind, ante, minutes = self.levels[self.level]
+            return {
+                'version': self.version,
+                'status': self.status,
+                'level': self.level + 1,
+                'levels': len(self.levels),
+                'small_blind': small_blind,
+                'big_blind': big_blind,
+                'ante': ante,
+                'remaining': round(self.remaining(), 3),
+                'sent_at': time.time()
+            }
+
+
+class ClockBroadcaster:
+    """
+    ClockBroadcaster pushes clock updates to every connected display as
+    server-sent events.
+
+    One background thread, started with :meth:`start`, watches the clock
+    for expiring levels and sends a heartbeat every `heartbeat` seconds so
+    displays can correct drift. Each update is encoded once and the same
+    message is put on every display's queue. Displays count down locally
+    between updates. A display that falls `backlog` messages behind loses
+    its oldest pending updates. A shared clock is checked every `poll`
+    seconds for changes made by other processes.
+
+    Parameters
+    ----------
+    clock: :class:`TournamentClock`
+        The clock to broadcast.
+
+    heartbeat: :class:`float`
+        Seconds between unprompted updates.
+
+    backlog: :class:`int`
+        The number of pending updates kept per display.
+
+    poll: :class:`float`
+        Seconds between checks of a shared clock.
+    """
+    def __init__(self, clock, heartbeat=5, backlog=16, poll=0.5):
+        self.clock = clock
+        self.heartbeat = heartbeat
+        self.backlog = backlog
+        self.poll = poll
+        self.subscribers = set()
+        self.message = self._encode(clock.state())
+        self.published = 0
+        self.last_fanout = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the background thread. Call it in the serving process, since
+        threads do not survive a fork.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='clock-broadcaster', daemon=True)
+            self._thread.start()
+        return self._thread
+
+    @staticmethod
+    def _encode(state):
+        return f'id: {state["version"]}\nevent: clock\ndata: {json.dumps(state)}\n\n'
+
+    def subscribe(self):
+        """
+        Registers a display.
+
+        :returns: A :class:`queue.Queue` of encoded events, starting with
+            the current state.
+        """
+        q = queue.Queue(maxsize=self.backlog)
+        with self._lock:
+            # A fresh state, since the last message may be a heartbeat old
+            q.put_nowait(self._encode(self.clock.state()))
+            self.subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        """Removes a display registered with :meth:`subscribe`."""
+        with self._lock:
+            self.subscribers.discard(q)
+
+    def publish(self):
+        """Sends the current clock state to every display."""
+        start = time.perf_counter()
+        # Held from encoding to fan-out, so concurrent updates reach displays in order
+        with self._lock:
+            self.message = message = self._encode(self.clock.state())
+            for q in self.subscribers:
+                while True:
+                    try:
+                        q.put_nowait(message)
+                        break
+                    except queue.Full:
+                        try:
+                            q.get_nowait()
+                        except queue.Empty:
+                            pass
+            self.published += 1
+        # Time to hand one update to every display, for latency monitoring
+        self.last_fanout = time.perf_counter() - start
+        FANOUT_SECONDS.observe(self.last_fanout)
+        CLOCK_UPDATES.inc()
+
+    def notify(self):
+        """Publishes right away after the director changed the clock."""
+        self.publish()
+        self._wake.set()
+
+    def _run(self):
+        last = time.monotonic()
+        while True:
+            timeout = self.heartbeat
+            if self.clock.status == 'running':
+                timeout = min(timeout, self.clock.remaining())
+            if self.clock.path is not None:
+                timeout = min(timeout, self.poll)
+            if self._wake.wait(timeout):
+                # The director already published the change, only the timeout moved
+                self._wake.clear()
+                last = time.monotonic()
+                continue
+            changed = self.clock.sync()
+            changed = self.clock.tick() or changed
+            if changed or time.monotonic() - last >= self.heartbeat:
+                self.publish()
+                last = time.monotonic()
+
+
+class ClockEventServer:
+    """
+    ClockEventServer streams a shared clock to displays from its own
+    process, so that open streams do not hold the threads of the app's
+    workers. Every display is served by one :mod:`asyncio` event loop, and
+    the workers change the clock through the file both follow.
+
+    Parameters
+    ----------
+    clock: :class:`TournamentClock`
+        The clock to stream, usually from :meth:`TournamentClock.load`.
+
+    heartbeat: :class:`float`
+        Seconds between unprompted updates.
+
+    backlog: :class:`int`
+        The number of pending updates kept per display.
+
+    poll: :class:`float`
+        Seconds between checks of the clock for changes.
+    """
+    HEADERS = (b'HTTP/1.1 200 OK\r\n'
+               b'Content-Type: text/event-stream\r\n'
+               b'Cache-Control: no-cache\r\n'
+               b'X-Accel-Buffering: no\r\n'
+               # The page is served by the app, on another port
+               b'Access-Control-Allow-Origin: *\r\n'
+               b'Connection: close\r\n\r\n')
+    NOT_FOUND = b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'
+
+    def __init__(self, clock, heartbeat=5, backlog=16, poll=0.5):
+        self.clock = clock
+        self.heartbeat = heartbeat
+        self.backlog = backlog
+        self.poll = poll
+        self.subscribers = set()
+        self.servers = []
+
+    def _message(self):
+        return ClockBroadcaster._encode(self.clock.state()).encode()
+
+    async def _follow(self):
+        last = time.monotonic()
+        while True:
+            changed = self.clock.sync()
+            changed = self.clock.tick() or changed
+            if changed or time.monotonic() - last >= self.heartbeat:
+                start = time.perf_counter()
+                message = self._message()
+                for q in self.subscribers:
+                    if q.full():
+                        q.get_nowait()
+                    q.put_nowait(message)
+                FANOUT_SECONDS.observe(time.perf_counter() - start)
+                CLOCK_UPDATES.inc()
+                last = time.monotonic()
+            await asyncio.sleep(self.poll)
+
+    async def _handle(self, reader, writer):
+        try:
+            request = (await reader.readline()).split()
+            # Skip the headers
+            while (await reader.readline()).strip():
+                pass
+            if request[:1] != [b'GET'] or request[1].split(b'?')[0] != b'/clock/events':
+                writer.write(self.NOT_FOUND)
+                await writer.drain()
+                return
+            q = asyncio.Queue(self.backlog)
+            q.put_nowait(self._message())
+            self.subscribers.add(q)
+            writer.write(self.HEADERS)
+            try:
+                while True:
+                    try:
+                        message = await asyncio.wait_for(q.get(), 30)
+                    except asyncio.TimeoutError:
+                        # Keep idle connections open through proxies
+                        message = b': keepalive\n\n'
+                    writer.write(message)
+                    await writer.drain()
+            finally:
+                self.subscribers.discard(q)
+        except (ConnectionError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        """Serves ``/clock/events`` on `host`:`port` until cancelled."""
+        server = await asyncio.start_server(self._handle, host, port)
+        self.servers.append(server)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self._follow())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streams the shared tournament clock to its displays.')
+    parser.add_argument('--bind', default='127.0.0.1:8001', help='host:port to serve /clock/events on')
+    parser.add_argument('--state', default=CLOCK_PATH, help='the file the app shares the clock through')
+    args = parser.parse_args()
+    host, port = args.bind.rsplit(':', 1)
+    server = ClockEventServer(TournamentClock.load(args.state))
+    metrics.callback('poker_stats_clock_displays', 'Displays following the tournament clock.',
+                     lambda: len(server.subscribers))
+    if os.environ.get('METRICS_DIR'):
+        # Reported on /metrics along with the app's workers
+        metrics.share(os.environ['METRICS_DIR'])
+    try:
+        asyncio.run(server.serve(host, int(port)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
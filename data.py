@@ -1,11 +1,60 @@
+import array
+import bisect
+import copy
+import hashlib
 import json
+import logging
 import os
-import re
-import requests
-from collections import defaultdict
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
 from datetime import datetime
 from pprint import pprint
 
+import metrics
+from identity import ALIASES_PATH, IdentityResolver
+from refresh import SHEETS_API_ROOT, SheetRefresher, atomic_write, file_lock
+from sheets import list_sheets, read_records
+
+log = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    # Columnar placement tables are skipped without NumPy
+    np = None
+
+# Bump whenever the Season/Player model changes so stale snapshots are rebuilt
+SNAPSHOT_VERSION = 8
+SNAPSHOT_PATH = 'cache/stats.pickle'
+LAZY_SNAPSHOT_PATH = 'cache/stats-lazy.pickle'
+# Held while downloading sheets and writing the config, across processes
+REFRESH_LOCK_PATH = 'cache/refresh.lock'
+
+LOAD_SECONDS = metrics.histogram('poker_stats_data_load_seconds',
+                                 'Time spent loading the data folder, from the snapshot or by parsing it.',
+                                 ['source'])
+RELOADS = metrics.counter('poker_stats_data_reloads_total', 'Reloads after the data folder changed.')
+
+
+def deep_sizeof(obj, seen=None):
+    """Estimates the bytes held by an object and everything it references."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(x, seen) for x in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(obj.__dict__, seen)
+    return size
+
 class Season:
     """
     Seasons keep track of all data for a particular season.
@@ -13,18 +62,49 @@ class Season:
     Parameters
     ----------
     name: :class:`str`
-        The name of the season, e.g. "2016F-FH"
+        The name of the season, e.g. "2016F First Half"
 
     season_num: :class:`int`
         The number of the season.
 
+    sheet: :class:`str`
+        The title of the sheet the season was read from, e.g. "2016F-FH"
+
     players: List[:class:`Player`]
-        A list of Player objects that participated in this season.
+        A list of Player objects that participated in this season. Each
+        player's :attr:`Player.rank` is set from the season's points.
+
+    num_tournaments: :class:`int`
+        The number of tournaments scheduled in this season.
+
+    columns: Optional[:class:`PlacementTable`]
+        The placements of :attr:`players` as arrays, or ``None`` if NumPy
+        is not installed.
+
+    index: Dict[:class:`str`, :class:`Player`]
+        The players of this season mapped to their names.
     """
-    def __init__(self, name, season_num, players):
+    def __init__(self, name, season_num, players, num_tournaments=0, columns=None, sheet=None):
         self.name = name
         self.season_num = season_num
+        self.sheet = sheet or name
         self.players = players
+        self.num_tournaments = num_tournaments
+        self.columns = columns
+        self.index = {player.name: player for player in players}
+        for rank, player in enumerate(sorted(players, key=lambda p: p.total_points, reverse=True)):
+            player.rank = rank
+
+    @staticmethod
+    def read_header(file):
+        """
+        Reads the season name and number of a local data file.
+
+        :param str file: The name of the data file.
+        :returns: A ``(name, season_num)`` tuple.
+        """
+        header = next(read_records(f'data/{file}'))
+        return header['season'], header['season_num']
 
     @classmethod
     def from_file(cls, file):
@@ -32,45 +112,62 @@ class Season:
         Opens a local data file and parses the cell values.
         Used to create Season objects through :class:`Stats`
 
-        :param str file: The name of the file containing JSON data.
+        Both the compact ``.ndjson`` files written by the refresher and
+        legacy ``.json`` sheet dumps are accepted; see :mod:`sheets`.
+
+        :param str file: The name of the data file.
         :returns: :class:`Season` representing the input file.
         """
-        with open(f'data/{file}') as f:
-            values = json.load(f)['values']
-        season_name = None
-        season_num = None
+        records = read_records(f'data/{file}')
+        header = next(records)
+        season_num = header['season_num']
+        num_tournaments = header['tournaments']
         players = []
-        num_tournaments = 0
-        for i, data in enumerate(values):
-            if not data:
+        for bonus_points, total_points, name, tournament_data in records:
+            placements = []
+            for tournament, place, points in tournament_data:
+                placement = {
+                'tournament': f'Tournament {tournament}',
+                'place': place,
+                'points': points
+                }
+                placements.append(placement)
+            player = Player(season_num, bonus_points, total_points, name, placements)
+            players.append(player)
+        columns = PlacementTable.from_players(players, num_tournaments) if np else None
+        sheet = os.path.splitext(file)[0]
+        return cls(header['season'], season_num, players, num_tournaments, columns, sheet)
+
+    def rename_players(self, mapping):
+        """
+        Renames players, e.g. to merge the spellings of a name found by
+        :class:`identity.IdentityResolver`. A name already used by another
+        player of the season is left unchanged.
+
+        :param mapping: New names mapped to the current ones.
+        """
+        for player in self.players:
+            name = mapping.get(player.name)
+            if name is None or name == player.name:
+                continue
+            if name in self.index:
+                log.warning('Not renaming %s to %s in %s, which has both', player.name, name, self.name)
                 continue
-            if i == 0:
-                season_name, season_num = re.match(r'(.+) \(Season (\d+)\)', data[1]).groups()
-                num_tournaments = len([x for x in data if 'Tourn' in x])
-            elif i > 2:
-                if len(data) < 4:
-                    continue
-                _, bonus_points, total_points, name, *tournament_data = data
-                if total_points == '0' or total_points == '':
-                    continue
-                bonus_points = int(bonus_points or '0')
-                total_points = float(total_points)
-                placements = []
-                for i in range(1, min(len(tournament_data) - 1, 2 * num_tournaments), 2):
-                    tournament_name = f'Tournament {(i + 1) // 2}'
-                    place = int(tournament_data[i] or 0)
-                    if place == 0:
-                        continue
-                    points = float(tournament_data[i + 1])
-                    placement = {
-                    'tournament': tournament_name,
-                    'place': place,
-                    'points': points
-                    }
-                    placements.append(placement)
-                player = Player(season_num, bonus_points, total_points, name, placements)
-                players.append(player)
-        return cls(season_name, season_num, players)
+            del self.index[player.name]
+            player.name = name
+            self.index[name] = player
+        if self.columns is not None:
+            self.columns.names = [player.name for player in self.players]
+
+    def get_player(self, name):
+        """
+        Looks up a player of this season by name.
+
+        :param str name: The parsed player name, e.g. "John Doe"
+        :returns: The matching :class:`Player`, or ``None`` if the player
+            did not take part in this season.
+        """
+        return self.index.get(name)
 
     def __repr__(self):
         return f'{len(self.players)} players'
@@ -124,6 +221,716 @@ class Player:
         return f'{self.name} ({self.total_points} pts.)'
 
 
+class PlayerProfile:
+    """
+    PlayerProfile summarizes a player's results in every season they played.
+
+    Profiles are built by :class:`Stats` whenever the data is loaded, so
+    showing a profile does not require walking any placements.
+
+    Parameters
+    ----------
+    name: :class:`str`
+        The player name.
+
+    season_players: Iterable[:class:`tuple`]
+        ``(season name, Player)`` pairs for each season the player
+        entered, oldest first. More seasons can be added later with
+        :meth:`add_season`.
+
+    Attributes
+    ----------
+    seasons: Dict[:class:`str`, :class:`dict`]
+        Per-season summaries mapped to season names, oldest first.
+
+        Example summary:
+
+            >>> profile.seasons['2018F']
+            {
+                'season': '2018F',
+                'tournaments': 6,
+                'best_finish': ('Tournament 4', 2),
+                'final_tables': 3,
+                'top_3': 1,
+                'average_place': 11.17,
+                'total_points': 93.21,
+                'rank': 0,
+                'results': [('Tournament 1', 8), ...]
+            }
+
+        ``rank`` is zero-based, like :attr:`Player.rank`, and
+        ``best_finish`` and ``average_place`` are ``None`` without results.
+
+    career: :class:`dict`
+        The same totals over all seasons. ``best_finish`` also names the
+        season, and ``ranks`` maps season names to the season rank.
+    """
+    def __init__(self, name, season_players=()):
+        self.name = name
+        self.seasons = {}
+        self._reset_career()
+        for season_name, player in season_players:
+            self.add_season(season_name, player)
+
+    def _reset_career(self):
+        self.career = {
+            'seasons': 0,
+            'tournaments': 0,
+            'best_finish': None,
+            'final_tables': 0,
+            'top_3': 0,
+            'average_place': None,
+            'total_points': 0,
+            'ranks': {}
+        }
+        self._place_sum = 0
+        self._points_sum = 0
+
+    def add_season(self, season_name, player):
+        """
+        Adds the player's results in a season. Seasons must be added in
+        chronological order. Adding a season again replaces its summary,
+        e.g. after a result was entered live.
+
+        :param str season_name: The name of the season.
+        :param player: The :class:`Player` entry of that season.
+        """
+        summary = self._summarize(player.placements)
+        summary.update({
+            'season': season_name,
+            'total_points': player.total_points,
+            'rank': player.rank
+        })
+        if season_name in self.seasons:
+            self.seasons[season_name] = summary
+            self._reset_career()
+            for season_summary in self.seasons.values():
+                self._count(season_summary)
+        else:
+            self.seasons[season_name] = summary
+            self._count(summary)
+
+    def _count(self, summary):
+        """Adds a season summary to the career totals."""
+        career = self.career
+        career['seasons'] += 1
+        career['tournaments'] += summary['tournaments']
+        career['final_tables'] += summary['final_tables']
+        career['top_3'] += summary['top_3']
+        career['ranks'][summary['season']] = summary['rank']
+        self._place_sum += sum(place for _, place in summary['results'])
+        self._points_sum += summary['total_points']
+        if career['tournaments']:
+            career['average_place'] = round(self._place_sum / career['tournaments'], 2)
+        career['total_points'] = round(self._points_sum, 2)
+        best = summary['best_finish']
+        if best and (career['best_finish'] is None or best[1] < career['best_finish'][2]):
+            career['best_finish'] = (summary['season'], *best)
+
+    @staticmethod
+    def _summarize(placements):
+        places = [x['place'] for x in placements]
+        best = min(placements, key=lambda x: x['place'], default=None)
+        return {
+            'tournaments': len(places),
+            'best_finish': best and (best['tournament'], best['place']),
+            'final_tables': sum(0 < x < 10 for x in places),
+            'top_3': sum(0 < x < 4 for x in places),
+            'average_place': round(sum(places) / len(places), 2) if places else None,
+            'results': [(x['tournament'], x['place']) for x in placements]
+        }
+
+    def __repr__(self):
+        return f'{self.name} ({len(self.seasons)} seasons)'
+
+
+class PlacementTable:
+    """
+    PlacementTable stores the placements of a season in columnar form.
+
+    Row ``i`` of each matrix belongs to the ``i``-th player of the season and
+    column ``j`` to "Tournament j+1", so leaderboards can be computed with
+    array operations instead of walking every placement dict.
+
+    Parameters
+    ----------
+    names: List[:class:`str`]
+        The player names, in the same order as :attr:`Season.players`.
+
+    places: :class:`numpy.ndarray`
+        A players × tournaments matrix of finishing places. Tournaments a
+        player did not play are ``0``.
+
+    points: :class:`numpy.ndarray`
+        A players × tournaments matrix of points earned.
+    """
+    def __init__(self, names, places, points):
+        self.names = names
+        self.places = places
+        self.points = points
+
+    @classmethod
+    def from_players(cls, players, num_tournaments):
+        """
+        Builds the matrices from the placements of each player.
+
+        :param players: List[:class:`Player`]
+        :param int num_tournaments: The number of tournament columns.
+        :returns: :class:`PlacementTable`
+        """
+        places = np.zeros((len(players), num_tournaments), dtype=np.int32)
+        points = np.zeros((len(players), num_tournaments), dtype=np.float64)
+        for row, player in enumerate(players):
+            for placement in player.placements:
+                col = int(placement['tournament'].rsplit(' ', 1)[1]) - 1
+                places[row, col] = placement['place']
+                points[row, col] = placement['points']
+        return cls([player.name for player in players], places, points)
+
+    def add_row(self, name):
+        """
+        Adds an empty row for a new player.
+
+        :returns: The index of the row.
+        """
+        self.names.append(name)
+        self.places = np.vstack([self.places, np.zeros((1, self.places.shape[1]), dtype=self.places.dtype)])
+        self.points = np.vstack([self.points, np.zeros((1, self.points.shape[1]), dtype=self.points.dtype)])
+        return len(self.names) - 1
+
+    def set_result(self, row, tournament, place, points):
+        """Stores the result of the player in `row` in "Tournament `tournament`"."""
+        self.places[row, tournament - 1] = place
+        self.points[row, tournament - 1] = points
+
+    @property
+    def played(self):
+        """A boolean matrix of the tournaments each player entered."""
+        return self.places > 0
+
+    def attendance(self):
+        """The number of tournaments each player entered."""
+        return self.played.sum(axis=1)
+
+    def entrants(self):
+        """The number of players in each tournament."""
+        return self.played.sum(axis=0)
+
+    def count_places(self, below):
+        """The number of finishes better than `below` for each player."""
+        return (self.played & (self.places < below)).sum(axis=1)
+
+    def longest_streak(self, below):
+        """
+        The longest run of finishes better than `below` for each player.
+
+        Tournaments a player skipped neither extend nor break a run.
+        """
+        if not self.places.shape[1]:
+            return np.zeros(len(self.names), dtype=np.int64)
+        hits = self.played & (self.places < below)
+        misses = self.played & ~hits
+        total = np.cumsum(hits, axis=1)
+        # Hits counted up to the most recent miss, carried forward
+        base = np.maximum.accumulate(np.where(misses, total, 0), axis=1)
+        return (total - base).max(axis=1)
+
+
+# A player of a SeasonResults, with what PlayerProfile.add_season reads of a Player
+ResultsPlayer = namedtuple('ResultsPlayer', 'name placements total_points rank')
+
+
+class SeasonResults:
+    """
+    SeasonResults holds the results of a season in a compact form, which
+    the passes over the whole history read instead of the seasons: profiles,
+    identity resolution, head-to-head records, ratings and projections.
+    A :class:`LazySeasonRegistry` keeps it for every season it has read, so
+    these passes do not load evicted seasons again.
+
+    Parameters
+    ----------
+    name: :class:`str`
+        The name of the season.
+
+    num_tournaments: :class:`int`
+        The number of tournaments scheduled in the season.
+
+    names: List[:class:`str`]
+        The player names, one per row.
+
+    totals: List[:class:`float`]
+        The total points of each row.
+
+    ranks: List[:class:`int`]
+        The zero-based season rank of each row.
+
+    rows: :class:`array.array`
+        The row of each result.
+
+    tournaments: :class:`array.array`
+        The tournament number of each result, from 1.
+
+    places: :class:`array.array`
+        The place of each result.
+    """
+    def __init__(self, name, num_tournaments, names, totals, ranks, rows, tournaments, places):
+        self.name = name
+        self.num_tournaments = num_tournaments
+        self.names = names
+        self.totals = totals
+        self.ranks = ranks
+        self.rows = rows
+        self.tournaments = tournaments
+        self.places = places
+
+    @classmethod
+    def from_season(cls, season):
+        """
+        :param season: The :class:`Season` to summarize.
+        :returns: :class:`SeasonResults`
+        """
+        rows, tournaments, places = array.array('i'), array.array('i'), array.array('i')
+        for row, player in enumerate(season.players):
+            for placement in player.placements:
+                rows.append(row)
+                tournaments.append(int(placement['tournament'].rsplit(' ', 1)[1]))
+                places.append(placement['place'])
+        players = season.players
+        return cls(season.name, season.num_tournaments, [p.name for p in players],
+                   [p.total_points for p in players], [p.rank for p in players], rows, tournaments, places)
+
+    def counts(self):
+        """The number of results of each row."""
+        counts = [0] * len(self.names)
+        for row in self.rows:
+            counts[row] += 1
+        return counts
+
+    def players(self):
+        """
+        The players of the season, in row order, for :meth:`PlayerProfile.add_season`.
+
+        :returns: A list of :class:`ResultsPlayer`.
+        """
+        placements = [[] for _ in self.names]
+        for row, tournament, place in zip(self.rows, self.tournaments, self.places):
+            placements[row].append({'tournament': f'Tournament {tournament}', 'place': place})
+        return [ResultsPlayer(*fields) for fields in zip(self.names, placements, self.totals, self.ranks)]
+
+    def rename_players(self, mapping):
+        """Renames players like :meth:`Season.rename_players`, which this must follow."""
+        taken = set(self.names)
+        for row, name in enumerate(self.names):
+            new = mapping.get(name)
+            if new is None or new == name or new in taken:
+                continue
+            taken.discard(name)
+            taken.add(new)
+            self.names[row] = new
+
+
+class NameIndex:
+    """
+    NameIndex is a case-insensitive trigram index over player names.
+
+    Each name is lowercased and broken into overlapping three letter grams,
+    e.g. "john" becomes "joh" and "ohn". A query only has to intersect the
+    posting lists of its own grams, so lookups touch the names that could
+    match instead of every player. Queries shorter than three letters fall
+    back to a binary search over the sorted words of the names, which is
+    enough for completing any of their words. The spellings merged into a
+    name are indexed too, and find the name they were merged into.
+
+    Parameters
+    ----------
+    names: Iterable[:class:`str`]
+        The player names to index. Duplicates are ignored.
+
+    aliases: Optional[Dict[:class:`str`, :class:`str`]]
+        Other spellings mapped to the name they stand for, like
+        :attr:`Stats.aliases`. Those of names not indexed are ignored.
+    """
+    # Ranks of a match, best first
+    EXACT, PREFIX, WORD_PREFIX, SUBSTRING = range(4)
+
+    def __init__(self, names, aliases=None):
+        self.names = sorted(set(names), key=lambda name: (name.lower(), name))
+        spellings = {name: name for name in self.names}
+        for alias, name in (aliases or {}).items():
+            if name in spellings:
+                spellings.setdefault(alias, name)
+        # Every spelling, lowercased, and the name it finds
+        entries = sorted((spelling.lower(), name) for spelling, name in spellings.items())
+        self.keys = [key for key, _ in entries]
+        self.targets = [name for _, name in entries]
+        self.grams = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            for gram in set(self._trigrams(key)):
+                self.grams[gram].append(i)
+        self.words = sorted((word, i) for i, key in enumerate(self.keys) for word in set(key.split()))
+
+    @staticmethod
+    def _trigrams(text):
+        return [text[i:i + 3] for i in range(len(text) - 2)]
+
+    def _candidates(self, query):
+        """Yields the ids of names that may contain `query`."""
+        if len(query) < 3:
+            # Only word prefixes are worth completing for very short queries
+            seen = set()
+            start = bisect.bisect_left(self.words, (query,))
+            for j in range(start, len(self.words)):
+                word, i = self.words[j]
+                if not word.startswith(query):
+                    break
+                if i not in seen:
+                    seen.add(i)
+                    yield i
+            return
+        postings = sorted((self.grams.get(gram, []) for gram in set(self._trigrams(query))), key=len)
+        if not postings[0]:
+            return
+        others = [set(ids) for ids in postings[1:]]
+        for i in postings[0]:
+            if all(i in ids for ids in others):
+                yield i
+
+    def _rank(self, query, key):
+        if key == query:
+            return self.EXACT
+        if key.startswith(query):
+            return self.PREFIX
+        if any(word.startswith(query) for word in key.split()):
+            return self.WORD_PREFIX
+        if query in key:
+            return self.SUBSTRING
+        return None
+
+    def search(self, query, limit=10, within=None):
+        """
+        Finds the names containing `query`, ignoring case, or with a
+        spelling merged into them that contains it.
+
+        Exact matches come first, followed by names starting with the
+        query, names with a word starting with the query, and finally any
+        other name containing it. Ties are ordered alphabetically.
+
+        :param str query: The text to look for.
+        :param int limit: The maximum number of names to return, or ``None``
+            to return every match.
+        :param within: An optional container of names, such as
+            :attr:`Season.index`, that results are restricted to.
+        :returns: A list of matching names.
+        """
+        query = ' '.join(query.lower().split())
+        if not query:
+            return []
+        best = {}
+        for i in self._candidates(query):
+            name = self.targets[i]
+            if within is not None and name not in within:
+                continue
+            rank = self._rank(query, self.keys[i])
+            if rank is not None and rank < best.get(name, rank + 1):
+                # The best match among the spellings of a name
+                best[name] = rank
+        matches = sorted(best, key=lambda name: (best[name], name.lower(), name))
+        if limit is not None:
+            matches = matches[:limit]
+        return matches
+
+    def __len__(self):
+        return len(self.names)
+
+
+class SeasonRegistry:
+    """
+    SeasonRegistry holds every :class:`Season` of the league.
+
+    Seasons can be looked up by name ("2017S Second Half"), by sheet title
+    ("2017S-SH") or by season number (``4``), and iterating the registry
+    yields seasons in chronological order according to :func:`season_sort`.
+
+    Parameters
+    ----------
+    seasons: Iterable[:class:`Season`]
+        The seasons to register.
+    """
+    def __init__(self, seasons=()):
+        self._by_key = {}
+        self._by_number = {}
+        self._order = []
+        for season in seasons:
+            self.add(season)
+
+    @classmethod
+    def from_directory(cls, path='data'):
+        """
+        Discovers and parses every season sheet in a data folder.
+
+        :param str path: The data folder.
+        :returns: :class:`SeasonRegistry`
+        """
+        return cls(Season.from_file(file) for file in list_sheets(path).values())
+
+    def add(self, season):
+        """Registers a season, replacing any season with the same name."""
+        old = self._by_key.get(season.name)
+        if old is not None:
+            self._order.remove(old)
+            del self._by_key[old.sheet]
+        self._by_key[season.name] = season
+        self._by_key[season.sheet] = season
+        self._by_number[int(season.season_num)] = season
+        keys = [season_sort(s.name) for s in self._order]
+        self._order.insert(bisect.bisect(keys, season_sort(season.name)), season)
+
+    def rename_players(self, mapping):
+        """Renames players in every season, see :meth:`Season.rename_players`."""
+        for season in self:
+            season.rename_players(mapping)
+
+    def get(self, key, default=None):
+        """Looks up a season by name, sheet title or number."""
+        if isinstance(key, int):
+            return self._by_number.get(key, default)
+        return self._by_key.get(key, default)
+
+    def __getitem__(self, key):
+        season = self.get(key)
+        if season is None:
+            raise KeyError(key)
+        return season
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def names(self):
+        """The season names in chronological order."""
+        return [season.name for season in self._order]
+
+    def results(self):
+        """
+        The :class:`SeasonResults` of every season in chronological order,
+        for the passes over the whole history.
+        """
+        for season in self._order:
+            yield SeasonResults.from_season(season)
+
+    def pin(self, key):
+        """Keeps a season in memory, as every season of this registry is."""
+
+    @property
+    def latest(self):
+        """The most recent season, or ``None`` if there are none."""
+        return self._order[-1] if self._order else None
+
+    def residency(self):
+        """
+        Reports which seasons are in memory and roughly how many bytes they
+        take, along with the number of loads, cache hits and evictions.
+        """
+        return {
+            'resident': self.names(),
+            'resident_bytes': deep_sizeof(self._order),
+            'loads': len(self._order),
+            'hits': 0,
+            'evictions': 0
+        }
+
+    def __repr__(self):
+        return repr(self._order)
+
+
+class LazySeasonRegistry(SeasonRegistry):
+    """
+    LazySeasonRegistry parses seasons on first access instead of up front.
+
+    Pinned seasons always stay loaded: the current one, which is the
+    latest unless named, and any season pinned later with :meth:`pin`,
+    e.g. because results were entered in it. At most `max_resident` other
+    seasons are kept, and the least recently used one is dropped when
+    another is loaded. Names and numbers of every season come from a
+    manifest, so lookups and :meth:`names` do not load anything.
+
+    The :class:`SeasonResults` of a season are kept once it has been read,
+    and updated when it is dropped, so :meth:`results` reads each season at
+    most once.
+
+    Parameters
+    ----------
+    manifest: Dict[:class:`str`, :class:`tuple`]
+        ``(name, season_num)`` of each season mapped to its sheet title.
+
+    pinned: Optional[:class:`str`]
+        The name, sheet title or number of the current season.
+
+    max_resident: :class:`int`
+        The maximum number of other seasons kept in memory.
+
+    results: Dict[:class:`str`, :class:`SeasonResults`]
+        The results of seasons read before, mapped to their sheet titles.
+    """
+    def __init__(self, manifest, pinned=None, max_resident=2, results=None):
+        self.manifest = manifest
+        self.max_resident = max_resident
+        self.files = list_sheets('data')
+        self._sheets = {}
+        self._numbers = {}
+        for sheet, (name, season_num) in manifest.items():
+            self._sheets[name] = sheet
+            self._sheets[sheet] = sheet
+            self._numbers[int(season_num)] = sheet
+        self._order = sorted(manifest, key=lambda sheet: season_sort(manifest[sheet][0]))
+        self._resident = OrderedDict()
+        self._results = dict(results or {})
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.aliases = {}
+        self._pinned = {}
+        current = self._resolve(pinned) or (self._order[-1] if self._order else None)
+        if current:
+            self.pin(current)
+
+    @classmethod
+    def from_directory(cls, path='data', pinned=None, max_resident=2):
+        """
+        Builds the manifest by reading the header of every season sheet.
+
+        :returns: :class:`LazySeasonRegistry`
+        """
+        manifest = {sheet: Season.read_header(file) for sheet, file in list_sheets(path).items()}
+        return cls(manifest, pinned, max_resident)
+
+    def _resolve(self, key):
+        if isinstance(key, int):
+            return self._numbers.get(key)
+        return self._sheets.get(key)
+
+    def _load(self, sheet):
+        season = self._pinned.get(sheet)
+        if season is not None:
+            self.hits += 1
+            return season
+        with self._lock:
+            season = self._resident.get(sheet)
+            if season is not None:
+                self._resident.move_to_end(sheet)
+                self.hits += 1
+                return season
+            self.loads += 1
+            season = Season.from_file(self.files[sheet])
+            season.rename_players(self.aliases)
+            self._resident[sheet] = season
+            if sheet not in self._results:
+                self._results[sheet] = SeasonResults.from_season(season)
+            while len(self._resident) > self.max_resident:
+                evicted, old = self._resident.popitem(last=False)
+                # Keep any result entered in memory
+                self._results[evicted] = SeasonResults.from_season(old)
+                self.evictions += 1
+            return season
+
+    def pin(self, key):
+        """Keeps a season in memory from now on, loading it if needed."""
+        sheet = self._resolve(key)
+        if sheet is None or sheet in self._pinned:
+            return
+        with self._lock:
+            season = self._resident.pop(sheet, None) or self._load(sheet)
+            self._resident.pop(sheet, None)
+            self._pinned[sheet] = season
+
+    def results(self):
+        """
+        The :class:`SeasonResults` of every season in chronological order.
+        Seasons in memory are summarized as they are now, the others from
+        their kept results, and only seasons never read are loaded.
+        """
+        for sheet in self._order:
+            with self._lock:
+                season = self._pinned.get(sheet) or self._resident.get(sheet)
+                results = self._results.get(sheet) if season is None else None
+            if results is None:
+                season = season or self._load(sheet)
+                results = SeasonResults.from_season(season)
+            yield results
+
+    def add(self, season):
+        raise TypeError('seasons of a lazy registry are read from the data folder')
+
+    def rename_players(self, mapping):
+        """Renames players in the loaded seasons and in every season loaded later."""
+        with self._lock:
+            self.aliases = mapping
+            for season in [*self._resident.values(), *self._pinned.values()]:
+                season.rename_players(mapping)
+            for results in self._results.values():
+                results.rename_players(mapping)
+
+    def get(self, key, default=None):
+        sheet = self._resolve(key)
+        if sheet is None:
+            return default
+        return self._load(sheet)
+
+    def __contains__(self, key):
+        return self._resolve(key) is not None
+
+    def __iter__(self):
+        for sheet in self._order:
+            yield self._load(sheet)
+
+    def __len__(self):
+        return len(self._order)
+
+    def names(self):
+        return [self.manifest[sheet][0] for sheet in self._order]
+
+    @property
+    def latest(self):
+        return self._load(self._order[-1]) if self._order else None
+
+    def residency(self):
+        seasons = [*self._resident.values(), *self._pinned.values()]
+        return {
+            'resident': [season.name for season in seasons],
+            'resident_bytes': deep_sizeof(seasons),
+            'loads': self.loads,
+            'hits': self.hits,
+            'evictions': self.evictions
+        }
+
+    def summaries(self):
+        """The :class:`SeasonResults` of every season read so far, mapped to their sheet titles."""
+        with self._lock:
+            results = dict(self._results)
+            for sheet, season in [*self._resident.items(), *self._pinned.items()]:
+                results[sheet] = SeasonResults.from_season(season)
+        return results
+
+    def __getstate__(self):
+        # Resident seasons are a cache, so only the manifest and the results are pickled
+        current = next(iter(self._pinned), None)
+        return {'manifest': self.manifest, 'pinned': current, 'max_resident': self.max_resident,
+                'results': self.summaries()}
+
+    def __setstate__(self, state):
+        self.__init__(state['manifest'], state['pinned'], state['max_resident'], state['results'])
+
+    def __repr__(self):
+        return f'{len(self)} seasons, {len(self._resident) + len(self._pinned)} resident'
+
+
 class Stats:
     """
     Stats is a wrapper for all player and tournament data.
@@ -133,7 +940,7 @@ class Stats:
     cur_season: :class:`str`
         The current season name.
 
-    seasons: List[:class:`Season`]
+    seasons: :class:`SeasonRegistry`
         A collection of season objects mapped to their name.
 
     players: Dict[:class:`str`, :class:`dict`]
@@ -149,39 +956,139 @@ class Stats:
                 'ranks': [8, 17]
             }
 
+    profiles: Dict[:class:`str`, :class:`PlayerProfile`]
+        Profile summaries mapped to player names.
+
+    search_index: :class:`NameIndex`
+        A search index over the names of every player in every season, and
+        the spellings merged into them.
+
+    aliases: Dict[:class:`str`, :class:`str`]
+        Each spelling of a player's name that was merged mapped to the name
+        their results are listed under, see :mod:`identity`. Names are
+        resolved when the data is parsed, before players and profiles are
+        built, following the alias file :data:`identity.ALIASES_PATH`.
+
+    data_version: :class:`str`
+        A fingerprint of the files in the data folder. Parsed seasons are
+        snapshotted to :data:`SNAPSHOT_PATH` under this key, so a process
+        only re-parses the JSON sheets when one of them has changed. It
+        also changes with every edit made in memory, see :meth:`mark_changed`.
+
+    data_modified: :class:`float`
+        The latest modification time of a file in the data folder, or of
+        an edit made in memory, as a Unix timestamp.
+
+    refresher: :class:`refresh.SheetRefresher`
+        Downloads sheets from the Sheets API. Set ``api_root`` in the
+        config file to use a different endpoint.
+
+    Parameters
+    ----------
+    lazy: :class:`bool`
+        Only load the current season up front and parse older seasons
+        when they are first used, through a :class:`LazySeasonRegistry`.
+        :attr:`players` is ``None`` in this mode; profiles and search are
+        built from a single pass over the seasons and snapshotted along
+        with their :class:`SeasonResults`. The app turns it on with the
+        ``LAZY_SEASONS`` environment variable.
+
+    max_resident: :class:`int`
+        The number of older seasons kept in memory in lazy mode.
     """
 
-    def __init__(self):
+    def __init__(self, lazy=False, max_resident=2):
+        self.lazy = lazy
+        self.max_resident = max_resident
         config = self._get_config()
         self.spreadsheet_id = config.get('spreadsheet_id')
         with open('api_key.txt') as f:
-            self.api_key = f.read()
+            self.api_key = f.read().strip()
         self.last_timestamp = config.get('last_timestamp')
         self.cur_season = config.get('cur_season')
 
-        # If the time difference is greater than 1 week, retrieve data
-        current_timestamp = datetime.now()
-        difference = current_timestamp - datetime.strptime(self.last_timestamp, '%Y-%m-%d %H:%M:%S.%f')
-        if difference.days >= 7:
-            self._update_local_data(current_timestamp)
-        
-        # Parse all season data
-        self.seasons = []
-        self._parse_seasons()
+        self.refresher = SheetRefresher(self.spreadsheet_id, self.api_key,
+                                        api_root=config.get('api_root', SHEETS_API_ROOT))
+        self._load()
 
-        # Extrapolate player data from season data
-        self.players = {}
-        self._parse_players()
+    def _load(self):
+        """Loads the data folder, using the snapshot if it is up to date."""
+        start = time.perf_counter()
+        files = self._data_files()
+        self.data_version = self.files_version = self._data_fingerprint(files)
+        self.data_modified = max((mtime for _, _, mtime in files), default=0) / 1e9
+        self.seasons = SeasonRegistry()
+        self.players = None if self.lazy else {}
+        self.profiles = {}
+        self.aliases = {}
+        source = 'snapshot'
+        if not self._load_snapshot():
+            source = 'parse'
+            self._parse_seasons()
+            self._resolve_identities()
+            if not self.lazy:
+                # Extrapolate player data from season data
+                self._parse_players()
+            self._build_profiles()
+            self._save_snapshot()
+        self._build_indexes()
+        LOAD_SECONDS.observe(time.perf_counter() - start, source=source)
 
-    @property
-    def _base_uri(self):
-        """The base URI for all Sheets API requests."""
-        return f'https://sheets.googleapis.com/v4/spreadsheets/{self.spreadsheet_id}'
+    def reload(self):
+        """
+        Reloads the data folder if any file in it changed.
+
+        The new data is loaded on a copy and swapped in all at once, so
+        requests served meanwhile keep seeing a consistent snapshot.
+
+        :returns: ``True`` if the data was reloaded.
+        """
+        if self._data_fingerprint() == self.files_version:
+            return False
+        staged = copy.copy(self)
+        staged._load()
+        self.__dict__.update(staged.__dict__)
+        RELOADS.inc()
+        return True
 
     @property
-    def _api_query(self):
-        """Query parameter used as a suffix to all API requests."""
-        return f'?key={self.api_key}'
+    def refresh_due(self):
+        """Whether the local data was last retrieved more than a week ago."""
+        difference = datetime.now() - datetime.strptime(self.last_timestamp, '%Y-%m-%d %H:%M:%S.%f')
+        return difference.days >= 7
+
+    def update(self, only_if_due=False):
+        """
+        Retrieves the latest sheets and reloads the data.
+
+        Processes sharing the data folder, like the workers of a pre-fork
+        server, take turns through a lock on :data:`REFRESH_LOCK_PATH`, so
+        only one of them downloads and writes the files at a time.
+
+        :param bool only_if_due: Once the lock is held, re-read the config
+            and skip the download unless the data is still
+            :attr:`refresh_due`, i.e. no other process refreshed it meanwhile.
+        """
+        with file_lock(REFRESH_LOCK_PATH):
+            if only_if_due:
+                config = self._get_config()
+                self.last_timestamp = config.get('last_timestamp')
+                self.cur_season = config.get('cur_season')
+            if not only_if_due or self.refresh_due:
+                self._update_local_data(datetime.now())
+        self.reload()
+
+    def start_refresher(self, interval=3600):
+        """
+        Checks every `interval` seconds, in a background thread, whether
+        the data is due for a refresh and updates it if so.
+
+        :returns: The background :class:`threading.Thread`
+        """
+        def job():
+            if self.refresh_due:
+                self.update(only_if_due=True)
+        return self.refresher.schedule(interval, job)
 
     def _get_config(self):
         """Reads and returns the configuration object saved locally as a JSON file."""
@@ -192,60 +1099,106 @@ class Stats:
 
     def _update_local_data(self, timestamp):
         """Updates the local file copies of sheet data."""
-        names = self._get_sheet_names()
+        names = self.refresher.refresh()
         cur_season = names[0]
 
-        # If sheets do not exist, cache them
-        for name in names:
-            path = f'data/{name}.json'
-            # Always update the latest sheet
-            if name == cur_season or not os.path.exists(path):
-                data = self._get_sheet(name)
-                with open(path, 'w') as f:
-                    json.dump(data, f, indent=4)
-
         # Update config file
-        config = {
-            "spreadsheet_id": self.spreadsheet_id,
-            "api_key": self.api_key,
+        config = self._get_config()
+        config.update({
             "last_timestamp": str(timestamp),
             "cur_season": cur_season
-        }
-        with open('config.json', 'w') as f:
-            json.dump(config, f, indent=4)
+        })
+        atomic_write('config.json', lambda f: json.dump(config, f, indent=4))
+        self.last_timestamp = config['last_timestamp']
+        self.cur_season = cur_season
 
-    def _get_sheet_names(self):
-        """Retrieves the sheet names from the JSON data."""
-        uri = self.base_uri + self.api_query
-        try:
-            resp = requests.get(uri).json()
-            sheet_names = [name for name in [sheet['properties']['title'] for sheet in resp['sheets']] if 'test' not in name]
-            return sheet_names
-        except ValueError:
-            print(f'Error decoding JSON from sheet list response')
-
-    def _get_sheet(self, name):
-        """Retrieves sheet data given a title."""
-        uri = self.base_uri + f'/values/{name}' + self.api_query
+    @staticmethod
+    def _data_files():
+        """Lists the name, size and modification time of every data file, and of the alias file."""
+        files = []
+        for file in sorted(list_sheets('data').values()):
+            stat = os.stat(f'data/{file}')
+            files.append((file, stat.st_size, stat.st_mtime_ns))
+        if os.path.exists(ALIASES_PATH):
+            stat = os.stat(ALIASES_PATH)
+            files.append((ALIASES_PATH, stat.st_size, stat.st_mtime_ns))
+        return files
+
+    def _data_fingerprint(self, files=None):
+        """Hashes the name, size and modification time of every data file."""
+        if files is None:
+            files = self._data_files()
+        key = repr((SNAPSHOT_VERSION, files)).encode()
+        return hashlib.sha1(key).hexdigest()
+
+    @property
+    def _snapshot_path(self):
+        return LAZY_SNAPSHOT_PATH if self.lazy else SNAPSHOT_PATH
+
+    def _load_snapshot(self):
+        """
+        Restores seasons, players and profiles from the snapshot file. In
+        lazy mode only the season manifest, the :class:`SeasonResults` and
+        the profiles are stored.
+
+        :returns: ``True`` if the snapshot exists and matches :attr:`data_version`.
+        """
         try:
-            resp = requests.get(uri).json()
-            return resp
-        except ValueError:
-            print(f'Error decoding JSON from sheet {name}')
+            with open(self._snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return False
+        if snapshot.get('data_version') != self.data_version:
+            return False
+        self.aliases = snapshot['aliases']
+        if self.lazy:
+            self.seasons = LazySeasonRegistry(snapshot['manifest'], self.cur_season, self.max_resident,
+                                              snapshot['results'])
+            self.seasons.rename_players(self.aliases)
+        else:
+            self.seasons = snapshot['seasons']
+            self.players = snapshot['players']
+        self.profiles = snapshot['profiles']
+        return True
+
+    def _save_snapshot(self):
+        """Writes the parsed data to the snapshot file."""
+        snapshot = {
+            'data_version': self.data_version,
+            'profiles': self.profiles,
+            'aliases': self.aliases
+        }
+        if self.lazy:
+            snapshot.update({'manifest': self.seasons.manifest, 'results': self.seasons.summaries()})
+        else:
+            snapshot.update({'seasons': self.seasons, 'players': self.players})
+        path = self._snapshot_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a private file first so readers never see a partial snapshot
+        tmp_path = f'{path}.{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
 
     def _parse_seasons(self):
         """Parses all season files in the /data folder."""
-        for file in os.listdir('data'):
-            name = file.rstrip('.json')
-            season = Season.from_file(file)
-            self.seasons.append(season)
+        if self.lazy:
+            self.seasons = LazySeasonRegistry.from_directory('data', self.cur_season, self.max_resident)
+        else:
+            self.seasons = SeasonRegistry.from_directory('data')
+
+    def _resolve_identities(self):
+        """Merges the spellings of each player's name across the parsed seasons."""
+        self.aliases = IdentityResolver.from_file(ALIASES_PATH).resolve(self.seasons.results())
+        self.seasons.rename_players(self.aliases)
+        if self.aliases:
+            log.info('Merged %d spellings of player names', len(self.aliases))
 
     def _parse_players(self):
         """Extracts player information and formats it for convenience."""
         players = defaultdict(dict)
         for season in self.seasons:
-            for rank, player in enumerate(sorted(season.players, key=lambda p: p.total_points, reverse=True)):
-                player.rank = rank
+            for player in season.players:
                 players[player.name][season.name] = player
         for player_name, player_data in players.items():
             season_data = player_data.values()
@@ -253,6 +1206,63 @@ class Stats:
             player_data.update({'ranks': ranks})
             self.players[player_name] = player_data
 
+    def _build_profiles(self):
+        """Summarizes every player from the :class:`SeasonResults`, in chronological order."""
+        self.profiles = {}
+        for results in self.seasons.results():
+            for player in results.players():
+                if player.name not in self.profiles:
+                    self.profiles[player.name] = PlayerProfile(player.name)
+                self.profiles[player.name].add_season(results.name, player)
+
+    def _build_indexes(self):
+        """Builds the lookup structures derived from the parsed data."""
+        self.search_index = NameIndex(self.profiles, self.aliases)
+
+    def record_player(self, season, player):
+        """
+        Updates the profile and player data of a player whose results or
+        rank in `season` changed in memory, e.g. through :mod:`standings`.
+        Call :meth:`mark_changed` once all players are recorded.
+        """
+        profile = self.profiles.get(player.name)
+        if profile is None:
+            profile = self.profiles[player.name] = PlayerProfile(player.name)
+        profile.add_season(season.name, player)
+        if self.players is not None:
+            player_data = self.players.setdefault(player.name, {})
+            player_data.pop('ranks', None)
+            player_data[season.name] = player
+            player_data['ranks'] = [p.rank for p in player_data.values()]
+
+    def mark_changed(self, detail):
+        """
+        Gives :attr:`data_version` a new value, and :attr:`data_modified` the
+        current time, after the data was edited in memory, so everything
+        cached for the old version is recomputed.
+        New players are added to the search index.
+
+        :param str detail: A description of the edit, hashed into the version.
+        """
+        if len(self.profiles) != len(self.search_index):
+            self._build_indexes()
+        self.data_version = hashlib.sha1(f'{self.data_version}:{detail}'.encode()).hexdigest()
+        self.data_modified = time.time()
+
+    def get_profile(self, name):
+        """
+        Looks up the profile of a player.
+
+        :param str name: The parsed player name, e.g. "John Doe", or any
+            spelling of it merged into that name.
+        :returns: :class:`PlayerProfile`, or ``None`` for unknown players.
+        """
+        return self.profiles.get(self.canonical_name(name))
+
+    def canonical_name(self, name):
+        """The name a player's results are listed under, given any merged spelling of it."""
+        return self.aliases.get(name, name)
+
     def __repr__(self):
         return f'Seasons: {self.seasons}'
 
@@ -262,7 +1272,7 @@ def season_sort(x):
 
 def tournament_count(season):
     players = defaultdict(int)
-    player_list = Stats().seasons[-2].players
+    player_list = Stats().seasons[season].players
 
     for i, player in enumerate(player_list): # change to player
 
@@ -0,0 +1,62 @@
+"""
+Gunicorn settings that load the data once in the master process and share
+it with every worker.
+
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+# Tell the app not to start its threads in the master, they would not survive the fork
+os.environ.setdefault('PRELOAD', '1')
+# Every worker counts its own requests, /metrics renders those of all of them
+os.environ.setdefault('METRICS_DIR', 'cache/metrics')
+# Results entered live in one worker are applied by the others from this log
+os.environ.setdefault('RESULTS_PATH', 'cache/results.ndjson')
+# The workers share the tournament clock through a file, and clock.py streams
+# it to the displays so their open connections do not hold the workers' threads
+os.environ.setdefault('CLOCK_PATH', 'cache/clock.json')
+os.environ.setdefault('CLOCK_EVENTS_PORT', '8001')
+
+preload_app = True
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WORKERS', 4))
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 8))
+
+
+def on_starting(server):
+    # Metrics of the workers of an earlier run
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+
+def when_ready(server):
+    import app
+    app.freeze_shared_data()
+    if os.environ['CLOCK_EVENTS_PORT']:
+        host = bind.rsplit(':', 1)[0]
+        server.clock_events = subprocess.Popen([
+            sys.executable, os.path.join(os.path.dirname(os.path.abspath(app.__file__)), 'clock.py'),
+            '--bind', f'{host}:{os.environ["CLOCK_EVENTS_PORT"]}', '--state', os.environ['CLOCK_PATH']
+        ])
+
+
+def post_fork(server, worker):
+    import app
+    app.start_background_tasks()
+
+
+def child_exit(server, worker):
+    import metrics
+    metrics.forget(worker.pid, os.environ['METRICS_DIR'])
+
+
+def on_exit(server):
+    clock_events = getattr(server, 'clock_events', None)
+    if clock_events is not None:
+        clock_events.terminate()
+        clock_events.wait()
+        import metrics
+        metrics.forget(clock_events.pid, os.environ['METRICS_DIR'])
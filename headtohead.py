@@ -0,0 +1,214 @@
+"""
+Compares every pair of players who finished in the same tournament, across
+all seasons.
+"""
+import numpy as np
+
+# Bounds on the pairs expanded and the player × player cells counted at once,
+# which bound the memory used while building
+BLOCK_PAIRS = 1 << 22
+BLOCK_CELLS = 1 << 22
+
+
+def _tournament_results(seasons):
+    """
+    Collects every result as parallel arrays of tournament, player and
+    place, grouped by tournament and ordered by place within each one.
+
+    :param seasons: The :class:`data.SeasonResults` of every season.
+    :returns: The sorted player names and the three arrays, with players
+        given as indexes into the names.
+    """
+    ids = {}
+    tournaments, players, places = [], [], []
+    first = 0
+    for season in seasons:
+        rows = np.array(season.rows, dtype=np.int64)
+        numbers = np.array(season.tournaments, dtype=np.int64)
+        season_places = np.array(season.places, dtype=np.int64)
+        row_ids = np.array([ids.setdefault(name, len(ids)) for name in season.names], dtype=np.int64)
+        entered = season_places > 0
+        tournaments.append(first + numbers[entered] - 1)
+        players.append(row_ids[rows[entered]])
+        places.append(season_places[entered])
+        first += max(season.num_tournaments, numbers.max(initial=0))
+    names = sorted(ids)
+    # Renumber the players in name order
+    renumber = np.empty(len(ids), dtype=np.int64)
+    renumber[[ids[name] for name in names]] = np.arange(len(names))
+    empty = np.array([], dtype=np.int64)
+    tournaments = np.concatenate(tournaments) if tournaments else empty
+    players = renumber[np.concatenate(players)] if players else empty
+    places = np.concatenate(places) if places else empty
+    order = np.lexsort((places, tournaments))
+    return names, tournaments[order], players[order], places[order]
+
+
+def _ranges(starts, stops):
+    """The concatenated ``range(start, stop)`` of each pair, as one array."""
+    lengths = stops - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def _chunks(lengths, size):
+    """Splits positions into consecutive slices of about `size` pairs, each at least one position."""
+    totals = np.cumsum(lengths)
+    start = 0
+    while start < len(lengths):
+        done = totals[start - 1] if start else 0
+        end = max(np.searchsorted(totals, done + size, 'right'), start + 1)
+        yield slice(start, end)
+        start = end
+
+
+def _count_records(tournaments, players, places, n):
+    """
+    Counts how often each player finished ahead of and behind each other.
+
+    Players are processed in blocks of rows. For the rows of a block, the
+    pairs they are part of are expanded a chunk at a time, at most
+    :data:`BLOCK_PAIRS` pairs, and counted into a dense block with
+    :func:`numpy.bincount`, whose nonzero cells are kept.
+
+    :returns: The ``indptr``, ``opponents``, ``wins`` and ``losses`` of
+        :class:`HeadToHead`.
+    """
+    # The bounds of each tournament, and of each tie, around every result
+    tournament_bounds = np.searchsorted(tournaments, tournaments), np.searchsorted(tournaments, tournaments, 'right')
+    keys = tournaments * (places.max(initial=0) + 1) + places
+    tie_bounds = np.searchsorted(keys, keys), np.searchsorted(keys, keys, 'right')
+    # Ahead of a player are the results of their tournament before their tie, behind them those after
+    roles = ((tie_bounds[1], tournament_bounds[1]), (tournament_bounds[0], tie_bounds[0]))
+
+    rows_per_block = max(1, BLOCK_CELLS // max(n, 1))
+    indptr_rows, opponents, wins, losses = [], [], [], []
+    for lo in range(0, n, rows_per_block):
+        hi = min(lo + rows_per_block, n)
+        mine = np.flatnonzero((players >= lo) & (players < hi))
+        counts = []
+        for starts, stops in roles:
+            cells = np.zeros((hi - lo) * n, dtype=np.int64)
+            lengths = stops[mine] - starts[mine]
+            for chunk in _chunks(lengths, BLOCK_PAIRS):
+                positions = mine[chunk]
+                others = players[_ranges(starts[positions], stops[positions])]
+                rows = np.repeat(players[positions] - lo, lengths[chunk])
+                cells += np.bincount(rows * n + others, minlength=len(cells))
+            counts.append(cells)
+        met = np.flatnonzero(counts[0] | counts[1])
+        indptr_rows.append(met // n + lo)
+        opponents.append(met % n)
+        wins.append(counts[0][met])
+        losses.append(counts[1][met])
+
+    rows = np.concatenate(indptr_rows) if indptr_rows else np.array([], dtype=np.int64)
+    indptr = np.searchsorted(rows, np.arange(n + 1))
+    if not opponents:
+        return indptr, rows, rows, rows
+    return indptr, np.concatenate(opponents), np.concatenate(wins), np.concatenate(losses)
+
+
+class HeadToHead:
+    """
+    HeadToHead holds the record of every pair of players who played the
+    same tournament: how often each finished ahead of the other. Players
+    who tie on a place do not score against each other.
+
+    Records are stored sparsely, one row per player listing only the
+    opponents they met, sorted, like a CSR matrix. Looking up a pair is a
+    binary search in a row.
+
+    Parameters
+    ----------
+    names: List[:class:`str`]
+        The players, in row order.
+
+    indptr: :class:`numpy.ndarray`
+        Row ``i`` spans ``indptr[i]`` to ``indptr[i + 1]`` in the arrays below.
+
+    opponents: :class:`numpy.ndarray`
+        The row index of each opponent.
+
+    wins: :class:`numpy.ndarray`
+        How often the row's player finished ahead of the opponent.
+
+    losses: :class:`numpy.ndarray`
+        How often the opponent finished ahead.
+    """
+    def __init__(self, names, indptr, opponents, wins, losses):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.indptr = indptr
+        self.opponents = opponents
+        self.wins = wins
+        self.losses = losses
+        self._rivals = {}
+
+    @classmethod
+    def from_seasons(cls, seasons):
+        """
+        Compares the players of every tournament of `seasons`.
+
+        :param seasons: The :class:`data.SeasonResults` of every season,
+            see :meth:`data.SeasonRegistry.results`.
+        """
+        names, tournaments, players, places = _tournament_results(seasons)
+        return cls(names, *_count_records(tournaments, players, places, len(names)))
+
+    def __len__(self):
+        """The number of pairs of players who met."""
+        return len(self.opponents) // 2
+
+    def record(self, name, opponent):
+        """
+        The head-to-head record of two players.
+
+        :returns: A ``(wins, losses)`` tuple from the point of view of
+            `name`, or ``None`` if either player is unknown.
+        """
+        row, other = self.index.get(name), self.index.get(opponent)
+        if row is None or other is None:
+            return None
+        start, stop = self.indptr[row], self.indptr[row + 1]
+        i = start + np.searchsorted(self.opponents[start:stop], other)
+        if i == stop or self.opponents[i] != other:
+            return 0, 0
+        return self.wins[i].item(), self.losses[i].item()
+
+    def rivals(self, name, k=None):
+        """
+        The opponents a player met most often, the closest records first
+        among those met equally often. Results are cached per player.
+
+        :returns: ``(opponent, wins, losses)`` tuples, or ``None`` if the
+            player is unknown.
+        """
+        row = self.index.get(name)
+        if row is None:
+            return None
+        rivals = self._rivals.get(row)
+        if rivals is None:
+            start, stop = self.indptr[row], self.indptr[row + 1]
+            wins, losses = self.wins[start:stop], self.losses[start:stop]
+            order = np.lexsort((np.abs(wins - losses), -(wins + losses)))
+            rivals = self._rivals[row] = [(self.names[self.opponents[start + i]], wins[i].item(), losses[i].item())
+                                          for i in order]
+        return rivals[:k]
+
+
+def rivalries(head_to_head, k=25, minimum=1):
+    """
+    The most played pairs across the whole history.
+
+    :returns: ``(name, opponent, wins, losses)`` tuples with `name` the
+        player with more wins, most meetings first.
+    """
+    h = head_to_head
+    meetings = h.wins + h.losses
+    # Each pair is stored twice, keep the row of the player leading it
+    rows = np.repeat(np.arange(len(h.names)), np.diff(h.indptr))
+    keep = (meetings >= minimum) & ((h.wins > h.losses) | (h.wins == h.losses) & (rows < h.opponents))
+    pairs = np.flatnonzero(keep)
+    order = pairs[np.lexsort((np.abs(h.wins[pairs] - h.losses[pairs]), -meetings[pairs]))][:k]
+    return [(h.names[rows[i]], h.names[h.opponents[i]], h.wins[i].item(), h.losses[i].item()) for i in order]
@@ -0,0 +1,228 @@
+"""
+Finds the spellings of the same player's name across sheets, such as
+"Jon Doe", "John Doe" and "john  doe", so their results are merged under
+one name.
+"""
+import json
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from itertools import combinations
+
+log = logging.getLogger(__name__)
+
+# Overrides the automatic matching, see load_aliases
+ALIASES_PATH = 'aliases.json'
+
+
+def normalize(name):
+    """
+    The key names are matched on: lowercase, without accents or
+    punctuation, with the words sorted so their order does not matter.
+    """
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c)).lower()
+    return ' '.join(sorted(re.sub(r'[^\w\s]', '', name).split()))
+
+
+def max_distance(key):
+    """The number of typos tolerated in a name key; short names must match exactly."""
+    if len(key) < 6:
+        return 0
+    return 1 if len(key) < 14 else 2
+
+
+def edit_distance(a, b, limit):
+    """
+    The Levenshtein distance between `a` and `b`, or ``limit + 1`` as soon
+    as it is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _deletions(key, depth):
+    """`key` with every combination of up to `depth` characters removed."""
+    variants = {key}
+    level = {key}
+    for _ in range(depth):
+        level = {text[:i] + text[i + 1:] for text in level for i in range(len(text))}
+        variants |= level
+    return variants
+
+
+class DeletionIndex:
+    """
+    DeletionIndex finds the keys within a small edit distance of a key
+    without comparing it to every other key.
+
+    Two keys within `d` edits of each other share a variant with at most
+    `d` characters deleted from each, so keys are indexed under all such
+    variants and only keys sharing one are compared. Keys can also be put
+    in blocks, and are then only compared within their block.
+    """
+    def __init__(self):
+        self.keys = {}
+        self.blocks = {}
+
+    def add(self, key, block=None):
+        depth = max_distance(key)
+        self.keys[key] = depth
+        variants = self.blocks.setdefault(block, {})
+        for variant in _deletions(key, depth):
+            # Tuples, unlike sets, are not tracked by the garbage collector
+            variants[variant] = variants.get(variant, ()) + (key,)
+
+    def near(self, key, block=None):
+        """The indexed keys of `block`, other than `key`, within the distance both of them tolerate."""
+        depth = max_distance(key)
+        variants = self.blocks.get(block, {})
+        candidates = set()
+        for variant in _deletions(key, depth):
+            candidates.update(variants.get(variant, ()))
+        candidates.discard(key)
+        return [other for other in candidates
+                if edit_distance(key, other, min(depth, self.keys[other])) <= min(depth, self.keys[other])]
+
+
+def load_aliases(path=ALIASES_PATH):
+    """
+    Reads the alias file, a JSON object like::
+
+        {
+            "aliases": {"Jon Doe": "John Doe"},
+            "separate": [["Dan Lee", "Don Lee"]]
+        }
+
+    ``aliases`` maps spellings to the name they are merged into, and
+    ``separate`` lists names that are never merged automatically.
+
+    :returns: The ``(aliases, separate)`` pair, empty without a file.
+    """
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return {}, []
+    except ValueError as e:
+        log.warning('Ignoring %s: %s', path, e)
+        return {}, []
+    return config.get('aliases', {}), [tuple(names) for names in config.get('separate', [])]
+
+
+class IdentityResolver:
+    """
+    IdentityResolver groups the spellings of each player's name across
+    seasons and picks the one their results are merged under.
+
+    Spellings are grouped when their :func:`normalize` keys are within
+    :func:`max_distance` typos, they contain the same digits, and no two
+    spellings of the group appear in the same season, which would make
+    them different players. The name used the most is kept, the most
+    recent one on ties.
+
+    Parameters
+    ----------
+    aliases: Dict[:class:`str`, :class:`str`]
+        Spellings always merged into another name, whatever the rules above.
+
+    separate: Iterable[Tuple[:class:`str`, ...]]
+        Groups of names never merged with each other automatically.
+    """
+    def __init__(self, aliases=None, separate=()):
+        self.aliases = dict(aliases or {})
+        self.separate = {frozenset(pair) for names in separate for pair in combinations(names, 2)}
+
+    @classmethod
+    def from_file(cls, path=ALIASES_PATH):
+        return cls(*load_aliases(path))
+
+    def resolve(self, seasons):
+        """
+        Finds the names to merge in `seasons`, visiting each season once.
+
+        :param seasons: The :class:`data.SeasonResults` of every season, in
+            chronological order.
+        :returns: A dict mapping each merged spelling to its player's name.
+        """
+        results = defaultdict(int)
+        seasons_of = defaultdict(set)
+        last_seen = {}
+        for order, season in enumerate(seasons):
+            for name, count in zip(season.names, season.counts()):
+                results[name] += count
+                seasons_of[name].add(season.name)
+                last_seen[name] = order
+
+        names = sorted(results, key=lambda name: (-results[name], -last_seen[name], name))
+        names_order = {name: i for i, name in enumerate(names)}
+        parent = {name: name for name in names}
+        members = {name: [name] for name in names}
+        cluster_seasons = {name: set(seasons_of[name]) for name in names}
+
+        def find(name):
+            while parent[name] != name:
+                parent[name] = parent[parent[name]]
+                name = parent[name]
+            return name
+
+        def union(a, b, forced=False):
+            a, b = find(a), find(b)
+            if a == b:
+                return
+            if not forced:
+                if cluster_seasons[a] & cluster_seasons[b]:
+                    return
+                if any(frozenset((x, y)) in self.separate for x in members[a] for y in members[b]):
+                    return
+            # The name listed first, i.e. used the most, stays the root
+            if names_order[b] < names_order[a]:
+                a, b = b, a
+            parent[b] = a
+            members[a] += members.pop(b)
+            cluster_seasons[a] |= cluster_seasons.pop(b)
+
+        by_key = defaultdict(list)
+        for name in names:
+            by_key[normalize(name)].append(name)
+        # Names are only compared with those containing the same digits
+        digits = {key: re.sub(r'\D', '', key) for key in by_key}
+        index = DeletionIndex()
+        for key in by_key:
+            index.add(key, digits[key])
+        for key, spellings in by_key.items():
+            for name in spellings[1:]:
+                union(spellings[0], name)
+            for other in index.near(key, digits[key]):
+                union(spellings[0], by_key[other][0])
+
+        forced = []
+        for variant, canonical in self.aliases.items():
+            seen = {variant}
+            while canonical in self.aliases and canonical not in seen:
+                seen.add(canonical)
+                canonical = self.aliases[canonical]
+            if variant in parent:
+                if canonical in parent:
+                    union(canonical, variant, forced=True)
+                forced.append((variant, canonical))
+        # Aliases may name the player differently from every sheet, e.g. to fix a typo
+        preferred = {find(variant): canonical for variant, canonical in forced}
+
+        mapping = {}
+        for name in names:
+            root = find(name)
+            target = preferred.get(root, root)
+            if target != name:
+                mapping[name] = target
+        return mapping
@@ -2,8 +2,8 @@ from data import *
 
 info = Stats()
 #print(info.seasons)
-seasons = {"2018F": 5, "2018S": 6, "2017F": 2, "2017S-SH": 4, "2017S-FH": 3, "2016F-SH": 1, "2016F-FH": 0}
-#print(len(info.seasons[5].players[2].placements))
+#print(info.seasons.names())
+#print(len(info.seasons["2018F"].players[2].placements))
 #print(info.players["Jaemin Shim"]['2018F'].placements[0]['place'])
 
 
@@ -0,0 +1,358 @@
+import abc
+import bisect
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+
+# Upper bounds, in seconds, of the histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+log = logging.getLogger(__name__)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f'{self.name} takes the labels {self.labels}, got {tuple(labels)}')
+        return tuple(labels[name] for name in self.labels)
+
+    @abc.abstractmethod
+    def _samples(self):
+        """``(suffix, label names, label values, extra label pairs, value)`` of every sample."""
+
+    def samples(self):
+        """The samples as ``(name, formatted labels, formatted value)`` triples."""
+        return [(f'{self.name}{suffix}', _format_labels(names, values, extra), _format_value(value))
+                for suffix, names, values, extra, value in self._samples()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines += [f'{name}{labels} {value}' for name, labels, value in self.samples()]
+        return lines
+
+
+class Counter(_Metric):
+    """A count that only goes up, such as the number of requests served."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [('', self.labels, key, (), value) for key, value in items]
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Histogram(_Metric):
+    """
+    Counts observations, usually durations in seconds, into buckets.
+
+    Parameters
+    ----------
+    buckets: Tuple[:class:`float`]
+        The upper bounds of the buckets, in increasing order. A ``+Inf``
+        bucket is always added.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per bucket counts, the sum and the count of observations
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bucket] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        """A context manager observing the time spent in its block."""
+        return _Timer(self, labels)
+
+    def timed(self, label):
+        """A decorator observing the duration of every call, with the function name as `label`."""
+        def decorator(fn):
+            labels = {label: fn.__name__}
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Timer(self, labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        samples = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                samples.append(('_bucket', self.labels, key, [('le', _format_value(float(bound)))], cumulative))
+            samples.append(('_sum', self.labels, key, (), total))
+            samples.append(('_count', self.labels, key, (), count))
+        return samples
+
+
+class Callback(_Metric):
+    """A value read when the metrics are scraped, from state kept elsewhere."""
+    def __init__(self, name, documentation, fn, kind='gauge'):
+        super().__init__(name, documentation)
+        self.fn = fn
+        self.kind = kind
+
+    def _samples(self):
+        return [('', (), (), (), self.fn())]
+
+
+def _with_pid(labels, pid):
+    """Adds a ``pid`` label to formatted labels."""
+    pair = f'pid="{pid}"'
+    return f'{{{pair}}}' if not labels else f'{{{pair},{labels[1:]}'
+
+
+class Registry:
+    """
+    Registry holds every metric of the process and renders them in the
+    Prometheus text exposition format.
+
+    Processes serving the same app, like the workers of a pre-fork server,
+    each count their own requests. After :meth:`share`, every process
+    writes its samples to a shared folder and renders those of all of
+    them, so scraping any one of them covers every worker.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.directory = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                # Modules can be imported again, e.g. by the reloader, keep the first one
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name, documentation, fn, kind='gauge'):
+        metric = Callback(name, documentation, fn, kind)
+        with self._lock:
+            # Callbacks always read from the latest module state
+            self.metrics[name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        if self.directory is not None:
+            return self._render_shared(metrics)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+    def share(self, directory, interval=5):
+        """
+        Shares the metrics of this process through `directory`, writing
+        them there every `interval` seconds from a daemon thread and on
+        every :meth:`render`. Rendered samples then carry a ``pid`` label
+        naming the process they come from. Call it in every serving
+        process, after the fork, and remove the files of exited processes
+        with :meth:`forget`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self._write()
+                except OSError as e:
+                    log.warning('Error sharing metrics: %r', e)
+
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=run, name='metrics-writer', daemon=True)
+            self._thread.start()
+
+    def forget(self, pid, directory=None):
+        """Removes the shared metrics of an exited process, from `directory` or the shared folder."""
+        directory = directory or self.directory
+        if directory is not None:
+            try:
+                os.remove(os.path.join(directory, f'{pid}.json'))
+            except FileNotFoundError:
+                pass
+
+    def _write(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        state = {metric.name: [metric.documentation, metric.kind, metric.samples()] for metric in metrics}
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        # Write to a private file first so readers never see a partial one
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _render_shared(self, metrics):
+        self._write()
+        processes = {}
+        for file in sorted(os.listdir(self.directory)):
+            pid, ext = os.path.splitext(file)
+            if ext != '.json':
+                continue
+            try:
+                with open(os.path.join(self.directory, file)) as f:
+                    processes[pid] = json.load(f)
+            except (OSError, ValueError):
+                # Removed or replaced while listing
+                continue
+        names = [metric.name for metric in metrics]
+        names += sorted({name for state in processes.values() for name in state} - set(names))
+        lines = []
+        for name in names:
+            entries = [(pid, state[name]) for pid, state in processes.items() if name in state]
+            documentation, kind = entries[0][1][:2]
+            lines += [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+            for pid, (_, _, samples) in entries:
+                lines += [f'{sample}{_with_pid(labels, pid)} {value}' for sample, labels, value in samples]
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+callback = REGISTRY.callback
+render = REGISTRY.render
+share = REGISTRY.share
+forget = REGISTRY.forget
+
+
+class SlowRequestProfiler:
+    """
+    Profiles requests with :mod:`cProfile` and saves a report for each one
+    slower than `threshold`.
+
+    Parameters
+    ----------
+    threshold: :class:`float`
+        Seconds a request has to take for its profile to be saved.
+
+    directory: :class:`str`
+        The folder the reports are written to.
+
+    limit: :class:`int`
+        The number of functions listed in each report, by cumulative time.
+    """
+    def __init__(self, threshold, directory='profiles', limit=40):
+        self.threshold = threshold
+        self.directory = directory
+        self.limit = limit
+
+    def start(self):
+        """
+        Starts profiling the current thread.
+
+        :returns: The :class:`cProfile.Profile`, or ``None`` if another
+            profiler is already active.
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None
+        return profile
+
+    def stop(self, profile, elapsed, name):
+        """
+        Stops `profile` and saves its report if the request was slow.
+
+        :returns: The path of the report, or ``None``.
+        """
+        profile.disable()
+        if elapsed < self.threshold:
+            return None
+        out = io.StringIO()
+        out.write(f'{name} took {elapsed * 1e3:.1f} ms\n\n')
+        pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(self.limit)
+        os.makedirs(self.directory, exist_ok=True)
+        label = re.sub(r'[^\w.-]+', '_', name).strip('_')
+        path = os.path.join(self.directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{threading.get_ident()}-'
+                                            f'{int(elapsed * 1e3)}ms-{label}.txt')
+        with open(path, 'w') as f:
+            f.write(out.getvalue())
+        return path
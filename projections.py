@@ -0,0 +1,237 @@
+"""
+Projects how a season ends by simulating its remaining tournaments many
+times, giving each player's chance of finishing in the top places.
+
+    python projections.py --season 2018F --held 6 --simulations 200000 --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from data import SeasonRegistry
+from scoring import BEST_OF, counted_tournaments, sheet_points
+
+TOP_N = 10
+SIMULATIONS = 100000
+SEED = 0
+# Upper bound on the simulated players × tournaments cells of one batch
+BATCH_CELLS = 1 << 21
+# Evenly spread finishes drawn from for players without any
+UNKNOWN_FINISHES = 20
+
+
+class SeasonModel:
+    """
+    SeasonModel holds what the simulations of a season's remaining
+    tournaments are drawn from.
+
+    Each player enters a remaining tournament with the share of the
+    season's tournaments they entered so far, smoothed so newcomers and
+    regulars are neither certain nor excluded. Their finish is drawn from
+    their own past finishes in every season up to this one, as a share of
+    the field they beat, and players are placed by these draws. Players
+    without past finishes draw from evenly spread ones.
+
+    Parameters
+    ----------
+    names: List[:class:`str`]
+        The players, in the row order of the season.
+
+    points: :class:`numpy.ndarray`
+        A players × tournaments matrix of the points of the tournaments held.
+
+    remaining: :class:`int`
+        The number of tournaments left.
+
+    attendance: :class:`numpy.ndarray`
+        The chance of each player entering a tournament.
+
+    finishes: :class:`numpy.ndarray`
+        A players × finishes matrix of each player's past finishes, from
+        ``0`` for a win to ``1`` for last, padded to the longest history.
+
+    history: :class:`numpy.ndarray`
+        The number of past finishes in each row of `finishes`.
+
+    bonus: :class:`numpy.ndarray`
+        The bonus points of each player.
+
+    counted: :class:`int`
+        The number of tournaments counted towards a total.
+    """
+    def __init__(self, names, points, remaining, attendance, finishes, history, bonus, counted):
+        self.names = names
+        self.points = points
+        self.remaining = remaining
+        self.attendance = attendance
+        self.finishes = finishes
+        self.history = history
+        self.bonus = bonus
+        self.counted = counted
+
+    @classmethod
+    def from_season(cls, season, seasons, held=None, best_of=BEST_OF):
+        """
+        :param season: The :class:`data.Season` to project, with
+            :attr:`data.Season.columns`.
+        :param seasons: The :class:`data.SeasonResults` of every season, in
+            chronological order, to draw the players' finishes from.
+            Seasons after `season` are ignored.
+        :param held: The number of tournaments treated as played, to project
+            from an earlier point of the season. Defaults to the tournaments
+            with results.
+        :param best_of: See :func:`scoring.counted_tournaments`.
+        """
+        columns = season.columns
+        if columns is None:
+            raise ValueError('projections need the placement tables, which require NumPy')
+        if held is None:
+            entered = np.flatnonzero(columns.entrants())
+            held = entered[-1] + 1 if len(entered) else 0
+        held = min(held, season.num_tournaments)
+        played = columns.played[:, :held]
+        # Laplace smoothing of the attendance so far
+        attendance = (played.sum(axis=1) + 1) / (held + 2)
+
+        rows = {name: i for i, name in enumerate(columns.names)}
+        past = [[] for _ in rows]
+        for other in seasons:
+            last = other.name == season.name
+            fields = defaultdict(int)
+            for number, place in zip(other.tournaments, other.places):
+                fields[number] += place > 0
+            for row, number, place in zip(other.rows, other.tournaments, other.places):
+                target = rows.get(other.names[row])
+                if target is not None and place > 0 and (not last or number <= held):
+                    past[target].append((place - 1) / max(fields[number] - 1, 1))
+            if last:
+                break
+        for results in past:
+            if not results:
+                results.extend((np.arange(UNKNOWN_FINISHES) + 0.5) / UNKNOWN_FINISHES)
+        history = np.array([len(results) for results in past], dtype=np.int64)
+        finishes = np.zeros((len(rows), max(history.max(initial=0), 1)))
+        for row, results in enumerate(past):
+            finishes[row, :len(results)] = results
+
+        bonus = np.array([player.bonus_points for player in season.players], dtype=np.float64)
+        return cls(list(columns.names), columns.points[:, :held] * played, season.num_tournaments - held,
+                   attendance, finishes, history, bonus, counted_tournaments(season.num_tournaments, best_of))
+
+    def batch_size(self):
+        """The number of simulations per batch, within :data:`BATCH_CELLS`."""
+        cells = len(self.names) * (self.points.shape[1] + self.remaining)
+        return max(1, BATCH_CELLS // max(cells, 1))
+
+    def simulate_batch(self, size, seed, top_n=TOP_N):
+        """
+        Runs `size` simulations of the rest of the season at once.
+
+        :returns: How often each player finished in the top `top_n`.
+        """
+        rng = np.random.RandomState(seed)
+        players = len(self.names)
+        draws = rng.random_sample((size, self.remaining, players))
+        attend = draws < self.attendance
+        # Below the attendance, the draw scaled by it is again uniform and picks a past finish
+        picks = np.minimum(draws / self.attendance * self.history, self.history - 1).astype(np.int64)
+        finish = np.where(attend, self.finishes[np.arange(players), picks], np.inf)
+        order = np.argsort(finish, axis=2)
+        places = np.empty_like(order)
+        np.put_along_axis(places, order, np.arange(1, players + 1), axis=2)
+        entrants = attend.sum(axis=2, keepdims=True)
+        points = np.where(attend, np.round(sheet_points(places, np.maximum(entrants, 1)), 2), 0.0)
+
+        results = np.concatenate([np.broadcast_to(self.points, (size,) + self.points.shape),
+                                  points.transpose(0, 2, 1)], axis=2)
+        totals = results.sum(axis=2) + self.bonus
+        dropped = results.shape[2] - self.counted
+        if dropped > 0:
+            totals -= np.partition(results, dropped - 1, axis=2)[:, :, :dropped].sum(axis=2)
+        top = np.argsort(-totals, axis=1, kind='stable')[:, :top_n]
+        return np.bincount(top.ravel(), minlength=players)
+
+
+# The model of the pool's worker processes, sent once when they start
+_worker_model = None
+
+
+def _start_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _run_batch(args):
+    size, seed, top_n = args
+    return _worker_model.simulate_batch(size, seed, top_n)
+
+
+def default_workers():
+    """One process per CPU on machines with several, none otherwise."""
+    cpus = os.cpu_count() or 1
+    return cpus if cpus > 1 else 0
+
+
+def simulate(model, simulations=SIMULATIONS, top_n=TOP_N, workers=None, seed=SEED):
+    """
+    Runs `simulations` simulations of the rest of a season in batches,
+    spread over a process pool.
+
+    Batch ``i`` draws from ``RandomState(seed + i)``, so the results only
+    depend on `seed` and `simulations`, however many workers run them.
+
+    :param workers: The number of processes, ``0`` to run in this process,
+        or ``None`` for :func:`default_workers`.
+    :returns: Each player's chance of finishing in the top `top_n`,
+        mapped to their name.
+    """
+    if not model.remaining:
+        # Nothing left to play: the standings are final
+        simulations = 1
+    batch = model.batch_size()
+    tasks = [(min(batch, simulations - start), seed + i, top_n)
+             for i, start in enumerate(range(0, simulations, batch))]
+    counts = np.zeros(len(model.names), dtype=np.int64)
+    if workers is None:
+        workers = default_workers()
+    if workers == 0 or len(tasks) == 1:
+        for size, batch_seed, n in tasks:
+            counts += model.simulate_batch(size, batch_seed, n)
+    else:
+        # Spawned processes are safe to start from a threaded web server
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(workers, initializer=_start_worker, initargs=(model,)) as pool:
+            for result in pool.imap_unordered(_run_batch, tasks):
+                counts += result
+    return {name: count / simulations for name, count in zip(model.names, counts.tolist())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--season', help='the season to project, by default the latest')
+    parser.add_argument('--held', type=int, help='project from after this many tournaments')
+    parser.add_argument('--simulations', type=int, default=SIMULATIONS)
+    parser.add_argument('--workers', type=int, help='processes to use, 0 for none, by default one per CPU if there are several')
+    parser.add_argument('--top', type=int, default=TOP_N, help='the places players are projected to reach')
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    seasons = SeasonRegistry.from_directory('data')
+    season = seasons[args.season] if args.season else seasons.latest
+    model = SeasonModel.from_season(season, seasons.results(), args.held)
+    start = time.perf_counter()
+    chances = simulate(model, args.simulations, args.top, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f'{season.name}, {model.remaining} tournaments left: chance of finishing top {args.top}')
+    for name, chance in sorted(chances.items(), key=lambda x: -x[1])[:2 * args.top]:
+        final = season.get_player(name).rank + 1
+        print(f'    {name:<28} {chance:>7.1%}   finished {final}')
+    print(f'Ran {args.simulations} simulations in {elapsed:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
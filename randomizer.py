@@ -1,28 +1,185 @@
 import csv
+import heapq
 import io
 import random
-import pprint
+
+
+def read_names(file):
+    """
+    Streams player names from an uploaded CSV file.
+
+    The first row is a header and is skipped. Every other non-empty cell
+    is a player name, so both one-name-per-line files and wide sign-up
+    sheets work.
+
+    :param file: A :class:`werkzeug.datastructures.FileStorage` upload.
+    :returns: A generator of names.
+    """
+    stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(stream)
+        next(reader, None)
+        for row in reader:
+            for cell in row:
+                if cell.strip():
+                    yield cell.strip()
+    finally:
+        stream.detach()
 
 
 def concatenate(file):
-    stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-    reader = csv.reader(stream)
-    names = []
+    return list(read_names(file))
+
+
+class Seating:
+    """
+    Seating assigns players to random seats at balanced tables and keeps
+    them balanced as players bust.
+
+    Players are dealt round-robin after a seeded shuffle, so every table
+    starts within one player of the others. After a bust, one player
+    moves from the fullest to the emptiest table whenever they differ by
+    more than one, and the emptiest table is broken once the remaining
+    tables can seat everyone. Both tables are found through heaps of
+    table sizes, so a bust or move costs O(log tables).
+
+    Parameters
+    ----------
+    players: Iterable[:class:`str`]
+        The player names. Names must be unique.
+
+    table_size: :class:`int`
+        The number of seats at each table.
+
+    seed: Optional[:class:`int`]
+        Seed for the random draw, to reproduce a seating.
+    """
+    def __init__(self, players, table_size=9, seed=None):
+        if table_size < 2:
+            raise ValueError('tables need at least two seats')
+        self.table_size = table_size
+        self.seed = seed
+        self.random = random.Random(seed)
+
+        players = list(players)
+        if len(set(players)) != len(players):
+            raise ValueError('player names must be unique')
+        self.random.shuffle(players)
+        num_tables = max(1, -(-len(players) // table_size))
+
+        self.tables = {table: [None] * table_size for table in range(1, num_tables + 1)}
+        self.free = {table: list(range(table_size - 1, -1, -1)) for table in self.tables}
+        self.counts = dict.fromkeys(self.tables, 0)
+        self.seats = {}
+        self._smallest_heap = []
+        self._largest_heap = []
+        for i, player in enumerate(players):
+            table = i % num_tables + 1
+            # Seats are dealt in order; the shuffle already randomized them
+            self._seat(player, table, self.free[table].pop())
+        for table in self.tables:
+            self._push(table)
+
+    def __len__(self):
+        return len(self.seats)
+
+    def _push(self, table):
+        count = self.counts[table]
+        heapq.heappush(self._smallest_heap, (count, table))
+        heapq.heappush(self._largest_heap, (-count, table))
+        # Drop stale entries once they outnumber the live ones
+        if len(self._smallest_heap) > 4 * len(self.counts) + 16:
+            self._smallest_heap = [(c, t) for t, c in self.counts.items()]
+            self._largest_heap = [(-c, t) for t, c in self.counts.items()]
+            heapq.heapify(self._smallest_heap)
+            heapq.heapify(self._largest_heap)
+
+    def _top(self, heap, sign):
+        while True:
+            count, table = heap[0]
+            if self.counts.get(table) == sign * count:
+                return table
+            heapq.heappop(heap)
+
+    def smallest_table(self):
+        """The open table with the fewest players."""
+        return self._top(self._smallest_heap, 1)
+
+    def largest_table(self):
+        """The open table with the most players."""
+        return self._top(self._largest_heap, -1)
+
+    def _seat(self, player, table, seat=None):
+        free = self.free[table]
+        if seat is None:
+            # Take a random empty seat
+            i = self.random.randrange(len(free))
+            free[i], free[-1] = free[-1], free[i]
+            seat = free.pop()
+        self.tables[table][seat] = player
+        self.counts[table] += 1
+        self.seats[player] = (table, seat)
+        return seat
+
+    def _unseat(self, player):
+        table, seat = self.seats.pop(player)
+        self.tables[table][seat] = None
+        self.free[table].append(seat)
+        self.counts[table] -= 1
+        return table, seat
+
+    def _move(self, player, table):
+        from_table, from_seat = self._unseat(player)
+        seat = self._seat(player, table)
+        return {'player': player, 'from': (from_table, from_seat + 1), 'to': (table, seat + 1)}
 
-    for r in reader:
-        names += r
+    def _balance(self):
+        moves = []
+        while True:
+            large, small = self.largest_table(), self.smallest_table()
+            if self.counts[large] - self.counts[small] <= 1:
+                return moves
+            player = self.random.choice([p for p in self.tables[large] if p is not None])
+            moves.append(self._move(player, small))
+            self._push(large)
+            self._push(small)
 
-    stream.close()
-    del names[0]
-    return names
+    def _break(self, table):
+        seats = self.tables.pop(table)
+        del self.free[table]
+        del self.counts[table]
+        moves = []
+        for from_seat, player in enumerate(seats):
+            if player is None:
+                continue
+            del self.seats[player]
+            dest = self.smallest_table()
+            seat = self._seat(player, dest)
+            self._push(dest)
+            moves.append({'player': player, 'from': (table, from_seat + 1), 'to': (dest, seat + 1)})
+        return moves
 
+    def bust(self, player):
+        """
+        Removes an eliminated player and rebalances the tables.
 
-def chunks(l, n):
-    for i in range(0, len(l), n):
-        yield l[i:i + n]
+        :param str player: The name of the player.
+        :returns: The moves made, as dicts with the ``player`` moved and
+            the ``from`` and ``to`` ``(table, seat)`` pairs.
+        :raises KeyError: If the player is not seated.
+        """
+        table, _ = self._unseat(player)
+        self._push(table)
+        if len(self.counts) > 1 and len(self.seats) <= (len(self.counts) - 1) * self.table_size:
+            return self._break(self.smallest_table())
+        return self._balance()
 
-L = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K']
-random.shuffle(L)
-print(L)
-pprint.pprint(list(chunks(L, 3)))
+    def layout(self):
+        """
+        The current seating chart.
 
+        :returns: A list of ``(table, [(seat, player), ...])`` pairs with
+            seats numbered from 1.
+        """
+        return [(table, [(seat + 1, player) for seat, player in enumerate(seats) if player is not None])
+                for table, seats in sorted(self.tables.items())]
@@ -0,0 +1,230 @@
+"""
+Rates players with a multi-player Elo system, replaying every tournament
+of every season in chronological order.
+"""
+import hashlib
+import os
+import pickle
+
+import numpy as np
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+# Tournaments between two kept checkpoints; the latest state is always kept too
+CHECKPOINT_EVERY = 10
+RATINGS_PATH = 'cache/ratings.pickle'
+# Upper bound on the pairs compared at once in a large tournament
+BLOCK_PAIRS = 1 << 20
+
+
+def tournament_results(seasons):
+    """
+    Lists every tournament of `seasons` in the order they were played:
+    seasons as they are iterated, then tournaments by number.
+
+    :param seasons: The :class:`data.SeasonResults` of every season, see
+        :meth:`data.SeasonRegistry.results`.
+    :returns: ``(season name, tournament number, names, places)`` tuples
+        with the players of each tournament ordered by place.
+    """
+    tournaments = []
+    for season in seasons:
+        results = {}
+        for row, number, place in zip(season.rows, season.tournaments, season.places):
+            if place > 0:
+                results.setdefault(number, []).append((place, season.names[row]))
+        for number in sorted(results):
+            entries = sorted(results[number])
+            tournaments.append((season.name, number, [name for _, name in entries],
+                                np.array([place for place, _ in entries], dtype=np.float64)))
+    return tournaments
+
+
+def _fingerprint(season, number, names, places):
+    results = ';'.join(f'{name}={place:g}' for name, place in zip(names, places))
+    return hashlib.sha1(f'{season}:{number}:{results}'.encode()).hexdigest()[:16]
+
+
+def expected_scores(ratings):
+    """
+    The share of the other players each player is expected to finish
+    ahead of, from the Elo win probability of every pair.
+    """
+    m = len(ratings)
+    expected = np.empty(m)
+    rows = max(1, BLOCK_PAIRS // m)
+    for start in range(0, m, rows):
+        block = ratings[start:start + rows]
+        wins = 1 / (1 + 10 ** ((ratings[None, :] - block[:, None]) / 400))
+        # Each player was counted against themselves for an even 0.5
+        expected[start:start + rows] = (wins.sum(axis=1) - 0.5) / (m - 1)
+    return expected
+
+
+def actual_scores(places):
+    """The share of the other players each player finished ahead of, ties counting half."""
+    m = len(places)
+    ahead = m - np.searchsorted(places, places, 'right')
+    tied = np.searchsorted(places, places, 'right') - np.searchsorted(places, places, 'left') - 1
+    return (ahead + 0.5 * tied) / (m - 1)
+
+
+class RatingHistory:
+    """
+    RatingHistory holds the rating of every player after every tournament.
+
+    Each tournament moves a player's rating by :attr:`k_factor` times the
+    difference between the share of opponents they finished ahead of and
+    the share the ratings predicted.
+
+    The ratings are saved every :data:`CHECKPOINT_EVERY` tournaments and
+    after the last one. :meth:`update` compares the tournaments with those
+    already rated and only replays them from the last checkpoint before the
+    first difference, so a refresh that adds or corrects a tournament of
+    the current season replays at most a few tournaments.
+
+    Parameters
+    ----------
+    k_factor: :class:`float`
+        The largest change of a rating in one tournament.
+
+    initial: :class:`float`
+        The rating of a player before their first tournament.
+
+    checkpoint_every: :class:`int`
+        Tournaments between two checkpoints.
+
+    Attributes
+    ----------
+    tournaments: List[Tuple[:class:`str`, :class:`int`, :class:`str`]]
+        The season name, number and a fingerprint of the results of each
+        rated tournament, in order.
+
+    ratings: Dict[:class:`str`, :class:`float`]
+        The current rating of each player.
+
+    played: Dict[:class:`str`, :class:`int`]
+        The number of rated tournaments of each player.
+
+    series: Dict[:class:`str`, List[Tuple[:class:`int`, :class:`float`]]]
+        The index into :attr:`tournaments` and the rating after it, for
+        every tournament of each player.
+    """
+    def __init__(self, k_factor=K_FACTOR, initial=INITIAL_RATING, checkpoint_every=CHECKPOINT_EVERY):
+        self.k_factor = k_factor
+        self.initial = initial
+        self.checkpoint_every = checkpoint_every
+        self.tournaments = []
+        self.ratings = {}
+        self.played = {}
+        self.series = {}
+        self.checkpoints = [(0, {}, {})]
+
+    @classmethod
+    def load(cls, path=RATINGS_PATH, **kwargs):
+        """
+        Restores the history saved to `path`, or starts a new one if there
+        is none or it was rated with other parameters.
+        """
+        history = cls(**kwargs)
+        try:
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return history
+        if (saved.k_factor, saved.initial, saved.checkpoint_every) != \
+                (history.k_factor, history.initial, history.checkpoint_every):
+            return history
+        return saved
+
+    def save(self, path=RATINGS_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a private file first so readers never see a partial history
+        tmp_path = f'{path}.{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def update(self, seasons):
+        """
+        Rates the tournaments of `seasons` that changed since the last update.
+
+        :param seasons: See :func:`tournament_results`.
+        :returns: The number of tournaments rated.
+        """
+        tournaments = tournament_results(seasons)
+        keys = [(season, number, _fingerprint(season, number, names, places))
+                for season, number, names, places in tournaments]
+        first = 0
+        for old, new in zip(self.tournaments, keys):
+            if old != new:
+                break
+            first += 1
+        if first == len(self.tournaments) == len(keys):
+            return 0
+
+        self._restore(first)
+        start = len(self.tournaments)
+        for index in range(start, len(keys)):
+            self._rate(index, *tournaments[index][2:])
+            self.tournaments.append(keys[index])
+            if (index + 1) % self.checkpoint_every == 0:
+                self._checkpoint()
+        self._checkpoint()
+        return len(keys) - start
+
+    def _restore(self, index):
+        """Goes back to the last checkpoint at or before tournament `index`."""
+        while self.checkpoints[-1][0] > index:
+            self.checkpoints.pop()
+        start, ratings, played = self.checkpoints[-1]
+        self.ratings = dict(ratings)
+        self.played = dict(played)
+        del self.tournaments[start:]
+        for name in list(self.series):
+            entries = self.series[name]
+            while entries and entries[-1][0] >= start:
+                entries.pop()
+            if not entries:
+                del self.series[name]
+
+    def _checkpoint(self):
+        index = len(self.tournaments)
+        last = self.checkpoints[-1][0]
+        if last == index:
+            return
+        if last % self.checkpoint_every:
+            # Only the latest state is kept between two regular checkpoints
+            self.checkpoints.pop()
+        self.checkpoints.append((index, dict(self.ratings), dict(self.played)))
+
+    def _rate(self, index, names, places):
+        if len(names) < 2:
+            return
+        ratings = np.array([self.ratings.get(name, self.initial) for name in names])
+        ratings += self.k_factor * (actual_scores(places) - expected_scores(ratings))
+        for name, rating in zip(names, ratings.tolist()):
+            self.ratings[name] = rating
+            self.played[name] = self.played.get(name, 0) + 1
+            self.series.setdefault(name, []).append((index, rating))
+
+    def rating_series(self, name):
+        """
+        A player's rating after each of their tournaments.
+
+        :returns: ``(season, tournament, rating)`` tuples, oldest first, or
+            ``None`` if the player has no rated tournament.
+        """
+        entries = self.series.get(name)
+        if entries is None:
+            return None
+        return [(self.tournaments[index][0], f'Tournament {self.tournaments[index][1]}', rating)
+                for index, rating in entries]
+
+    def leaders(self, minimum=5):
+        """
+        ``(name, rating)`` pairs of the players with at least `minimum`
+        rated tournaments, highest rating first.
+        """
+        rated = [(name, rating) for name, rating in self.ratings.items() if self.played[name] >= minimum]
+        return sorted(rated, key=lambda x: -x[1])
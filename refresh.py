@@ -0,0 +1,217 @@
+import logging
+import os
+import stat
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+from sheets import COMPACT_EXT, LEGACY_EXT, dump_compact, list_sheets
+
+try:
+    import fcntl
+except ImportError:
+    # Without fcntl (on Windows) processes are not coordinated
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+SHEETS_API_ROOT = 'https://sheets.googleapis.com/v4'
+
+REFRESH_SECONDS = metrics.histogram('poker_stats_sheet_refresh_seconds',
+                                    'Time spent downloading and writing sheets.')
+REFRESH_ERRORS = metrics.counter('poker_stats_sheet_refresh_errors_total', 'Failed scheduled refreshes.')
+SHEET_REQUESTS = metrics.counter('poker_stats_sheet_requests_total', 'Requests made to the Sheets API.')
+
+# The process umask, read once since it can only be read by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write(path, write):
+    """
+    Writes a file through a temporary sibling and renames it into place,
+    so readers see either the old or the new contents, never a partial file.
+    The file keeps the mode of the one it replaces, or gets the mode a new
+    file would.
+
+    :param str path: The destination path.
+    :param write: A callable given the open text file to write to.
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.tmp', dir=directory or '.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            write(f)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        # mkstemp files are private to their owner
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Holds an exclusive lock on `path` across processes, e.g. the workers
+    of a pre-fork server, waiting for any other holder to release it.
+
+    :param str path: The lock file, created if missing.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SheetRefresher:
+    """
+    SheetRefresher downloads season sheets from the Google Sheets API.
+
+    Sheets are fetched concurrently over one pooled session. Failed
+    requests and 429/5xx responses are retried with exponential backoff,
+    and each sheet is written to the data folder atomically.
+
+    Parameters
+    ----------
+    spreadsheet_id: :class:`str`
+        The ID of the spreadsheet containing one sheet per season.
+
+    api_key: :class:`str`
+        The API key appended to every request.
+
+    data_dir: :class:`str`
+        The folder sheets are written to.
+
+    api_root: :class:`str`
+        The Sheets API base URL. Point this at a local server to test
+        against a stand-in for the real API.
+
+    workers: :class:`int`
+        The number of sheets fetched at once, which is also the size of
+        the connection pool.
+
+    timeout: :class:`float`
+        Seconds to wait for a connection or a response.
+
+    retries: :class:`int`
+        The number of times a failed request is retried.
+
+    backoff: :class:`float`
+        The backoff factor between retries, in seconds.
+    """
+    def __init__(self, spreadsheet_id, api_key, data_dir='data', api_root=SHEETS_API_ROOT,
+                 workers=4, timeout=10, retries=3, backoff=0.5):
+        self.spreadsheet_id = spreadsheet_id
+        self.api_key = api_key
+        self.data_dir = data_dir
+        self.api_root = api_root.rstrip('/')
+        self.workers = workers
+        self.timeout = timeout
+
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def _base_uri(self):
+        """The base URI for all Sheets API requests."""
+        return f'{self.api_root}/spreadsheets/{self.spreadsheet_id}'
+
+    def _get(self, uri):
+        SHEET_REQUESTS.inc()
+        resp = self.session.get(uri, params={'key': self.api_key}, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def get_sheet_names(self):
+        """Retrieves the season sheet names, newest first."""
+        resp = self._get(self._base_uri)
+        titles = [sheet['properties']['title'] for sheet in resp['sheets']]
+        return [title for title in titles if 'test' not in title]
+
+    def get_sheet(self, name):
+        """Retrieves the cell values of a sheet given its title."""
+        return self._get(f'{self._base_uri}/values/{quote(name, safe="")}')
+
+    def write_sheet(self, name, data):
+        """
+        Saves sheet data to the data folder in the compact format (see
+        :func:`sheets.normalize`), replacing any legacy copy of the sheet.
+        """
+        path = os.path.join(self.data_dir, name + COMPACT_EXT)
+        atomic_write(path, lambda f: dump_compact(data, f))
+        legacy_path = os.path.join(self.data_dir, name + LEGACY_EXT)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+    def refresh(self):
+        """
+        Fetches the current season, plus any season missing locally.
+
+        :returns: The sheet names, newest first. The first name is the
+            current season.
+        """
+        with REFRESH_SECONDS.time():
+            names = self.get_sheet_names()
+            cur_season = names[0]
+            local = list_sheets(self.data_dir)
+            # Always update the latest sheet
+            stale = [name for name in names if name == cur_season or name not in local]
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                sheets = list(pool.map(self.get_sheet, stale))
+            for name, data in zip(stale, sheets):
+                self.write_sheet(name, data)
+        return names
+
+    def schedule(self, interval, job):
+        """
+        Runs `job` now and then every `interval` seconds in a daemon thread
+        until :meth:`stop` is called. Errors are reported and do not stop
+        the schedule.
+
+        :returns: The background :class:`threading.Thread`
+        """
+        def run():
+            while not self._stop.is_set():
+                try:
+                    job()
+                except Exception:
+                    REFRESH_ERRORS.inc()
+                    log.exception('Error refreshing sheet data')
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name='sheet-refresher', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Stops the scheduled refresh and waits for it to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
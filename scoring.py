@@ -0,0 +1,204 @@
+"""
+Recomputes tournament points and season totals from placements, to check
+the sheets and to try out other point formulas on every season.
+
+    python scoring.py --validate
+    python scoring.py --formula linear --best-of 0.6 --top 10
+"""
+import argparse
+import math
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    # Only the scalar formulas are usable without NumPy, e.g. by standings.py
+    np = None
+
+from data import SeasonRegistry
+
+# The league's points for 1st of n entrants are SHEET_SCALE * sqrt(n)
+SHEET_SCALE = 10 * math.log10(2.5)
+# Share of a season's tournaments counted towards the total, best results first
+BEST_OF = 0.8
+# Sheet points are rounded to cents, so sums may be off by a few of them
+TOLERANCE = 0.015
+
+
+def sheet_points(places, entrants):
+    """The sheets' formula: points fall with the square root of the place."""
+    return SHEET_SCALE * (entrants / places) ** 0.5
+
+
+def linear_points(places, entrants):
+    """One point for every entrant finishing at or below the place."""
+    return entrants - places + 1.0
+
+
+def log_points(places, entrants):
+    """Points grow with the log of the field size, like many pub leagues."""
+    return 10 * np.log1p(entrants / places)
+
+
+# Point formulas mapped to their names. Each is given a players × tournaments
+# matrix of places and the number of entrants of each tournament, and only
+# its results for the tournaments a player entered are used.
+FORMULAS = {
+    'sheet': sheet_points,
+    'linear': linear_points,
+    'log': log_points
+}
+
+
+class SeasonScores:
+    """
+    SeasonScores holds the points of every player of a season under one formula.
+
+    Attributes
+    ----------
+    season: :class:`data.Season`
+        The scored season.
+
+    points: :class:`numpy.ndarray`
+        A players × tournaments matrix of points, rounded to cents, in the
+        row order of :attr:`data.Season.players`. Tournaments a player did
+        not enter score ``0``.
+
+    totals: :class:`numpy.ndarray`
+        The season total of each player: their best `counted` tournaments
+        plus bonus points.
+
+    counted: :class:`int`
+        The number of tournaments counted towards each total.
+    """
+    def __init__(self, season, points, totals, counted):
+        self.season = season
+        self.points = points
+        self.totals = totals
+        self.counted = counted
+
+    def standings(self):
+        """``(name, total)`` pairs, highest total first."""
+        names = self.season.columns.names
+        order = np.argsort(-self.totals, kind='stable')
+        return [(names[i], round(self.totals[i].item(), 2)) for i in order]
+
+
+def counted_tournaments(num_tournaments, best_of=BEST_OF):
+    """
+    The number of tournaments counted towards a season total.
+
+    :param best_of: A share of the season's tournaments, a number of
+        tournaments, or ``None`` to count them all.
+    """
+    if best_of is None:
+        return num_tournaments
+    if isinstance(best_of, float):
+        return max(1, int(num_tournaments * best_of))
+    return min(best_of, num_tournaments)
+
+
+def score_season(season, formula='sheet', best_of=BEST_OF):
+    """
+    Scores every player and tournament of a season with array operations.
+
+    :param season: A :class:`data.Season` with :attr:`data.Season.columns`.
+    :param formula: A name from :data:`FORMULAS`, or a formula function.
+    :param best_of: See :func:`counted_tournaments`.
+    :returns: :class:`SeasonScores`
+    """
+    columns = season.columns
+    if columns is None:
+        raise ValueError('scoring needs the placement tables, which require NumPy')
+    formula = FORMULAS[formula] if isinstance(formula, str) else formula
+    places = columns.places
+    played = columns.played
+    entrants = columns.entrants()
+    # Skipped tournaments get a dummy place, their points are discarded
+    points = formula(np.where(played, places, 1).astype(np.float64), entrants.astype(np.float64))
+    points = np.round(np.where(played, points, 0.0), 2)
+
+    counted = counted_tournaments(points.shape[1], best_of)
+    return SeasonScores(season, points, season_totals(season, points, counted), counted)
+
+
+def season_totals(season, points, counted):
+    """Adds up the best `counted` points of each player and their bonus points."""
+    best = -np.sort(-points, axis=1)[:, :counted]
+    bonus = np.array([player.bonus_points for player in season.players], dtype=np.float64)
+    return np.round(best.sum(axis=1) + bonus, 2)
+
+
+def score_seasons(seasons, formula='sheet', best_of=BEST_OF):
+    """
+    Scores several seasons.
+
+    :returns: :class:`SeasonScores` mapped to season names.
+    """
+    return {season.name: score_season(season, formula, best_of) for season in seasons}
+
+
+def validate(season, best_of=BEST_OF, tolerance=TOLERANCE):
+    """
+    Checks the points and totals read from a sheet. Points are compared
+    with the sheet formula, and totals with the sum of the sheet's own
+    points under the `best_of` rule, so a wrong result is reported once.
+
+    :returns: A dict with the ``placements`` whose points differ, as
+        ``(name, tournament, place, sheet points, computed points)``, and
+        the ``totals`` that differ, as ``(name, sheet total, computed total)``.
+    """
+    scores = score_season(season, 'sheet', best_of)
+    columns = season.columns
+    rows, cols = np.nonzero(columns.played & (np.abs(scores.points - columns.points) > tolerance))
+    placements = [(columns.names[i], f'Tournament {j + 1}', int(columns.places[i, j]),
+                   columns.points[i, j].item(), scores.points[i, j].item())
+                  for i, j in zip(rows, cols)]
+    expected = season_totals(season, columns.points, scores.counted)
+    sheet_totals = np.array([player.total_points for player in season.players], dtype=np.float64)
+    totals = [(columns.names[i], sheet_totals[i].item(), expected[i].item())
+              for i in np.flatnonzero(np.abs(expected - sheet_totals) > tolerance)]
+    return {'placements': placements, 'totals': totals}
+
+
+def parse_best_of(value):
+    if value == 'all':
+        return None
+    return float(value) if '.' in value else int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--formula', default='sheet', choices=FORMULAS)
+    parser.add_argument('--best-of', type=parse_best_of, default=BEST_OF,
+                        help='tournaments counted per season: a share like 0.8, a number, or "all"')
+    parser.add_argument('--validate', action='store_true',
+                        help='compare the sheet formula with the points in the sheets')
+    parser.add_argument('--top', type=int, default=5, help='players shown per season')
+    args = parser.parse_args()
+
+    seasons = list(SeasonRegistry.from_directory('data'))
+    if args.validate:
+        for season in seasons:
+            problems = validate(season, args.best_of)
+            print(f'{season.name}: {len(problems["placements"])} placements and '
+                  f'{len(problems["totals"])} totals differ from the sheet')
+            for name, tournament, place, sheet, computed in problems['placements']:
+                print(f'    {name}, {tournament}, place {place}: {sheet} in the sheet, {computed} computed')
+            for name, sheet, computed in problems['totals']:
+                print(f'    {name} total: {sheet} in the sheet, {computed} computed')
+        return
+
+    start = time.perf_counter()
+    scores = score_seasons(seasons, args.formula, args.best_of)
+    elapsed = time.perf_counter() - start
+    for season in seasons:
+        print(f'{season.name} (best {scores[season.name].counted} of {season.num_tournaments})')
+        for rank, (name, total) in enumerate(scores[season.name].standings()[:args.top]):
+            was = season.get_player(name).rank
+            print(f'    {rank + 1:>3}. {name:<28} {total:>8.2f}   was {was + 1}')
+    print(f'Scored {len(seasons)} seasons in {elapsed * 1e3:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
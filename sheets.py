@@ -0,0 +1,98 @@
+import json
+import os
+import re
+
+LEGACY_EXT = '.json'
+COMPACT_EXT = '.ndjson'
+
+
+def normalize(values):
+    """
+    Converts the raw cell grid of a season sheet into typed records.
+
+    The first record is the season header, e.g.
+    ``{'season': '2018F', 'season_num': '7', 'tournaments': 10}``. Every
+    following record is one player row that has points::
+
+        [bonus_points, total_points, name, [[tournament, place, points], ...]]
+
+    Empty rows and cells, and tournaments a player did not enter, are
+    dropped.
+
+    :param values: The ``values`` list of a Sheets API response.
+    :returns: A generator of records.
+    """
+    num_tournaments = 0
+    for i, data in enumerate(values):
+        if not data:
+            continue
+        if i == 0:
+            season_name, season_num = re.match(r'(.+) \(Season (\d+)\)', data[1]).groups()
+            num_tournaments = len([x for x in data if 'Tourn' in x])
+            yield {'season': season_name, 'season_num': season_num, 'tournaments': num_tournaments}
+        elif i > 2:
+            if len(data) < 4:
+                continue
+            _, bonus_points, total_points, name, *tournament_data = data
+            if total_points == '0' or total_points == '':
+                continue
+            placements = []
+            for j in range(1, min(len(tournament_data) - 1, 2 * num_tournaments), 2):
+                place = int(tournament_data[j] or 0)
+                if place == 0:
+                    continue
+                placements.append([(j + 1) // 2, place, float(tournament_data[j + 1])])
+            yield [int(bonus_points or '0'), float(total_points), name, placements]
+
+
+def dump_compact(data, f):
+    """Writes a Sheets API response to `f` in the compact format, one record per line."""
+    for record in normalize(data['values']):
+        f.write(json.dumps(record, separators=(',', ':')))
+        f.write('\n')
+
+
+def read_records(path):
+    """
+    Streams the records of a season file, in either format.
+
+    Compact files are read one line at a time. Legacy files, which hold
+    the raw Sheets API response, have to be loaded whole and normalized.
+
+    :param str path: The path of a ``.ndjson`` or ``.json`` season file.
+    :returns: A generator of records, see :func:`normalize`.
+    """
+    with open(path) as f:
+        if path.endswith(COMPACT_EXT):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from normalize(json.load(f)['values'])
+
+
+def list_sheets(path='data'):
+    """
+    Finds the season files in a data folder.
+
+    :returns: A dict mapping sheet titles to file names. If a sheet exists
+        in both formats, the compact file is used.
+    """
+    sheets = {}
+    for file in sorted(os.listdir(path)):
+        sheet, ext = os.path.splitext(file)
+        if ext == COMPACT_EXT or (ext == LEGACY_EXT and sheet not in sheets):
+            sheets[sheet] = file
+    return sheets
+
+
+if __name__ == '__main__':
+    # Convert every legacy sheet in the data folder to the compact format
+    from refresh import atomic_write
+    for sheet, file in list_sheets('data').items():
+        if file.endswith(LEGACY_EXT):
+            with open(os.path.join('data', file)) as f:
+                data = json.load(f)
+            atomic_write(os.path.join('data', sheet + COMPACT_EXT), lambda f: dump_compact(data, f))
+            os.remove(os.path.join('data', file))
+            print(f'Converted {file}')
@@ -0,0 +1,327 @@
+import json
+import math
+import os
+import random
+
+from data import Player
+from refresh import file_lock
+from scoring import BEST_OF, counted_tournaments, sheet_points
+
+
+class _Node:
+    __slots__ = ('key', 'value', 'priority', 'size', 'left', 'right')
+
+    def __init__(self, key, value, priority):
+        self.key = key
+        self.value = value
+        self.priority = priority
+        self.size = 1
+        self.left = None
+        self.right = None
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _resize(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+
+def _split(node, key):
+    """Splits a subtree into the nodes with keys below `key` and the rest."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _resize(node), right
+    left, node.left = _split(node.left, key)
+    return left, _resize(node)
+
+
+def _merge(left, right):
+    """Joins two subtrees, every key in `left` being below those in `right`."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _resize(left)
+    right.left = _merge(left, right.left)
+    return _resize(right)
+
+
+def _remove(node, key):
+    if node is None:
+        raise KeyError(key)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    elif node.key < key:
+        node.right = _remove(node.right, key)
+    else:
+        return _merge(node.left, node.right)
+    return _resize(node)
+
+
+def _collect(node, start, stop, out):
+    """Appends the values ranked `start` to `stop` (excluded) within a subtree."""
+    if node is None or start >= stop:
+        return
+    left = _size(node.left)
+    if start < left:
+        _collect(node.left, start, min(stop, left), out)
+    if start <= left < stop:
+        out.append(node.value)
+    if stop > left + 1:
+        _collect(node.right, max(start - left - 1, 0), stop - left - 1, out)
+
+
+class OrderStatisticTree:
+    """
+    OrderStatisticTree keeps values sorted by unique keys in a treap whose
+    nodes count the size of their subtree.
+
+    Inserting, removing, finding the rank of a key and finding the value at
+    a rank take O(log n) expected time, and listing the values between two
+    ranks O(log n + k).
+
+    Parameters
+    ----------
+    seed: Optional[:class:`int`]
+        Seeds the random node priorities.
+    """
+    def __init__(self, seed=None):
+        self.root = None
+        self._random = random.Random(seed)
+
+    def __len__(self):
+        return _size(self.root)
+
+    def insert(self, key, value):
+        """Adds `value` under `key`, which must not be in the tree yet."""
+        left, right = _split(self.root, key)
+        node = _Node(key, value, self._random.random())
+        self.root = _merge(_merge(left, node), right)
+
+    def remove(self, key):
+        """Removes the value under `key`, raising :class:`KeyError` if there is none."""
+        self.root = _remove(self.root, key)
+
+    def rank(self, key):
+        """
+        The number of keys below `key`.
+
+        :raises KeyError: if `key` is not in the tree.
+        """
+        rank = 0
+        node = self.root
+        while node is not None:
+            if key < node.key:
+                node = node.left
+            elif node.key < key:
+                rank += _size(node.left) + 1
+                node = node.right
+            else:
+                return rank + _size(node.left)
+        raise KeyError(key)
+
+    def select(self, rank):
+        """
+        The value at `rank`, starting at 0.
+
+        :raises IndexError: if `rank` is out of range.
+        """
+        if not 0 <= rank < len(self):
+            raise IndexError(rank)
+        node = self.root
+        while True:
+            left = _size(node.left)
+            if rank < left:
+                node = node.left
+            elif rank > left:
+                rank -= left + 1
+                node = node.right
+            else:
+                return node.value
+
+    def slice(self, start, stop):
+        """The values ranked `start` to `stop` (excluded), in order."""
+        values = []
+        _collect(self.root, max(start, 0), min(stop, len(self)), values)
+        return values
+
+
+class Standings:
+    """
+    Standings keeps the players of a season ordered by total points while
+    results are entered one at a time.
+
+    Players are ranked like :class:`data.Season` ranks them: by total
+    points, ties going to the player listed first in the sheet. Each new
+    result moves one player, so only the ranks between the player's old and
+    new position change and are updated in :attr:`data.Player.rank`.
+
+    Parameters
+    ----------
+    season: :class:`data.Season`
+        The season to keep the standings of. New results are written to
+        its players and placement table.
+
+    best_of: Union[:class:`float`, :class:`int`, ``None``]
+        The tournaments counted towards a total, see
+        :func:`scoring.counted_tournaments`.
+    """
+    def __init__(self, season, best_of=BEST_OF):
+        self.season = season
+        self.best_of = best_of
+        self.tree = OrderStatisticTree()
+        self._keys = {}
+        self._rows = {}
+        for order, player in enumerate(season.players):
+            self._rows[player.name] = order
+            self._insert(player, order)
+
+    def _insert(self, player, order):
+        key = (-player.total_points, order)
+        self._keys[player.name] = key
+        self.tree.insert(key, player)
+
+    def __len__(self):
+        return len(self.tree)
+
+    def rank(self, name):
+        """
+        The zero-based rank of a player.
+
+        :raises KeyError: if the player has no result this season.
+        """
+        return self.tree.rank(self._keys[name])
+
+    def between(self, start, stop):
+        """The players ranked `start` to `stop` (excluded), best first."""
+        return self.tree.slice(start, stop)
+
+    def add_result(self, name, tournament, place, points=None, entrants=None):
+        """
+        Records one tournament result, replacing any earlier result of the
+        player in that tournament, and moves the player to their new rank.
+
+        :param str name: The player's name, as "John Doe" or "Doe, John".
+            Unknown players are added to the season.
+        :param int tournament: The tournament number, starting at 1.
+        :param int place: The finishing place.
+        :param points: The points earned. Computed with
+            :func:`scoring.sheet_points` from `place` and `entrants` if omitted.
+        :param entrants: The number of players in the tournament.
+        :returns: The players whose results or rank changed, `name` first.
+        """
+        season = self.season
+        if not 1 <= tournament <= season.num_tournaments:
+            raise ValueError(f'{season.name} has tournaments 1 to {season.num_tournaments}')
+        if place < 1:
+            raise ValueError('places start at 1')
+        if points is None:
+            if entrants is None or entrants < place:
+                raise ValueError('the points or a number of entrants of at least the place are needed')
+            points = round(sheet_points(place, entrants), 2)
+        elif not math.isfinite(points) or points < 0:
+            raise ValueError('points must be a finite number of at least 0')
+
+        player = season.index.get(name)
+        if player is None:
+            # Parses "Last, First" sheet names like the sheets do
+            player = Player(season.season_num, 0, 0, name, [])
+            name = player.name
+            player = season.index.get(name, player)
+        if name not in season.index:
+            player.rank = len(season.players)
+            season.players.append(player)
+            season.index[name] = player
+            self._rows[name] = len(season.players) - 1
+            if season.columns is not None:
+                season.columns.add_row(name)
+            self._insert(player, self._rows[name])
+        old_rank = self.rank(name)
+
+        label = f'Tournament {tournament}'
+        placements = [x for x in player.placements if x['tournament'] != label]
+        placements.append({'tournament': label, 'place': place, 'points': points})
+        placements.sort(key=lambda x: int(x['tournament'].rsplit(' ', 1)[1]))
+        player.placements = placements
+        if season.columns is not None:
+            season.columns.set_result(self._rows[name], tournament, place, points)
+
+        counted = counted_tournaments(season.num_tournaments, self.best_of)
+        best = sorted((x['points'] for x in placements), reverse=True)[:counted]
+        self.tree.remove(self._keys[name])
+        player.total_points = round(sum(best) + player.bonus_points, 2)
+        self._insert(player, self._rows[name])
+        new_rank = self.rank(name)
+
+        # Everyone between the old and new rank moved by one place
+        low, high = min(old_rank, new_rank), max(old_rank, new_rank)
+        moved = self.between(low, high + 1)
+        for rank, other in enumerate(moved, low):
+            other.rank = rank
+        return [player] + [other for other in moved if other is not player]
+
+
+class ResultsLog:
+    """
+    ResultsLog shares the results entered live between the processes
+    serving the app, e.g. the workers of a pre-fork server, as lines of
+    JSON appended to one file. A process appends its results while holding
+    :meth:`lock`, and applies those of the others from :meth:`read_new`.
+
+    Parameters
+    ----------
+    path: :class:`str`
+        The file the results are appended to.
+    """
+    def __init__(self, path):
+        self.path = path
+        # Bytes of the file read so far
+        self.offset = 0
+
+    def lock(self):
+        """Holds the lock on the log across processes, see :func:`refresh.file_lock`."""
+        return file_lock(f'{self.path}.lock')
+
+    def has_new(self):
+        """Whether results were appended since the last :meth:`read_new`."""
+        try:
+            return os.path.getsize(self.path) != self.offset
+        except FileNotFoundError:
+            return self.offset != 0
+
+    def read_new(self):
+        """
+        Reads the results appended since the last call.
+
+        :returns: The results as dicts, in the order they were entered.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    # The log was replaced, read it again from the start
+                    self.offset = 0
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            self.offset = 0
+            return []
+        # A line still being written is read next time
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        return [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+
+    def append(self, result):
+        """Appends one result. Hold :meth:`lock` and apply :meth:`read_new` first."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(json.dumps(result).encode() + b'\n')
+            self.offset = f.tell()
\ No newline at end of file
@@ -1,32 +1,82 @@
 
+var LEADERBOARD_PAGE = 25;
+
+// Appends the next page of a leaderboard panel from the API
+function loadLeaderboard(panel){
+    var list = panel.find(".stat-list");
+    var params = {
+        season: $("#stats-container").data("season"),
+        offset: list.children().length,
+        limit: LEADERBOARD_PAGE
+    };
+    $.getJSON("/api/leaderboards/" + panel.data("leaderboard"), params, function(page){
+        $.each(page.entries, function(i, entry){
+            list.append($("<p>").addClass("stat").text(entry.name + ": " + entry.value));
+        });
+        panel.find(".stats-more").prop("hidden", !page.more);
+    });
+}
+
+// Shows a leaderboard panel, loading its first page the first time
+function showLeaderboard(id){
+    var panel = $(id);
+    panel.show().siblings("div").hide();
+    if (!panel.data("loaded")){
+        panel.data("loaded", true);
+        loadLeaderboard(panel);
+    }
+}
+
 $(function(){
 
 
      $("#most-top-3").click(function(){
 
-        $("#top-3").show().siblings("div").hide();
+        showLeaderboard("#top-3");
 
 
     });
 
      $("#most-final-tables").click(function(){
 
-        $("#final-tables").show().siblings("div").hide();
+        showLeaderboard("#final-tables");
 
 
     });
 
 
      $("#most-consecutive").click(function(){
-        $("#most-cscv").show().siblings("div").hide();
+        showLeaderboard("#most-cscv");
 
 
     });
 
      $("#best-avg-place-box").click(function(){
-        $("#best-avg-place").show().siblings("div").hide();
+        showLeaderboard("#best-avg-place");
 
 
+    });
+
+     $("#projected-top-10").click(function(){
+        showLeaderboard("#projected");
+    });
+
+     $(".stats-more").click(function(event){
+         event.preventDefault();
+         loadLeaderboard($(this).closest("[data-leaderboard]"));
+    });
+
+     $("#searchbox").on("input", function(){
+         var query = $(this).val();
+         if (query.length === 0){
+             return;
+         }
+         $.getJSON("/autocomplete", {q: query}, function(names){
+             var options = $("#name-suggestions").empty();
+             $.each(names, function(i, name){
+                 options.append($("<option>").val(name));
+             });
+         });
     });
 
      $("#submitbutton").click(function(){
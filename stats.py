@@ -2,35 +2,91 @@ from data import *
 from collections import defaultdict
 from collections import OrderedDict
 
+import hashlib
+import heapq
 import json
-
-info = Stats()
-seasons = {"2018F": 5, "2018S": 6}
-
-def most_final_tables(season):
-    season_id = seasons[season]
-    players = info.seasons[season_id].players
+import logging
+import os
+import threading
+import time
+
+import metrics
+from standings import ResultsLog, Standings
+
+try:
+    from headtohead import HeadToHead, rivalries
+    from projections import SeasonModel, simulate
+    from ratings import RatingHistory
+except ImportError:
+    # Head-to-head records, projections and ratings need NumPy
+    HeadToHead = RatingHistory = SeasonModel = None
+
+# Set LAZY_SEASONS to keep only the current season and that many others in memory
+info = Stats(lazy=True, max_resident=int(os.environ['LAZY_SEASONS'])) if os.environ.get('LAZY_SEASONS') else Stats()
+
+log = logging.getLogger(__name__)
+
+HELPER_SECONDS = metrics.histogram('poker_stats_helper_seconds', 'Time spent in each stats.py helper.', ['helper'])
+timed = HELPER_SECONDS.timed('helper')
+
+def _leaders(names, values, minimum=0, reverse=True, k=None):
+    """
+    Pairs names with values above `minimum`, ordered like the sorted() versions.
+
+    :param k: Only return the first `k` pairs, selected with a heap
+        instead of sorting every value.
+    """
+    if k is None:
+        order = np.argsort(-values if reverse else values, kind='stable')
+        return [(names[i], values[i].item()) for i in order if values[i] > minimum]
+    keys = -values if reverse else values
+    # Ties keep their row order, like the stable sort
+    order = heapq.nsmallest(k, np.flatnonzero(values > minimum).tolist(), key=lambda i: (keys[i], i))
+    return [(names[i], values[i].item()) for i in order]
+
+@timed
+def most_final_tables(season, k=None):
+    season_obj = info.seasons[season]
+    columns = season_obj.columns
+    if columns is not None:
+        return _leaders(columns.names, columns.count_places(10), minimum=1, k=k)
+    players = season_obj.players
     final_tables = {p.name: sum(0 < x['place'] < 10 for x in p.placements) for p in players}
     data = sorted(filter(lambda y: y[1], final_tables.items()), key=lambda x: -x[1])
-    return [x for x in data if x[1] > 1]
-
-def most_top_3(season):
-    season_id = seasons[season]
-    players = info.seasons[season_id].players
+    return [x for x in data if x[1] > 1][:k]
+
+@timed
+def most_top_3(season, k=None):
+    season_obj = info.seasons[season]
+    columns = season_obj.columns
+    if columns is not None:
+        return _leaders(columns.names, columns.count_places(4), k=k)
+    players = season_obj.players
     top3 = {p.name: sum(0 < x['place'] < 4 for x in p.placements) for p in players}
     data = sorted(filter(lambda y: y[1], top3.items()), key=lambda x: -x[1])
-    return [x for x in data if x[1] > 0]
-
-def sum_of_placements(season):
-    season_id = seasons[season]
+    return [x for x in data if x[1] > 0][:k]
+
+@timed
+def sum_of_placements(season, k=None):
+    season_obj = info.seasons[season]
+    columns = season_obj.columns
+    if columns is not None:
+        # Only tournaments with entrants count, and missing one counts as finishing last
+        entrants = columns.entrants()[:season_obj.num_tournaments]
+        held = np.flatnonzero(entrants)
+        places = columns.places[:, held]
+        filled = np.where(places > 0, places, entrants[held])
+        return _leaders(columns.names, filled.sum(axis=1), reverse=False, k=k)
     count = tournament_count(season)
     result = defaultdict(int)
-    player_list = info.seasons[season_id].players
+    player_list = season_obj.players
 
     for index, p in enumerate(player_list):
 
 
-        for i in range(10):
+        for i in range(season_obj.num_tournaments):
+            if 'Tournament ' + str(i+1) not in count:
+                continue
             search_result = search(p.name, p.placements, i)
             if(search_result):
                 result[p.name] += search_result['place']
@@ -38,7 +94,7 @@ def sum_of_placements(season):
                 result[p.name] += count['Tournament ' + str(i+1)]
 
     data = sorted(filter(lambda y: y[1], result.items()), key=lambda x: x[1])
-    return [x for x in data]
+    return data[:k]
 
 
 
@@ -49,47 +105,43 @@ def search(name, players, i):
             return p
 
 
-def get_names(name, season):
-    season_id = seasons[season]
-
-    name_list = [p.name for p in info.seasons[season_id].players if name in p.name]
-
-    return name_list
+@timed
+def get_names(name, season=None, limit=None):
+    """Searches player names, optionally only those who played in `season`."""
+    within = info.seasons[season].index if season else None
+    return info.search_index.search(name, limit=limit, within=within)
 
+@timed
 def get_all_names(season):
-    season_id = seasons[season]
+    season_obj = info.seasons[season]
 
-    name_list = [p.name for p in info.seasons[season_id].players]
+    name_list = [p.name for p in season_obj.players]
 
     return name_list
 
-def get_best_placement(name, season):
-
-    season_id = seasons[season]
-    player_list = info.seasons[season_id].players
-    id = 0
-    for p in player_list:
-        if str(name) == p.name:
-            break
-        else:
-            id += 1
-
-
-    placement_list = player_list[id].placements
-    parsed_placements = {}
-    for i, tournid in enumerate(placement_list):
-
-        parsed_placements[tournid['tournament']] = tournid['place']
+@timed
+def find_player(name, season):
+    """Returns the :class:`Player` called `name`, or a merged spelling of it, in `season`, or None."""
+    return info.seasons[season].get_player(info.canonical_name(str(name)))
 
+@timed
+def get_best_placement(name, season):
+    p = find_player(name, season)
+    if p is None or not p.placements:
+        return None
 
-    min_key = min(parsed_placements, key=parsed_placements.get)
-    return (min_key, parsed_placements[min_key])
+    best = min(p.placements, key=lambda x: x['place'])
+    return (best['tournament'], best['place'])
 
 
-def most_consecutive_finals(season):
+@timed
+def most_consecutive_finals(season, k=None):
 
-    seasonid = seasons[season]
-    player_list = info.seasons[seasonid].players
+    season_obj = info.seasons[season]
+    columns = season_obj.columns
+    if columns is not None:
+        return _leaders(columns.names, columns.longest_streak(10), minimum=1, k=k)
+    player_list = season_obj.players
     result = defaultdict(int)
 
     for i, player in enumerate(player_list):
@@ -109,31 +161,27 @@ def most_consecutive_finals(season):
     result = {k: v for (k, v) in result.items() if v > 1}
 
     data = sorted(filter(lambda y: y[1], result.items()), key=lambda x: -x[1])
-    return [x for x in data]
+    return data[:k]
 
 
 
 
 
+@timed
 def get_final_tables(name, season):
-    season_id = seasons[season]
-    player_list = info.seasons[season_id].players
-    id = 0
-    for p in player_list:
-        if str(name) == p.name:
-            break
-        else:
-            id += 1
+    p = find_player(name, season)
+    if p is None:
+        return None
 
-    p = player_list[id]
     return sum(0 < x['place'] < 10 for x in p.placements)
 
 
 
+@timed
 def tournament_count(season):
-    season_id = seasons[season]
+    season_obj = info.seasons[season]
     players = defaultdict(int)
-    player_list = info.seasons[season_id].players
+    player_list = season_obj.players
 
     for i, placements in enumerate(player_list):
 
@@ -143,39 +191,37 @@ def tournament_count(season):
 
     return OrderedDict(sorted(players.items(), key=lambda t: t[0]))
 
+@timed
 def tournaments_no(name, season):
-    season_id = seasons[season]
-    player_list = info.seasons[season_id].players
-
-    for index, player in enumerate(player_list):
+    p = find_player(name, season)
+    if p is None:
+        return None
 
-        if str(player.name) == name:
-            return len(player.placements)
+    return len(p.placements)
 
 
+@timed
 def get_results(name, season):
-    season_id = seasons[season]
-    player_list = info.seasons[season_id].players
-    p_obj = None
-    p_results = []
-    for index, player in enumerate(player_list):
+    p = find_player(name, season)
+    if p is None:
+        return None
 
-        if str(player.name) == name:
-            p_obj = player
-            break
+    return [(x['tournament'], x['place']) for x in p.placements]
 
-    for p in p_obj.placements:
-        tuple_results = [(p['tournament'], p['place'])]
-        p_results += tuple_results
 
-    return p_results
-
-
-def best_avg_place(season):
+@timed
+def best_avg_place(season, k=None):
     best_percent = 0.5
-    season_id = seasons[season]
-    player_list = info.seasons[season_id].players
-    minimum_percent = [i for i in player_list if len(i.placements)/10 >= best_percent]
+    season_obj = info.seasons[season]
+    columns = season_obj.columns
+    if columns is not None:
+        attendance = columns.attendance()
+        totals = columns.places.sum(axis=1)
+        rows = np.flatnonzero(attendance / max(season_obj.num_tournaments, 1) >= best_percent)
+        averages = np.array([round(int(totals[i]) / int(attendance[i]), 2) for i in rows])
+        return _leaders([columns.names[i] for i in rows], averages, reverse=False, k=k)
+    player_list = season_obj.players
+    minimum_percent = [i for i in player_list if len(i.placements)/max(season_obj.num_tournaments, 1) >= best_percent]
     player_total = defaultdict(int)
     for index, player in enumerate(minimum_percent):
 
@@ -185,11 +231,11 @@ def best_avg_place(season):
         player_total[player.name] = round(player_total[player.name]/len(player.placements), 2)
 
     data = sorted(filter(lambda y: y[1], player_total.items()), key=lambda x: x[1])
-    return [x for x in data]
+    return data[:k]
 
 
+@timed
 def avg_to_final(season):
-    season_id = seasons[season]
     count = tournament_count(season)
     result = {}
     result_avg = 0
@@ -211,6 +257,422 @@ def avg_to_final(season):
 
 
 
+class ProjectionCache:
+    """
+    Keeps the projected chances of finishing each season in the top 10.
+
+    Seasons are simulated in a background thread, never while a request
+    waits. Nothing is served for a season until its first projection is
+    ready; after the data changes, the previous projection is served
+    while the next one runs, at most once every `interval` seconds per
+    season, so results entered live one at a time do not each start a
+    simulation.
+
+    Attributes
+    ----------
+    simulations: :class:`int`
+        The simulations run per season.
+
+    workers: :class:`int`
+        The processes they are spread over, see :func:`projections.simulate`.
+
+    interval: :class:`float`
+        The minimum seconds between two projections of a season.
+
+    version: :class:`str`
+        Changes whenever a new projection is served, so pages showing them
+        are not validated by the data version alone.
+
+    modified: :class:`float`
+        When the latest projection was made, as a Unix timestamp.
+    """
+    def __init__(self, stats, simulations=100000, workers=None, interval=60):
+        self.stats = stats
+        self.simulations = simulations
+        self.workers = workers
+        self.interval = interval
+        self.version = ''
+        self.modified = 0.0
+        # Season name -> (data version, time.monotonic() when made, projection)
+        self.entries = {}
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def compute(self, season):
+        """
+        Projects a season right away, e.g. to have it ready before the
+        server forks its workers.
+
+        :returns: See :meth:`get`.
+        """
+        if SeasonModel is None:
+            return None
+        with _standings_lock:
+            # Not while a live result is being entered
+            version = self.stats.data_version
+            season = self.stats.seasons[season]
+            model = SeasonModel.from_season(season, self.stats.seasons.results())
+        entry = model.remaining, simulate(model, self.simulations, workers=self.workers)
+        with self._lock:
+            self.entries[season.name] = (version, time.monotonic(), entry)
+            made = sorted((name, value[0]) for name, value in self.entries.items())
+            self.version = hashlib.sha1(repr(made).encode()).hexdigest()[:8]
+            self.modified = time.time()
+        return entry
+
+    def _compute_later(self, season):
+        def run():
+            try:
+                self.compute(season)
+            except Exception:
+                log.exception('Projecting %s failed', season)
+            finally:
+                with self._lock:
+                    self._running.discard(season)
+
+        self._running.add(season)
+        threading.Thread(target=run, name=f'projection-{season}', daemon=True).start()
+
+    def get(self, season):
+        """
+        Returns the latest projection of a season, starting a new one in
+        the background if it is missing or made from older data.
+
+        :returns: The number of tournaments left and each player's chance
+            of finishing in the top 10, or ``None`` without NumPy or until
+            the season's first projection is ready.
+        """
+        if SeasonModel is None:
+            return None
+        season = self.stats.seasons[season].name
+        with self._lock:
+            made = self.entries.get(season)
+            stale = made is None or made[0] != self.stats.data_version
+            due = made is None or time.monotonic() - made[1] >= self.interval
+            if stale and due and season not in self._running:
+                self._compute_later(season)
+        return made[2] if made is not None else None
+
+
+projections = ProjectionCache(info)
+
+def content_version():
+    """
+    The version of what pages show: :attr:`Stats.data_version` and the
+    :attr:`ProjectionCache.version` of the projections made from it so far.
+    """
+    return f'{info.data_version}-{projections.version}'
+
+@timed
+def projected_top_10(season, k=None):
+    """The players' chances, in percent, of finishing the season in the top 10."""
+    entry = projections.get(season)
+    if entry is None:
+        return []
+    names = list(entry[1])
+    chances = np.round(100 * np.array(list(entry[1].values())), 1)
+    return _leaders(names, chances, k=k)
+
+@timed
+def get_top_chance(name, season):
+    """
+    Returns a player's chance of finishing `season` in the top 10, or
+    ``None`` once the season is over or if they are not in it.
+    """
+    entry = projections.get(season)
+    if entry is None or not entry[0]:
+        return None
+    return entry[1].get(info.canonical_name(name))
+
+
+class LeaderboardCache:
+    """
+    Keeps computed leaderboards in memory until the data changes.
+
+    Entries are keyed by (season, leaderboard, :func:`content_version`), so
+    a refresh that changes :attr:`Stats.data_version` makes every entry
+    stale, and so does a new projection. Each
+    leaderboard is then recomputed once, on its first request, while other
+    requests wait for that result instead of computing it again.
+
+    Requests for only the top `k` entries compute just those, and later
+    requests are served from them as long as they need no more entries.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _covers(entry, k):
+        rows, complete = entry
+        return complete or k is not None and k <= len(rows)
+
+    def get(self, name, season, k=None):
+        """
+        :param k: The number of leading entries needed, or ``None`` for all.
+        :returns: The leaderboard, or at least its first `k` entries.
+        """
+        key = (season, name, content_version())
+        entry = self.entries.get(key)
+        if entry is not None and self._covers(entry, k):
+            self.hits += 1
+            return entry[0]
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and self._covers(entry, k):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            if k is not None and entry is not None:
+                # Paging further down, select ahead so the next pages are hits
+                k = max(k, 2 * len(entry[0]))
+            rows = LEADERBOARDS[name](season, k=k)
+            # Drop leaderboards computed from older data
+            self.entries = {old: entry for old, entry in self.entries.items() if old[2] == key[2]}
+            self.entries[key] = (rows, k is None or len(rows) < k)
+            return rows
+
+
+LEADERBOARDS = {
+    'most_final_tables': most_final_tables,
+    'most_top_3': most_top_3,
+    'sum_of_placements': sum_of_placements,
+    'most_consecutive_finals': most_consecutive_finals,
+    'best_avg_place': best_avg_place,
+    'projected_top_10': projected_top_10
+}
+
+leaderboards = LeaderboardCache(info)
+
+@timed
+def leaderboard(name, season):
+    """Returns a leaderboard from :data:`LEADERBOARDS`, computing it at most once per data version."""
+    return leaderboards.get(name, info.seasons[season].name)
+
+@timed
+def leaderboard_page(name, season, offset=0, limit=25):
+    """
+    Returns a slice of a leaderboard from :data:`LEADERBOARDS`, computing
+    only the entries up to the end of the slice.
+
+    :returns: The ``(name, value)`` pairs and whether more entries follow.
+    """
+    rows = leaderboards.get(name, info.seasons[season].name, k=offset + limit + 1)
+    return rows[offset:offset + limit], len(rows) > offset + limit
+
+
+class HeadToHeadCache:
+    """
+    Keeps the :class:`headtohead.HeadToHead` records of the current data
+    version. They are built on the first request after the data changes,
+    once, while other requests wait for them.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+        self.version = None
+        self.records = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """:returns: The records, or ``None`` without NumPy."""
+        if HeadToHead is None:
+            return None
+        version = self.stats.data_version
+        if self.version == version:
+            return self.records
+        with self._lock:
+            if self.version != version:
+                self.records = HeadToHead.from_seasons(self.stats.seasons.results())
+                self.version = version
+            return self.records
+
+
+head_to_heads = HeadToHeadCache(info)
+
+@timed
+def head_to_head(name, opponent):
+    """
+    Returns how often `name` finished ahead of and behind `opponent` in the
+    tournaments both played, or ``None`` if either is unknown.
+    """
+    records = head_to_heads.get()
+    if records is None:
+        return None
+    return records.record(info.canonical_name(name), info.canonical_name(opponent))
+
+@timed
+def get_rivals(name, k=None):
+    """Returns the ``(opponent, wins, losses)`` of the players `name` met most often."""
+    records = head_to_heads.get()
+    return records.rivals(info.canonical_name(name), k) if records is not None else None
+
+@timed
+def top_rivalries(k=25):
+    """Returns the most played ``(name, opponent, wins, losses)`` pairs of all seasons."""
+    records = head_to_heads.get()
+    return rivalries(records, k) if records is not None else []
+
+
+class RatingsCache:
+    """
+    Keeps the :class:`ratings.RatingHistory` up to date with the data.
+
+    The history is read from :data:`ratings.RATINGS_PATH` on first use, and
+    on the first request after the data changes only the tournaments that
+    changed are rated again before it is saved. Requests wait for the
+    update and then read the ratings under the same lock.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+        self.version = None
+        self.history = None
+        self.lock = threading.RLock()
+
+    def get(self):
+        """
+        :returns: The up to date history, or ``None`` without NumPy. Hold
+            :attr:`lock` while reading it.
+        """
+        if RatingHistory is None:
+            return None
+        with self.lock:
+            version = self.stats.data_version
+            if self.version != version:
+                if self.history is None:
+                    self.history = RatingHistory.load()
+                if self.history.update(self.stats.seasons.results()):
+                    self.history.save()
+                self.version = version
+            return self.history
+
+
+rating_histories = RatingsCache(info)
+
+@timed
+def get_rating(name):
+    """Returns a player's current rating and number of rated tournaments, or ``None``."""
+    name = info.canonical_name(name)
+    with rating_histories.lock:
+        history = rating_histories.get()
+        if history is None or name not in history.ratings:
+            return None
+        return round(history.ratings[name], 1), history.played[name]
+
+@timed
+def get_rating_series(name):
+    """Returns the ``(season, tournament, rating)`` of every rated tournament of a player, or ``None``."""
+    with rating_histories.lock:
+        history = rating_histories.get()
+        return history.rating_series(info.canonical_name(name)) if history is not None else None
+
+@timed
+def rating_leaders(offset=0, limit=25, minimum=5):
+    """
+    Returns a page of the highest rated players.
+
+    :returns: The ``(name, rating)`` pairs and whether more follow.
+    """
+    with rating_histories.lock:
+        history = rating_histories.get()
+        rows = history.leaders(minimum) if history is not None else []
+    return rows[offset:offset + limit], len(rows) > offset + limit
+
+
+# Live standings of the seasons results were entered in, by season name
+_standings = {}
+_standings_lock = threading.Lock()
+# Set RESULTS_PATH when several processes serve the app, so the results
+# entered in any of them are applied by all of them
+results_log = ResultsLog(os.environ['RESULTS_PATH']) if os.environ.get('RESULTS_PATH') else None
+# The data the results in the log were applied to
+_results_version = None
+
+def _live_standings(season):
+    # A season with live results is never evicted in lazy mode, which would drop them
+    info.seasons.pin(season)
+    season_obj = info.seasons[season]
+    standings = _standings.get(season_obj.name)
+    if standings is None or standings.season is not season_obj:
+        # First result of the season, or the sheets were reloaded since
+        standings = _standings[season_obj.name] = Standings(season_obj)
+    return standings
+
+def _apply_result(result):
+    standings = _live_standings(result['season'])
+    changed = standings.add_result(result['name'], result['tournament'], result['place'],
+                                   result['points'], result['entrants'])
+    for player in changed:
+        info.record_player(standings.season, player)
+    player = changed[0]
+    return f'{standings.season.name}:{player.name}:{result["tournament"]}:{result["place"]}:{player.total_points}', player
+
+def _catch_up():
+    """Applies the results other processes logged since the last call. Hold _standings_lock."""
+    global _results_version
+    if _results_version != info.files_version:
+        # The sheets were reloaded, which dropped the results applied so far
+        _results_version = info.files_version
+        results_log.offset = 0
+    details = []
+    for result in results_log.read_new():
+        if result['files_version'] != info.files_version:
+            # Entered on other sheets, which replaced it or were replaced
+            continue
+        try:
+            details.append(_apply_result(result)[0])
+        except (KeyError, ValueError) as e:
+            log.warning('Skipping the logged result %r: %r', result, e)
+    if details:
+        info.mark_changed(';'.join(details))
+
+def sync_results():
+    """Applies the results entered by the other processes sharing RESULTS_PATH, if any."""
+    if results_log is None:
+        return
+    if results_log.has_new() or _results_version != info.files_version:
+        with _standings_lock:
+            _catch_up()
+
+@timed
+def add_result(season, name, tournament, place, points=None, entrants=None):
+    """
+    Enters one tournament result and updates the standings, profiles and
+    :attr:`Stats.data_version`. See :meth:`standings.Standings.add_result`.
+    With RESULTS_PATH set, the result is also logged there for the other
+    processes serving the app.
+
+    :returns: The :class:`Player` the result was entered for.
+    """
+    result = {'season': season, 'name': info.canonical_name(name), 'tournament': tournament,
+              'place': place, 'points': points, 'entrants': entrants}
+    with _standings_lock:
+        if results_log is None:
+            detail, player = _apply_result(result)
+        else:
+            with results_log.lock():
+                # Applied in the order they were logged
+                _catch_up()
+                detail, player = _apply_result(result)
+                result['files_version'] = info.files_version
+                results_log.append(result)
+        info.mark_changed(detail)
+        return player
+
+@timed
+def standings_page(season, offset=0, limit=25):
+    """
+    Returns a slice of a season's standings by total points.
+
+    :returns: The :class:`Player` entries and whether more follow.
+    """
+    with _standings_lock:
+        standings = _live_standings(season)
+        return standings.between(offset, offset + limit), len(standings) > offset + limit
+
+
 def print_best_sum():
     names = sum_of_placements("2018F")[0]
 
@@ -0,0 +1,68 @@
+import os
+import sys
+
+# The modules live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+from array import array
+
+import pytest
+
+from benchmarks.synthetic import write_league
+from data import SeasonResults
+
+
+@pytest.fixture
+def random_seasons():
+    """Builds random :class:`data.SeasonResults`, ties and absences included, oldest season first."""
+    def build(seasons=3, players=12, tournaments=5, seed=0):
+        rng = random.Random(seed)
+        pool = [f'Player {i}' for i in range(players * 2)]
+        results = []
+        for number in range(seasons):
+            names = rng.sample(pool, players)
+            rows, numbers, places = array('i'), array('i'), array('i')
+            for tournament in range(1, tournaments + 1):
+                entered = [row for row in range(players) if rng.random() < 0.7]
+                for row in entered:
+                    rows.append(row)
+                    numbers.append(tournament)
+                    # Few distinct places, so some players tie
+                    places.append(rng.randint(1, max(2, len(entered) // 2)))
+            results.append(SeasonResults(f'Season {number}', tournaments, names, [0.0] * players,
+                                         list(range(players)), rows, numbers, places))
+        return results
+    return build
+
+
+@pytest.fixture
+def league(tmp_path, monkeypatch):
+    """Runs the test in a folder holding a small synthetic league; returns its sheet titles, newest first."""
+    sheets = write_league(str(tmp_path), seasons=5, players=20, tournaments=4)
+    monkeypatch.chdir(tmp_path)
+    return sheets
+
+
+@pytest.fixture(scope='session')
+def app_league(tmp_path_factory):
+    """Imports the app, and with it stats, over a small synthetic league; returns the module and its folder."""
+    path = tmp_path_factory.mktemp('app')
+    write_league(str(path), seasons=4, players=30, tournaments=6)
+    # Started per worker under gunicorn, the background threads are not wanted here
+    os.environ['PRELOAD'] = '1'
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app, path
+
+
+@pytest.fixture
+def client(app_league, monkeypatch):
+    """A Flask test client of the app, run from its league's folder."""
+    app, path = app_league
+    monkeypatch.chdir(path)
+    return app.app.test_client()
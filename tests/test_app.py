@@ -0,0 +1,105 @@
+import pytest
+
+
+@pytest.fixture
+def app(app_league):
+    return app_league[0]
+
+
+@pytest.mark.parametrize('url', ['/stats', '/api/standings'])
+def test_unchanged_pages_are_not_sent_again(client, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    again = client.get(url, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert not again.data
+    assert again.headers['ETag'] == etag
+    since = client.get(url, headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 304
+
+
+def _etag_after(client, change):
+    etag = client.get('/api/standings').headers['ETag']
+    change()
+    response = client.get('/api/standings', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    return response
+
+
+def test_data_changes_make_a_new_etag(client, app):
+    response = _etag_after(client, lambda: app.info.mark_changed('test edit'))
+    assert response.last_modified.timestamp() == int(app.info.data_modified)
+
+
+def test_new_projections_make_a_new_etag(client, app, monkeypatch):
+    _etag_after(client, lambda: monkeypatch.setattr(app.projections, 'version', 'f00dfeed'))
+
+
+def test_template_changes_make_a_new_etag(client, app, monkeypatch):
+    _etag_after(client, lambda: monkeypatch.setattr(app, 'TEMPLATES_MODIFIED', app.TEMPLATES_MODIFIED + 60))
+
+
+def test_rendered_pages_are_reused(client, app, monkeypatch):
+    monkeypatch.setattr(app, 'page_cache', app.PageCache(2))
+    cached = app.PAGE_RESULTS.value(result='cached')
+    first = client.get('/api/standings?limit=3')
+    second = client.get('/api/standings?limit=3')
+    assert second.data == first.data
+    assert app.PAGE_RESULTS.value(result='cached') == cached + 1
+    # Only the pages used last are kept
+    client.get('/api/standings?limit=4')
+    client.get('/api/standings?limit=5')
+    assert [key[0] for key in app.page_cache.pages] == ['/api/standings?limit=4', '/api/standings?limit=5']
+
+
+def test_pages_follow_offset_and_limit(client):
+    everyone = client.get('/api/standings?limit=100').get_json()
+    assert not everyone['more']
+    names = [entry['name'] for entry in everyone['entries']]
+    page = client.get('/api/standings?offset=5&limit=10').get_json()
+    assert [entry['name'] for entry in page['entries']] == names[5:15]
+    assert [entry['rank'] for entry in page['entries']] == list(range(6, 16))
+    assert page['more']
+    last = client.get(f'/api/standings?offset={len(names) - 3}&limit=10').get_json()
+    assert len(last['entries']) == 3 and not last['more']
+    assert client.get(f'/api/standings?offset={len(names)}').get_json()['entries'] == []
+
+
+def test_leaderboard_pages(client):
+    name = client.get('/api/leaderboards').get_json()['leaderboards'][0]
+    first = client.get(f'/api/leaderboards/{name}?limit=4').get_json()
+    second = client.get(f'/api/leaderboards/{name}?offset=4&limit=4').get_json()
+    assert len(first['entries']) == 4 and first['more']
+    assert second['entries'][0]['rank'] == 5
+    both = client.get(f'/api/leaderboards/{name}?limit=8').get_json()
+    assert both['entries'] == first['entries'] + second['entries']
+
+
+@pytest.mark.parametrize('url, limit', [('/api/standings?limit=1000', 100), ('/api/ratings?limit=1000', 100),
+                                        ('/api/search?q=a&limit=1000', 50)])
+def test_large_limits_are_lowered(client, url, limit):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_json()['limit'] == limit
+
+
+@pytest.mark.parametrize('url', ['/api/standings?limit=abc', '/api/standings?offset=1.5', '/api/standings?offset=-1',
+                                 '/api/standings?limit=0', '/api/search?q=a&limit=-5', '/api/ratings?minimum=0'])
+def test_bad_page_arguments_are_rejected(client, url):
+    assert client.get(url).status_code == 400
+
+
+@pytest.mark.parametrize('url', ['/api/standings?season=nope', '/api/leaderboards/nope',
+                                 '/api/search?q=a&season=nope', '/api/profiles/Nobody%20Here',
+                                 '/api/profiles/Nobody%20Here/rivals', '/api/profiles/Nobody%20Here/ratings',
+                                 '/api/head-to-head?name=Nobody%20Here&opponent=Nobody%20Either'])
+def test_unknown_seasons_and_players_are_not_found(client, url):
+    assert client.get(url).status_code == 404
+
+
+def test_known_players_are_found(client):
+    name = client.get('/api/standings?limit=2').get_json()['entries'][0]['name']
+    for url in [f'/api/profiles/{name}', f'/api/profiles/{name}/rivals', f'/api/profiles/{name}/ratings']:
+        assert client.get(url).status_code == 200
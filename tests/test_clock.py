@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+from clock import CLOCK_UPDATES, FANOUT_SECONDS, ClockBroadcaster, ClockEventServer, TournamentClock
+
+LEVELS = [[25, 50, 0, 20], [50, 100, 0, 20]]
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _state(message):
+    return json.loads(message.split('data: ', 1)[1])
+
+
+def test_levels_advance_when_their_time_runs_out():
+    now = FakeTime()
+    clock = TournamentClock(LEVELS, clock=now)
+    clock.start()
+    now.now = 20 * 60 - 1
+    assert not clock.tick()
+    now.now = 20 * 60
+    assert clock.tick()
+    assert clock.state()['level'] == 2
+    assert clock.remaining() == 20 * 60
+
+
+def test_new_displays_get_the_current_time():
+    now = FakeTime()
+    clock = TournamentClock(LEVELS, clock=now)
+    broadcaster = ClockBroadcaster(clock)
+    clock.start()
+    broadcaster.publish()
+    now.now = 4
+    updates = broadcaster.subscribe()
+    assert _state(updates.get_nowait())['remaining'] == 20 * 60 - 4
+
+
+def test_updates_reach_displays_in_order():
+    clock = TournamentClock(LEVELS, clock=FakeTime())
+    broadcaster = ClockBroadcaster(clock, backlog=4)
+    updates = broadcaster.subscribe()
+    for action in (clock.start, clock.pause, clock.next_level):
+        action()
+        broadcaster.notify()
+    versions = [_state(updates.get_nowait())['version'] for _ in range(4)]
+    assert versions == sorted(versions)
+    assert updates.empty()
+
+
+def test_workers_share_the_clock(tmp_path):
+    path = str(tmp_path / 'clock.json')
+    now = FakeTime()
+    director = TournamentClock(LEVELS, clock=now, path=path)
+    display = TournamentClock.load(path, clock=now)
+    director.start()
+    assert display.sync()
+    assert display.state()['status'] == 'running'
+    # Each change is made to the latest state, whichever worker makes it
+    display.next_level()
+    director.pause()
+    assert director.state()['level'] == 2
+    assert display.sync()
+    assert display.state()['status'] == 'paused'
+    assert not display.sync()
+
+
+def test_event_server_streams_the_shared_clock(tmp_path):
+    path = str(tmp_path / 'clock.json')
+    director = TournamentClock(LEVELS, path=path)
+    server = ClockEventServer(TournamentClock.load(path), poll=0.01)
+
+    async def follow():
+        serving = asyncio.ensure_future(server.serve('127.0.0.1', 0))
+        while not server.servers:
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /clock/events HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        head = await reader.readuntil(b'\r\n\r\n')
+        first = await reader.readuntil(b'\n\n')
+        director.start()
+        second = await reader.readuntil(b'\n\n')
+        writer.close()
+        serving.cancel()
+        return head, first.decode(), second.decode()
+
+    head, first, second = asyncio.run(follow())
+    assert b'text/event-stream' in head
+    assert _state(first)['status'] == 'stopped'
+    assert _state(second)['status'] == 'running'
+
+
+def test_fanout_is_measured():
+    broadcaster = ClockBroadcaster(TournamentClock(LEVELS, clock=FakeTime()))
+    broadcaster.subscribe()
+    updates = CLOCK_UPDATES.value()
+    broadcaster.publish()
+    assert CLOCK_UPDATES.value() == updates + 1
+    rendered = '\n'.join(FANOUT_SECONDS.render())
+    assert 'poker_stats_clock_fanout_seconds_count' in rendered
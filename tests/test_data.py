@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+
+import pytest
+
+import data
+from data import LazySeasonRegistry, NameIndex, Player, Season, SeasonResults
+
+NAMES = ['Kyle Salgueiro', 'Brandon Cheung', 'Kyle Smith', 'Bran Cheng']
+ALIASES = {'Kyle Salguero': 'Kyle Salgueiro', 'Brandon Chung': 'Brandon Cheung', 'Nobody Known': 'Missing Name'}
+
+
+def test_search_ranks_names():
+    index = NameIndex(NAMES)
+    assert index.search('kyle') == ['Kyle Salgueiro', 'Kyle Smith']
+    assert index.search('sm') == ['Kyle Smith']
+    assert index.search('che') == ['Bran Cheng', 'Brandon Cheung']
+    assert index.search('Kyle Smith', within={'Kyle Smith'}) == ['Kyle Smith']
+
+
+def test_merged_spellings_find_their_name():
+    index = NameIndex(NAMES, ALIASES)
+    assert index.search('Salguero') == ['Kyle Salgueiro']
+    assert index.search('chung') == ['Brandon Cheung']
+    # A name matched by several spellings is listed once, at its best rank
+    assert index.search('brandon ch') == ['Brandon Cheung']
+    assert index.search('kyle') == ['Kyle Salgueiro', 'Kyle Smith']
+    assert index.search('known') == []
+    assert len(index) == len(NAMES)
+
+
+def test_a_merged_spelling_finds_its_name_once():
+    index = NameIndex(NAMES, ALIASES)
+    # Both "Kyle Salgueiro" and "Kyle Salguero" start with the query
+    assert index.search('kyle salgu', limit=None) == ['Kyle Salgueiro']
+    assert index.search('salguero', limit=None) == ['Kyle Salgueiro']
+    assert index.search('Kyle Salguero', limit=None) == ['Kyle Salgueiro']
+
+
+def test_renaming_onto_a_taken_name_is_logged(caplog):
+    players = [Player(1, 0, 0, 'Doe, Jon', []), Player(1, 0, 0, 'Doe, John', [])]
+    season = Season('Test', 1, players)
+    with caplog.at_level(logging.WARNING, logger='data'):
+        season.rename_players({'Jon Doe': 'John Doe'})
+    assert 'Not renaming Jon Doe to John Doe' in caplog.text
+    assert sorted(season.index) == ['John Doe', 'Jon Doe']
+
+
+
+def _fields(results):
+    return (results.name, results.names, list(results.rows), list(results.tournaments), list(results.places))
+
+
+def test_least_recently_used_seasons_are_evicted(league):
+    registry = LazySeasonRegistry.from_directory(max_resident=2)
+    oldest = list(reversed(league))
+    for sheet in oldest[:3]:
+        registry.get(sheet)
+    # The current season is pinned, plus the two used last
+    assert registry.evictions == 1
+    registry.get(oldest[1])
+    registry.get(oldest[3])
+    resident = registry.residency()
+    assert sorted(resident['resident']) == sorted(registry.manifest[s][0] for s in (oldest[1], oldest[3], oldest[4]))
+    assert (resident['loads'], resident['evictions']) == (5, 2)
+    assert resident['hits'] >= 1
+
+
+def test_pinned_seasons_are_never_evicted(league):
+    registry = LazySeasonRegistry.from_directory(max_resident=1)
+    current = registry.latest
+    registry.pin(league[-1])
+    oldest = registry.get(league[-1])
+    for _ in range(2):
+        list(registry)
+    assert registry.latest is current
+    assert registry.get(league[-1]) is oldest
+    assert len(registry.residency()['resident']) == 3
+
+
+def test_evicted_seasons_reload_with_the_same_results(league):
+    registry = LazySeasonRegistry.from_directory(max_resident=1)
+    first = registry.get(league[-1])
+    before = _fields(SeasonResults.from_season(first))
+    registry.get(league[-2])
+    assert registry.evictions == 1
+    # Kept while evicted, then read again the same
+    assert _fields(next(registry.results())) == before
+    again = registry.get(league[-1])
+    assert again is not first
+    assert _fields(SeasonResults.from_season(again)) == before
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_stale_snapshots_are_parsed_again(league, monkeypatch, lazy):
+    parses = []
+    parse_seasons = data.Stats._parse_seasons
+    monkeypatch.setattr(data.Stats, '_parse_seasons', lambda self: parses.append(1) or parse_seasons(self))
+    first = data.Stats(lazy=lazy)
+    assert len(parses) == 1
+    again = data.Stats(lazy=lazy)
+    assert len(parses) == 1
+    assert again.data_version == first.data_version
+    assert again.profiles.keys() == first.profiles.keys()
+
+    # Renaming a player in the newest sheet changes the file, so the snapshot is stale
+    path = os.path.join('data', f'{league[0]}.json')
+    with open(path) as f:
+        sheet = json.load(f)
+    sheet['values'][3][3] = 'Quill Zyzzyva'
+    with open(path, 'w') as f:
+        json.dump(sheet, f)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    edited = data.Stats(lazy=lazy)
+    assert len(parses) == 2
+    assert edited.data_version != first.data_version
+    assert 'Quill Zyzzyva' in edited.profiles
+
+    # So is a snapshot written by another version of the code
+    monkeypatch.setattr(data, 'SNAPSHOT_VERSION', data.SNAPSHOT_VERSION + 1)
+    bumped = data.Stats(lazy=lazy)
+    assert len(parses) == 3
+    assert bumped.data_version != edited.data_version
+    assert 'Quill Zyzzyva' in bumped.profiles
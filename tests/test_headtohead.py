@@ -0,0 +1,61 @@
+from collections import Counter
+from itertools import combinations
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import headtohead
+from headtohead import HeadToHead, rivalries
+
+
+def _brute_force(seasons):
+    """Counts the wins of every ordered pair one tournament at a time."""
+    wins = Counter()
+    for season in seasons:
+        tournaments = {}
+        for row, number, place in zip(season.rows, season.tournaments, season.places):
+            tournaments.setdefault(number, []).append((season.names[row], place))
+        for results in tournaments.values():
+            for (a, place_a), (b, place_b) in combinations(results, 2):
+                if place_a < place_b:
+                    wins[a, b] += 1
+                elif place_b < place_a:
+                    wins[b, a] += 1
+    return wins
+
+
+def _check(head_to_head, seasons):
+    wins = _brute_force(seasons)
+    names = sorted({name for season in seasons for name in season.names})
+    for name in names:
+        for opponent in names:
+            if name != opponent:
+                assert head_to_head.record(name, opponent) == (wins[name, opponent], wins[opponent, name])
+    assert len(head_to_head) == len({frozenset(pair) for pair in wins})
+
+
+def test_records_match_a_brute_force_count(random_seasons):
+    seasons = random_seasons(seed=1)
+    _check(HeadToHead.from_seasons(seasons), seasons)
+
+
+def test_records_match_in_small_blocks(random_seasons, monkeypatch):
+    # Forces several row blocks and pair chunks
+    monkeypatch.setattr(headtohead, 'BLOCK_CELLS', 30)
+    monkeypatch.setattr(headtohead, 'BLOCK_PAIRS', 7)
+    seasons = random_seasons(seasons=2, players=15, seed=2)
+    _check(HeadToHead.from_seasons(seasons), seasons)
+
+
+def test_rivalries_lead_with_the_most_played_pairs(random_seasons):
+    seasons = random_seasons(seed=3)
+    wins = _brute_force(seasons)
+    h = HeadToHead.from_seasons(seasons)
+    top = rivalries(h, k=5)
+    meetings = [w + l for _, _, w, l in top]
+    assert meetings == sorted(meetings, reverse=True)
+    assert meetings[0] == max(wins[a, b] + wins[b, a] for a, b in wins)
+    for name, opponent, w, l in top:
+        assert (w, l) == (wins[name, opponent], wins[opponent, name])
+        assert w >= l
@@ -0,0 +1,73 @@
+from array import array
+
+from data import SeasonResults
+from identity import IdentityResolver, edit_distance, normalize
+
+
+def _season(name, results):
+    """A season from ``{player: number of results}``."""
+    names = list(results)
+    rows = array('i', [row for row, player in enumerate(names) for _ in range(results[player])])
+    numbers = array('i', range(1, len(rows) + 1))
+    places = array('i', [1] * len(rows))
+    return SeasonResults(name, len(rows), names, [0.0] * len(names), list(range(len(names))),
+                         rows, numbers, places)
+
+
+def test_keys_ignore_case_accents_punctuation_and_order():
+    assert normalize('José  O\'Neil') == normalize('oneil, jose') == 'jose oneil'
+    assert edit_distance('salgueiro', 'salguero', 1) == 1
+    assert edit_distance('salgueiro', 'smith', 1) == 2
+
+
+def test_typos_across_seasons_merge_into_the_most_used_name():
+    seasons = [_season('S1', {'Kyle Salgueiro': 3, 'Ann Lee': 1}),
+               _season('S2', {'Kyle Salguero': 1, 'Ann Lee': 1}),
+               _season('S3', {'kyle salgueiro': 1})]
+    assert IdentityResolver().resolve(seasons) == {'Kyle Salguero': 'Kyle Salgueiro',
+                                                   'kyle salgueiro': 'Kyle Salgueiro'}
+
+
+def test_spellings_in_the_same_season_never_merge():
+    seasons = [_season('S1', {'Kyle Salgueiro': 2, 'Kyle Salguero': 1})]
+    assert IdentityResolver().resolve(seasons) == {}
+    # Nor does a third spelling join both through each of them
+    seasons.append(_season('S2', {'Kyle Salgueir': 1}))
+    mapping = IdentityResolver().resolve(seasons)
+    assert mapping == {'Kyle Salgueir': 'Kyle Salgueiro'}
+
+
+def test_numbered_names_only_match_the_same_numbers():
+    seasons = [_season('S1', {'Guest Player 1': 1}), _season('S2', {'Guest Player 2': 1})]
+    assert IdentityResolver().resolve(seasons) == {}
+
+
+def test_separate_names_are_not_merged():
+    seasons = [_season('S1', {'Dan Leeson': 2}), _season('S2', {'Dan Leesen': 1})]
+    assert IdentityResolver().resolve(seasons) == {'Dan Leesen': 'Dan Leeson'}
+    assert IdentityResolver(separate=[('Dan Leesen', 'Dan Leeson')]).resolve(seasons) == {}
+
+
+def test_aliases_are_forced():
+    seasons = [_season('S1', {'Robert Smith': 2, 'Bob Smith': 1}), _season('S2', {'Bobby Smith': 1})]
+    resolver = IdentityResolver(aliases={'Bob Smith': 'Robert Smith', 'Bobby Smith': 'Robert Smith'})
+    # Even within a season, which the automatic rules forbid
+    assert resolver.resolve(seasons) == {'Bob Smith': 'Robert Smith', 'Bobby Smith': 'Robert Smith'}
+
+
+def test_aliases_can_name_a_player_differently_from_every_sheet():
+    seasons = [_season('S1', {'Jon Doe': 1}), _season('S2', {'Jon Doe': 1})]
+    assert IdentityResolver(aliases={'Jon Doe': 'Jonathan Doe'}).resolve(seasons) == {'Jon Doe': 'Jonathan Doe'}
+
+
+def test_alias_chains_lead_to_their_last_name():
+    seasons = [_season('S1', {'A Person': 1}), _season('S2', {'B Person': 1}), _season('S3', {'C Person': 3})]
+    resolver = IdentityResolver(aliases={'A Person': 'B Person', 'B Person': 'C Person'})
+    assert resolver.resolve(seasons) == {'A Person': 'C Person', 'B Person': 'C Person'}
+
+
+def test_alias_cycles_end():
+    seasons = [_season('S1', {'Al Pacino': 2}), _season('S2', {'Bo Derek': 1})]
+    mapping = IdentityResolver(aliases={'Al Pacino': 'Bo Derek', 'Bo Derek': 'Al Pacino'}).resolve(seasons)
+    # Whichever name wins, nobody is renamed to a name that is renamed again
+    assert not set(mapping.values()) & set(mapping)
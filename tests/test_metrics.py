@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import metrics
+
+
+def test_metric_needs_samples():
+    with pytest.raises(TypeError):
+        metrics._Metric('m', 'A metric.')
+
+
+def test_render():
+    registry = metrics.Registry()
+    requests = registry.counter('requests_total', 'Requests.', ['status'])
+    requests.inc(status='200')
+    requests.inc(2, status='404')
+    seconds = registry.histogram('request_seconds', 'Time.', buckets=(0.1, 1))
+    seconds.observe(0.5)
+    assert registry.render().splitlines() == [
+        '# HELP requests_total Requests.',
+        '# TYPE requests_total counter',
+        'requests_total{status="200"} 1',
+        'requests_total{status="404"} 2',
+        '# HELP request_seconds Time.',
+        '# TYPE request_seconds histogram',
+        'request_seconds_bucket{le="0.1"} 0',
+        'request_seconds_bucket{le="1.0"} 1',
+        'request_seconds_bucket{le="+Inf"} 1',
+        'request_seconds_sum 0.5',
+        'request_seconds_count 1',
+    ]
+
+
+def test_shared_metrics_cover_every_process(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    worker = textwrap.dedent(f'''
+        import sys
+        sys.path.insert(0, {root!r})
+        import metrics
+        registry = metrics.Registry()
+        registry.counter('requests_total', 'Requests.').inc(3)
+        registry.share({str(tmp_path)!r})
+        registry._write()
+        print(metrics.os.getpid())
+    ''')
+    pid = subprocess.run([sys.executable, '-c', worker], capture_output=True, text=True, check=True).stdout.strip()
+
+    registry = metrics.Registry()
+    registry.counter('requests_total', 'Requests.').inc()
+    registry.share(str(tmp_path))
+    lines = registry.render().splitlines()
+    assert lines.count('# TYPE requests_total counter') == 1
+    assert f'requests_total{{pid="{pid}"}} 3' in lines
+    assert f'requests_total{{pid="{os.getpid()}"}} 1' in lines
+
+    registry.forget(pid)
+    assert not any(pid in line for line in registry.render().splitlines())
@@ -0,0 +1,35 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import projections
+from projections import SeasonModel, default_workers, simulate
+
+
+def _model(players=30, held=4, remaining=3, seed=0):
+    rng = np.random.RandomState(seed)
+    played = rng.random_sample((players, held)) < 0.6
+    points = np.round(rng.random_sample((players, held)) * 20, 2) * played
+    history = rng.randint(1, 12, players)
+    finishes = rng.random_sample((players, history.max()))
+    return SeasonModel([f'Player {i}' for i in range(players)], points, remaining,
+                       (played.sum(axis=1) + 1) / (held + 2), finishes, history,
+                       np.zeros(players), held + remaining - 2)
+
+
+def test_chances_do_not_depend_on_the_workers(monkeypatch):
+    # Several batches, so the pool has work to spread
+    monkeypatch.setattr(projections, 'BATCH_CELLS', 30 * 7 * 50)
+    model = _model()
+    serial = simulate(model, 400, workers=0)
+    assert simulate(model, 400, workers=2) == serial
+    assert sum(serial.values()) == pytest.approx(10)
+
+
+def test_processes_are_only_used_with_several_cpus(monkeypatch):
+    monkeypatch.setattr(projections.os, 'cpu_count', lambda: 1)
+    assert default_workers() == 0
+    monkeypatch.setattr(projections.os, 'cpu_count', lambda: None)
+    assert default_workers() == 0
+    monkeypatch.setattr(projections.os, 'cpu_count', lambda: 4)
+    assert default_workers() == 4
@@ -0,0 +1,62 @@
+import io
+import random
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from randomizer import Seating, read_names
+
+
+def _check(seating, players):
+    counts = {table: sum(p is not None for p in seats) for table, seats in seating.tables.items()}
+    assert counts == seating.counts
+    seated = [p for seats in seating.tables.values() for p in seats if p is not None]
+    assert sorted(seated) == sorted(players)
+    for player, (table, seat) in seating.seats.items():
+        assert seating.tables[table][seat] == player
+    for table, free in seating.free.items():
+        assert sorted(free) == [seat for seat, p in enumerate(seating.tables[table]) if p is None]
+    # Balanced within one seat, on as few tables as fit everyone
+    assert max(counts.values()) - min(counts.values()) <= 1
+    assert len(counts) == max(1, -(-len(players) // seating.table_size))
+    assert seating.counts[seating.smallest_table()] == min(counts.values())
+    assert seating.counts[seating.largest_table()] == max(counts.values())
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_tables_stay_balanced_as_players_bust(seed):
+    rng = random.Random(seed)
+    players = [f'Player {i}' for i in range(rng.choice([7, 23, 40, 81]))]
+    seating = Seating(players, table_size=rng.choice([6, 9, 10]), seed=seed)
+    _check(seating, players)
+    remaining = list(players)
+    while len(remaining) > 1:
+        player = remaining.pop(rng.randrange(len(remaining)))
+        for move in seating.bust(player):
+            table, seat = move['to']
+            assert seating.tables[table][seat - 1] == move['player']
+        _check(seating, remaining)
+
+
+def test_a_seed_reproduces_the_draw_and_the_moves():
+    players = [f'Player {i}' for i in range(30)]
+    first, second = Seating(players, seed=7), Seating(players, seed=7)
+    assert first.layout() == second.layout()
+    for player in players[::2]:
+        assert first.bust(player) == second.bust(player)
+    assert first.layout() == second.layout()
+    assert Seating(players, seed=8).layout() != Seating(players, seed=7).layout()
+
+
+def test_invalid_seatings_are_rejected():
+    with pytest.raises(ValueError):
+        Seating(['a', 'b'], table_size=1)
+    with pytest.raises(ValueError):
+        Seating(['a', 'a'])
+    with pytest.raises(KeyError):
+        Seating(['a', 'b']).bust('c')
+
+
+def test_names_are_read_from_every_cell():
+    upload = FileStorage(io.BytesIO('\ufeffName,Partner\nAnn,Bob\n\n Cy ,\n'.encode()), 'players.csv')
+    assert list(read_names(upload)) == ['Ann', 'Bob', 'Cy']
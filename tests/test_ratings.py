@@ -0,0 +1,47 @@
+import copy
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from ratings import RatingHistory
+
+
+def _assert_same(history, replayed):
+    assert history.tournaments == replayed.tournaments
+    assert history.played == replayed.played
+    assert history.ratings.keys() == replayed.ratings.keys()
+    for name, rating in replayed.ratings.items():
+        assert history.ratings[name] == pytest.approx(rating)
+    assert history.series.keys() == replayed.series.keys()
+    for name, entries in replayed.series.items():
+        assert [index for index, _ in history.series[name]] == [index for index, _ in entries]
+        assert [rating for _, rating in history.series[name]] == pytest.approx([rating for _, rating in entries])
+
+
+def _replay(seasons, **kwargs):
+    history = RatingHistory(**kwargs)
+    history.update(seasons)
+    return history
+
+
+def test_new_seasons_match_a_full_replay(random_seasons):
+    seasons = random_seasons(seasons=4, seed=1)
+    history = RatingHistory(checkpoint_every=3)
+    history.update(seasons[:2])
+    assert history.update(seasons) == 10
+    assert history.update(seasons) == 0
+    _assert_same(history, _replay(seasons, checkpoint_every=3))
+
+
+def test_edited_results_match_a_full_replay(random_seasons):
+    seasons = random_seasons(seasons=3, seed=2)
+    history = _replay(seasons, checkpoint_every=4)
+    # A result entered late in the middle of the history
+    edited = copy.deepcopy(seasons)
+    edited[1].places[len(edited[1].places) // 2] += 1
+    assert 0 < history.update(edited) < 15
+    _assert_same(history, _replay(edited, checkpoint_every=4))
+    # And back, from the checkpoints kept
+    history.update(seasons)
+    _assert_same(history, _replay(seasons, checkpoint_every=4))
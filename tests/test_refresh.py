@@ -0,0 +1,48 @@
+import os
+import stat
+
+import pytest
+
+from benchmarks.fake_sheets import SheetsStandIn
+from benchmarks.synthetic import generate_league
+from refresh import SheetRefresher, atomic_write
+from sheets import list_sheets, read_records
+
+
+@pytest.fixture
+def stand_in():
+    server = SheetsStandIn(generate_league(seasons=3, players=20, tournaments=4)).start()
+    yield server
+    server.stop()
+
+
+def test_refresh_downloads_every_missing_sheet(stand_in, tmp_path):
+    refresher = SheetRefresher('league', 'key', data_dir=str(tmp_path), api_root=stand_in.api_root)
+    names = refresher.refresh()
+    assert names == list(stand_in.league)
+    assert sorted(list_sheets(str(tmp_path))) == sorted(names)
+    header, *players = read_records(str(tmp_path / f'{names[0]}.ndjson'))
+    assert header['tournaments'] == 4
+    assert players
+
+
+def test_refresh_only_fetches_the_current_sheet_again(stand_in, tmp_path):
+    refresher = SheetRefresher('league', 'key', data_dir=str(tmp_path), api_root=stand_in.api_root)
+    refresher.refresh()
+    before = stand_in.requests
+    refresher.refresh()
+    # The sheet list and the current season
+    assert stand_in.requests - before == 2
+
+
+def test_atomic_write_keeps_the_mode(tmp_path):
+    path = tmp_path / 'config.json'
+    atomic_write(str(path), lambda f: f.write('{}'))
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o666 & ~umask
+
+    path.chmod(0o640)
+    atomic_write(str(path), lambda f: f.write('{"a": 1}'))
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+    assert path.read_text() == '{"a": 1}'
@@ -0,0 +1,71 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from data import PlacementTable, Player, Season
+from scoring import SHEET_SCALE, counted_tournaments, score_season, sheet_points, validate
+
+# Places in each of five tournaments; A and B tie for 1st in the last one,
+# and D plays fewer tournaments than are counted
+PLACES = {
+    'A': [1, 2, 2, 1, 1],
+    'B': [2, 1, 1, 2, 1],
+    'C': [3, 3, 0, 3, 3],
+    'D': [4, 0, 0, 4, 0]
+}
+ENTRANTS = [4, 3, 2, 4, 3]
+BONUS = {'D': 5}
+
+
+def _season(points=None, totals=None):
+    players = []
+    for name, places in PLACES.items():
+        placements = [{'tournament': f'Tournament {t}', 'place': place,
+                       'points': round(sheet_points(place, ENTRANTS[t - 1]), 2)}
+                      for t, place in enumerate(places, 1) if place]
+        for t, value in (points or {}).get(name, {}).items():
+            placements[t]['points'] = value
+        best = sorted((p['points'] for p in placements), reverse=True)[:4]
+        total = (totals or {}).get(name, round(sum(best) + BONUS.get(name, 0), 2))
+        players.append(Player(1, BONUS.get(name, 0), total, name, placements))
+    return Season('Test', 1, players, 5, PlacementTable.from_players(players, 5))
+
+
+def test_counted_tournaments():
+    assert counted_tournaments(5) == 4
+    assert counted_tournaments(1, 0.5) == 1
+    assert counted_tournaments(5, 8) == 5
+    assert counted_tournaments(5, None) == 5
+
+
+def test_linear_points_by_hand():
+    scores = score_season(_season(), 'linear')
+    assert scores.counted == 4
+    assert scores.points.tolist() == [[4, 2, 1, 4, 3],
+                                      [3, 3, 2, 3, 3],
+                                      [2, 1, 0, 2, 1],
+                                      [1, 0, 0, 1, 0]]
+    # A drops their 1, B their 2; C and D keep everything, D with their bonus
+    assert scores.standings() == [('A', 13.0), ('B', 12.0), ('D', 7.0), ('C', 6.0)]
+
+
+def test_sheet_points_by_hand():
+    scores = score_season(_season(), 'sheet', best_of=None)
+    assert scores.points[0, 0] == round(2 * SHEET_SCALE, 2)
+    # A tie scores the same for both
+    assert scores.points[0, 4] == scores.points[1, 4] == round(SHEET_SCALE * 3 ** 0.5, 2)
+    assert scores.points[2, 2] == 0
+    assert scores.totals[3] == round(2 * round(SHEET_SCALE, 2) + 5, 2)
+
+
+def test_a_consistent_sheet_validates():
+    assert validate(_season()) == {'placements': [], 'totals': []}
+
+
+def test_validation_reports_each_mismatch_once():
+    problems = validate(_season(points={'B': {1: 1.0}}, totals={'C': 1.0}))
+    expected = round(sheet_points(1, 3), 2)
+    assert problems['placements'] == [('B', 'Tournament 2', 1, 1.0, expected)]
+    # B's total matches the points in the sheet, so only the placement is reported
+    assert [name for name, _, _ in problems['totals']] == ['C']
+    assert problems['totals'][0][1] == 1.0
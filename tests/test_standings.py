@@ -0,0 +1,71 @@
+import math
+import random
+
+import pytest
+
+from data import Player, Season
+from standings import OrderStatisticTree, ResultsLog, Standings
+
+
+def test_ranks_match_sorted_order():
+    rng = random.Random(1)
+    tree = OrderStatisticTree(seed=2)
+    keys = set()
+    for _ in range(2000):
+        key = rng.randrange(500)
+        if key in keys and rng.random() < 0.5:
+            tree.remove(key)
+            keys.remove(key)
+        elif key not in keys:
+            tree.insert(key, str(key))
+            keys.add(key)
+    ordered = sorted(keys)
+    assert len(tree) == len(ordered)
+    for rank, key in enumerate(ordered):
+        assert tree.rank(key) == rank
+        assert tree.select(rank) == str(key)
+    assert tree.slice(10, 30) == [str(key) for key in ordered[10:30]]
+    with pytest.raises(KeyError):
+        tree.rank(-1)
+
+
+def _season():
+    players = [Player(1, 0, 0, f'Player, {i}', []) for i in range(3)]
+    return Season('Test', 1, players, num_tournaments=4)
+
+
+def test_results_move_players_to_their_rank():
+    standings = Standings(_season())
+    player = standings.add_result('1 Player', 1, 2, points=5)[0]
+    assert player.total_points == 5
+    standings.add_result('2 Player', 1, 1, points=8)
+    # A second result in a tournament replaces the first
+    standings.add_result('1 Player', 1, 1, points=10)
+    assert [p.name for p in standings.between(0, 3)] == ['1 Player', '2 Player', '0 Player']
+    assert [p.rank for p in standings.between(0, 3)] == [0, 1, 2]
+
+
+@pytest.mark.parametrize('points', [math.nan, math.inf, -1.0])
+def test_invalid_points_are_rejected(points):
+    standings = Standings(_season())
+    with pytest.raises(ValueError):
+        standings.add_result('0 Player', 1, 1, points=points)
+    assert standings.season.index['0 Player'].placements == []
+
+
+def test_results_log_is_shared(tmp_path):
+    path = str(tmp_path / 'results.ndjson')
+    first, second = ResultsLog(path), ResultsLog(path)
+    assert not second.has_new()
+    with first.lock():
+        first.append({'name': 'a'})
+    assert not first.has_new()
+    assert second.has_new()
+    # A line still being written is left for later
+    with open(path, 'ab') as f:
+        f.write(b'{"name": ')
+    assert second.read_new() == [{'name': 'a'}]
+    with open(path, 'ab') as f:
+        f.write(b'"b"}\n')
+    assert second.read_new() == [{'name': 'b'}]
+    assert second.read_new() == []
@@ -0,0 +1,44 @@
+import copy
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from data import PlacementTable, Player, Season, SeasonRegistry
+
+LEADERBOARDS = ['most_final_tables', 'most_top_3', 'sum_of_placements', 'most_consecutive_finals',
+                'best_avg_place']
+
+
+def _season(results, extra_tournaments=0, skipped=()):
+    """A :class:`data.Season` with the results of a :class:`data.SeasonResults`."""
+    placements = [[] for _ in results.names]
+    for row, number, place in sorted(zip(results.rows, results.tournaments, results.places),
+                                     key=lambda x: (x[0], x[1])):
+        if number not in skipped:
+            placements[row].append({'tournament': f'Tournament {number}', 'place': place, 'points': 1.0})
+    players = [Player(1, 0, len(p), name, p) for name, p in zip(results.names, placements)]
+    num_tournaments = results.num_tournaments + extra_tournaments
+    return Season(results.name, 1, players, num_tournaments, PlacementTable.from_players(players, num_tournaments))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_vectorized_leaderboards_match_the_fallback(app_league, random_seasons, monkeypatch, seed):
+    # Imported along with the app, over its league
+    import stats
+    results = random_seasons(seasons=3, players=30, tournaments=8, seed=seed)
+    # Plain, with tournaments still to play, and with one nobody entered
+    seasons = [_season(results[0]), _season(results[1], extra_tournaments=3), _season(results[2], skipped={3})]
+    fallback = []
+    for season in seasons:
+        plain = copy.deepcopy(season)
+        plain.name = f'{season.name} fallback'
+        plain.columns = None
+        fallback.append(plain)
+    monkeypatch.setattr(stats.info, 'seasons', SeasonRegistry(seasons + fallback))
+    for season in seasons:
+        for name in LEADERBOARDS:
+            expected = stats.LEADERBOARDS[name](f'{season.name} fallback')
+            assert expected, name
+            assert stats.LEADERBOARDS[name](season.name) == expected, name
+            assert stats.LEADERBOARDS[name](season.name, k=5) == expected[:5], name